@@ -22,19 +22,28 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import logging, signal
+import logging, signal, json
 from fault_injector.network.msg_client import MessageClient
 from fault_injector.network.msg_builder import MessageBuilder
+from fault_injector.network.msg_strings import StringTable
+from fault_injector.injection.task_tracker import PendingTaskTracker
+from fault_injector.injection.sync_barrier import SyncBarrier
 from fault_injector.util.config_tools import ConfigLoader
 from fault_injector.util.subprocess_manager import SubprocessManager
 from fault_injector.util.misc import formatipport, strtoaddr
 from fault_injector.util.misc import format_injection_filename, format_output_directory, format_output_filename, VER_ID
-from fault_injector.io.writer import ExecutionLogWriter
+from fault_injector.util.misc import format_results_db_filename, format_output_archive, format_checkpoint_filename
+from fault_injector.io.writer import ExecutionLogWriter, CSVWriter, LogFlusher
 from fault_injector.io.reader import Reader
-from os.path import splitext, basename, isdir
-from os import mkdir
-from time import sleep, time
+from fault_injector.io.results_store import ResultsStore
+from fault_injector.io.output_archive import OutputArchiveWriter
+from fault_injector.network.msg_compression import Compression
+from os.path import splitext, basename, isdir, isfile
+from os import mkdir, remove, replace
+from time import time
+from math import ceil
 from shutil import rmtree
+from collections import deque
 
 
 class InjectorController:
@@ -49,7 +58,18 @@ class InjectorController:
     # Logger for the class
     logger = logging.getLogger('InjectorController')
 
-    def __init__(self, clientobj, workload_padding=20, pre_send_interval=600, session_wait=60, results_dir='results', aux_commands=None):
+    # Storage backends for execution logs: one CSV file per host, or a single SQLite database
+    BACKEND_CSV = 'csv'
+    BACKEND_SQLITE = 'sqlite'
+    BACKENDS = (BACKEND_CSV, BACKEND_SQLITE)
+
+    # Number of times all received messages are processed while trying to save a consistent checkpoint
+    _CHECKPOINT_ATTEMPTS = 10
+
+    def __init__(self, clientobj, workload_padding=20, pre_send_interval=600, session_wait=60, results_dir='results', aux_commands=None,
+                 log_flush_interval=1, log_buffer_size=65536, log_fsync=False, results_backend='csv',
+                 output_archive=False, output_compression=None, checkpoint_interval=60, sync_start_margin=0.1,
+                 sync_barrier_timeout=5, pre_send_adaptive=True, pre_send_min=5, pre_send_rtt_factor=20):
         """
         Constructor for the class
 
@@ -57,12 +77,32 @@ class InjectorController:
         :param workload_padding: Time in seconds to be added at the start of the workload as padding, in order to keep
             the system in idle state for a short time and prevent perturbation in the data
         :param pre_send_interval: Time in seconds specifying the interval of time between sending a task start command,
-            and its actual starting time. With the default settings, task start commands are sent 10 minutes before
-            their scheduled start time
+            and its actual starting time. If send-ahead windows are adaptive, it is the largest window of any engine
         :param session_wait: Time in seconds defining the interval of time in which to wait for all connected hosts
             to reply during the initialization and finalization of the session
         :param results_dir: Path of the results' directory, where the execution logs will be saved
         :param aux_commands: A list of commands corresponding to subtasks that must be executed alongside the injector
+        :param log_flush_interval: Maximum time in seconds for which execution log entries are buffered in memory,
+            before being written to disk by a background thread. If 0, execution logs are flushed after each entry
+        :param log_buffer_size: Size in characters of the buffer of each execution log above which it is flushed early
+        :param log_fsync: If True, execution logs are synchronized to the storage device after each flush
+        :param results_backend: Storage of execution logs, either 'csv' for one CSV file per host, or 'sqlite' for a
+            single SQLite database for all hosts
+        :param output_archive: If True, the outputs of tasks are stored in a single archive for each session, instead
+            of one file per task
+        :param output_compression: The name of the codec used to compress outputs in the archive. If None, outputs
+            are not compressed
+        :param checkpoint_interval: Interval in seconds between checkpoints of the state of injection sessions, from
+            which sessions can be resumed if the controller is terminated. If 0, no checkpoints are saved
+        :param sync_start_margin: Time in seconds added to twice the largest round-trip delay of the targeted engines,
+            to compute how far ahead the start time of a synchronized task must be set when it is armed
+        :param sync_barrier_timeout: Maximum time in seconds to wait for the engines targeted by a synchronized task
+            to be ready, once its starting time is near
+        :param pre_send_adaptive: If True, the send-ahead window of each engine is computed from its round-trip delay
+            and clock error, and engines are not sent more pending tasks than their advertised capacity. Otherwise,
+            all engines use pre_send_interval as their window, without limits
+        :param pre_send_min: Smallest send-ahead window in seconds, used for engines whose delays are not known yet
+        :param pre_send_rtt_factor: Number of round-trip delays of an engine added to the smallest window
         """
         assert isinstance(clientobj, MessageClient), 'InjectorController needs a Client object in its constructor!'
         self._client = clientobj
@@ -73,18 +113,74 @@ class InjectorController:
         self._resultsDir = results_dir
         self._sessionWait = session_wait
         self._session_id = None
-        # Sleep period of the busy loop in the _inject method
-        self._sleepPeriod = 0.5
-        # The interval used for sending clock correction messages to connected hosts
-        self._clockCorrectionPeriod = 30
+        # Dictionaries of the send-ahead windows in seconds of engines, and of the capacities they advertised. Tasks
+        # are sent to an engine once their starting time enters its window, and its pending tasks are below capacity
+        self._preSendAdaptive = pre_send_adaptive and pre_send_interval >= 0
+        self._preSendMin = pre_send_min
+        self._preSendRttFactor = pre_send_rtt_factor
+        self._sendWindows = {}
+        self._hostCapacities = {}
+        # Largest send-ahead window of any engine, which is how far ahead tasks are read from the workload
+        self._sendHorizon = 0
+        # Queue of the tasks that were read from the workload, but not sent yet to all of their engines, as [task,
+        # message, targets, sent, position] lists. The targets are None until a task targeting all engines is sent to
+        # some, and the position is the one of the task in the workload
+        self._dispatchQueue = deque()
+        # List of the [position, sequence number, engines] lists of the tasks that were sent to all of their engines,
+        # while tasks read before them are still queued. A resumed session must not send them again
+        self._dispatchedTasks = []
+        # Whether the queue must be checked again, and the engines that could not receive tasks because of capacity
+        self._dispatchDue = False
+        self._fullHosts = set()
+        # Flusher of the buffers of execution logs, shared by all writers
+        self._logFlusher = LogFlusher(log_flush_interval, log_fsync) if log_flush_interval > 0 else None
+        self._logBufferSize = log_buffer_size
+        assert results_backend in InjectorController.BACKENDS, 'Unknown results backend %s' % results_backend
+        self._resultsBackend = results_backend
+        # The database storing the execution logs of the current session, if the sqlite backend is used
+        self._resultsStore = None
+        # The archive storing the outputs of tasks in the current session, if enabled
+        self._useOutputArchive = output_archive
+        self._outputCodec = Compression.codec_from_name(output_compression)
+        self._outputArchive = None
+        # The interval between checkpoints of the session, and the checkpoint from which the next session is resumed
+        self._checkpointInterval = checkpoint_interval
+        self._resumeState = None
+        # Dictionary from the sequence numbers of tasks that were sent after the checkpoint of a resumed session, to the
+        # sets of the engines that already terminated them
+        self._terminatedTasks = {}
+        # Dictionary from the sequence numbers of synchronized tasks to their SyncBarrier objects, which are kept until
+        # all engines report the start of the task
+        self._syncStartMargin = sync_start_margin
+        self._syncBarrierTimeout = sync_barrier_timeout
+        self._barriers = {}
+        # Dictionary from the sequence numbers of synchronized tasks that were sent after the checkpoint of a resumed
+        # session, to the start times reported by engines before the controller was restarted
+        self._syncStarts = {}
         # A dictionary with (ip, port) keys, and values representing the Writer objects for execution logs associated
         # to each host
         self._writers = None
         # A dictionary containing the paths where output logs must be stored for each server
         self._outputsDirs = None
-        # Also a dictionary with (ip, port) keys: each entry is a set containing the sequence numbers for tasks from
-        # which we are waiting response on remote hosts
+        # Tracker of the tasks from which we are waiting response on remote hosts
         self._pendingTasks = None
+        # Dictionary with the (ip, port) keys of relays, and values that are sets of the addresses of the engines that
+        # are reached through them. Also a reverse dictionary, from engine addresses to relay addresses
+        self._relays = {}
+        self._relayedHosts = {}
+        # Dictionary of the sets of tags of the engines in the session, and dictionary from the hosts attributes of
+        # tasks to the tuples of engine addresses they target
+        self._hostTags = {}
+        self._targets = {}
+        # Dictionary of the (offset, error bound, round-trip delay) tuples last reported by the engines in the session
+        # for their clocks, against the clock of the controller
+        self._hostClocks = {}
+        # Queue of received messages, after their translation from relays
+        self._inbox = deque()
+        # Table of the strings interned in the commands sent during a session, and dictionary of the tables of strings
+        # interned by each engine in its messages
+        self._strings = StringTable()
+        self._hostStrings = {}
         self._endReached = False
         self._reader = None
         self._start_timestamp = 0
@@ -94,26 +190,44 @@ class InjectorController:
         signal.signal(signal.SIGTERM, self._signalhandler)
 
     @staticmethod
-    def build(config=None, hosts=None):
+    def build(config=None, hosts=None, resume_workload=None):
         """
         Static method that automatically builds an InjectorClient object starting from a given configuration file
 
         :param config: The path to the json configuration file
         :param hosts: the list of hosts as ip:port strings. This list has priority over the hosts specified in the input
             configuration file
+        :param resume_workload: The path of a workload whose injection session must be resumed from its last
+            checkpoint, if any. The same workload must then be supplied to the inject method
         :return: An InjectionClient object
         """
         cfg = ConfigLoader.getConfig(config)
-        cl = MessageClient(retry_interval=cfg['RETRY_INTERVAL'], retry_period=cfg['RETRY_PERIOD'], re_send_msgs=cfg['RECOVER_AFTER_DISCONNECT'])
+        cl = MessageClient(retry_interval=cfg['RETRY_INTERVAL'], retry_period=cfg['RETRY_PERIOD'], re_send_msgs=cfg['RECOVER_AFTER_DISCONNECT'],
+                           retry_backoff=cfg['RETRY_BACKOFF'], dns_ttl=cfg['DNS_CACHE_TTL'], connect_timeout=cfg['CONNECT_TIMEOUT'],
+                           max_pending_connects=cfg['MAX_PENDING_CONNECTIONS'], **MessageClient.options_from_config(cfg))
         inj_c = InjectorController(clientobj=cl, workload_padding=cfg['WORKLOAD_PADDING'], pre_send_interval=cfg['PRE_SEND_INTERVAL'],
-                               session_wait=cfg['SESSION_WAIT'], results_dir=cfg['RESULTS_DIR'], aux_commands=cfg['AUX_COMMANDS'])
+                               session_wait=cfg['SESSION_WAIT'], results_dir=cfg['RESULTS_DIR'], aux_commands=cfg['AUX_COMMANDS'],
+                               log_flush_interval=cfg['LOG_FLUSH_INTERVAL'], log_buffer_size=cfg['LOG_BUFFER_SIZE'],
+                               log_fsync=cfg['LOG_FSYNC'], results_backend=cfg['RESULTS_BACKEND'],
+                               output_archive=cfg['OUTPUT_ARCHIVE'], output_compression=cfg['OUTPUT_ARCHIVE_COMPRESSION'],
+                               checkpoint_interval=cfg['CHECKPOINT_INTERVAL'], sync_start_margin=cfg['SYNC_START_MARGIN'],
+                               sync_barrier_timeout=cfg['SYNC_BARRIER_TIMEOUT'], pre_send_adaptive=cfg['PRE_SEND_ADAPTIVE'],
+                               pre_send_min=cfg['PRE_SEND_MIN'], pre_send_rtt_factor=cfg['PRE_SEND_RTT_FACTOR'])
+        if resume_workload is not None:
+            inj_c._resumeState = inj_c._load_checkpoint(splitext(basename(resume_workload))[0])
+            if inj_c._resumeState is not None:
+                # Once connected, hosts forward the messages they sent after the checkpoint was saved
+                cl.restore_seq_nums({tuple(strtoaddr(h)): seq_num for h, seq_num in inj_c._resumeState['seq_nums'].items()})
         if hosts is None or len(hosts) == 0:
             hosts = cfg['HOSTS']
         # The hosts specified in the configuration file (or as input to the method) are added and connection is
         # established with them
         if len(hosts) > 0:
             hosts = [strtoaddr(h) for h in hosts if strtoaddr(h) is not None]
-            cl.add_servers(hosts)
+            connected, failed, duration = cl.add_servers(hosts)
+            if len(failed) > 0:
+                InjectorController.logger.warning('Could not connect to %s hosts out of %s: %s' % (len(failed), len(hosts),
+                                                  ', '.join(formatipport(addr) for addr in failed)))
         return inj_c
 
     def stop(self):
@@ -121,6 +235,17 @@ class InjectorController:
         Stops the injection client
         """
         self._client.stop()
+        if self._logFlusher is not None:
+            self._logFlusher.stop()
+
+    def get_send_windows(self):
+        """
+        Returns the send-ahead windows of the engines in the current injection session
+
+        :return: A dictionary from engine addresses to (window in seconds, capacity) tuples. The capacity is None if the
+            number of pending tasks of the engine is not limited
+        """
+        return {addr: (window, self._hostCapacities.get(addr)) for addr, window in self._sendWindows.items()}
 
     def inject(self, reader, max_tasks=None, suppress_output=False):
         """
@@ -128,6 +253,9 @@ class InjectorController:
         simply storing the execution records of connected hosts without issuing any command. This is useful to monitor
         currently running injection sessions from different machines
 
+        If the controller was built to resume the session of the workload, injection continues from its last
+        checkpoint
+
         :param reader: Reader object associated with the input workload
         :param max_tasks: The maximum number of tasks to be processed before terminating. Useful for debugging
         :param suppress_output: If True, all output file writing is suppressed
@@ -152,72 +280,123 @@ class InjectorController:
         """
         self._reader = reader
         assert isinstance(reader, Reader), '_inject method only supports Reader objects!'
+        workload_name = splitext(basename(reader.get_path()))[0]
+        state = self._resumeState
+        self._resumeState = None
+        if state is not None:
+            # The workload is read starting from the first task that was not sent before the checkpoint
+            reader.seek(state['position'])
         task = reader.read_entry()
-        if task is None:
+        if task is None and state is None:
             InjectorController.logger.warning("Input workload appears to be empty. Aborting...")
             return
 
         self._client.start()
 
-        # Initializing the injection session
-        session_accepted, session_id = self._init_session(workload_name=splitext(basename(reader.get_path()))[0])
+        # Initializing the injection session, or resuming it from its checkpoint
+        if state is None:
+            session_accepted, session_id = self._init_session(workload_name=workload_name)
+        else:
+            session_accepted, session_id = self._resume_session(state, workload_name=workload_name)
         if session_accepted == 0:
             InjectorController.logger.warning("No valid hosts for injection detected. Aborting...")
             return
 
         self._session_id = session_id
-        # Determines if we have reached the end of the workload
-        self._endReached = False
-        read_tasks = 0
-
-        # Start timestamp for the workload, computed from its first entry, minus the specified padding value
-        self._start_timestamp = task.timestamp - self._workloadPadding
-        # Synchronizes the time with all of the connected hosts
-        self._client.broadcast_msg(MessageBuilder.command_set_time(self._start_timestamp))
-        # Absolute timestamp associated to the workload's starting timestamp
-        self._start_timestamp_abs = time()
-        # Timestamp of the last correction that was applied to the clock of remote hosts
-        last_clock_correction = self._start_timestamp_abs
-
-        while not self._endReached or self._tasks_are_pending():
+        if state is None:
+            # Determines if we have reached the end of the workload
+            self._endReached = False
+            read_tasks = 0
+
+            # Start timestamp for the workload, computed from its first entry, minus the specified padding value
+            self._start_timestamp = task.timestamp - self._workloadPadding
+            # Synchronizes the time with all of the connected hosts
+            self._client.broadcast_msg(MessageBuilder.command_set_time(self._start_timestamp))
+            # Absolute timestamp associated to the workload's starting timestamp
+            self._start_timestamp_abs = time()
+        else:
+            self._endReached = state['end_reached'] or task is None
+            read_tasks = state['read_tasks']
+            if self._endReached:
+                reader.close()
+            # The workload's time kept flowing while the controller was not running: tasks whose starting time has
+            # passed are sent immediately
+            self._client.broadcast_msg(MessageBuilder.command_set_time(self._get_timestamp(time())))
+            # Synchronized tasks that were not armed before the checkpoint may be held by engines
+            for barrier in self._barriers.values():
+                if barrier.start is None:
+                    self._arm_barrier(barrier)
+        # Timestamp of the last checkpoint, and time at which the next task enters the window of some engine
+        last_checkpoint = time()
+        dispatch_deadline = None
+
+        while not self._endReached or self._dispatchQueue or self._tasks_are_pending():
             # While some tasks are still running, and there are tasks from the workload that still need to be read, we
             # keep looping
-            while self._client.peek_msg_queue() > 0:
+            while self._peek_msgs() > 0:
                 # We process all messages in the input queue, and write their content to the execution log for the
                 # given host
-                addr, msg = self._client.pop_msg_queue()
+                addr, msg = self._pop_msg()
                 self._process_msg_inject(addr, msg)
 
             # We compute the new "virtual" timestamp, in function of the workload's starting time
             now_timestamp_abs = time()
             now_timestamp = self._get_timestamp(now_timestamp_abs)
 
-            # We perform periodically a correction of the clock of the remote hosts. This has impact only when there
-            # is a very large drift between the clocks, of several minutes
-            # If the sliding window for the task injection is disabled there is no need to perform clock correction
-            if now_timestamp_abs - last_clock_correction > self._clockCorrectionPeriod and self._preSendInterval >= 0:
-                msg = MessageBuilder.command_correct_time(now_timestamp)
-                self._client.broadcast_msg(msg)
-                last_clock_correction = now_timestamp_abs
-
-            while not self._endReached and (task.timestamp < now_timestamp + self._preSendInterval or self._preSendInterval < 0):
-                # We read all entries from the workload that correspond to tasks scheduled to start in the next
-                # minutes (specified by presendinterval), and issue the related commands. This supposes that the
-                # workload entries are ordered by their timestamp
+            while not self._endReached and (task.timestamp < now_timestamp + self._sendHorizon or self._preSendInterval < 0):
+                # We read all entries from the workload that correspond to tasks scheduled to start within the window
+                # of some engine, and queue the related commands. This supposes that the workload entries are ordered
+                # by their timestamp
                 msg = MessageBuilder.command_start(task)
-                self._client.broadcast_msg(msg)
-                for s in self._pendingTasks.values():
-                    s.add(task.seqNum)
+                targets = self._get_targets(task)
+                terminated = self._terminatedTasks.pop(task.seqNum, None) if self._terminatedTasks else None
+                if task.sync:
+                    self._open_barrier(task, targets, terminated)
+                if terminated is not None:
+                    # The task was sent before the controller was restarted, and must not be tracked for the engines
+                    # that terminated it. The others ignore it, if they received it already
+                    targets = [addr for addr in (targets if targets is not None else self._pendingTasks.get_hosts())
+                               if addr not in terminated]
+                if targets is None or len(targets) > 0:
+                    self._dispatchQueue.append([task, msg, None if targets is None else set(targets), set(),
+                                                reader.tell() - 1])
+                    self._dispatchDue = True
                 task = reader.read_entry()
                 read_tasks += 1
                 if task is None or (max_tasks is not None and read_tasks >= max_tasks):
                     self._endReached = True
                     reader.close()
 
-            # This is a busy loop, with a short sleep period of roughly one second
-            sleep(self._sleepPeriod)
+            if self._dispatchDue or (dispatch_deadline is not None and time() >= dispatch_deadline):
+                dispatch_deadline = self._dispatch_tasks()
+
+            if self._endReached and not self._dispatchQueue and not self._tasks_are_pending():
+                break
+
+            # Synchronized tasks are armed when their engines are ready, or at the latest when their start is near
+            barrier_deadline = self._check_barriers()
+
+            if self._checkpointInterval > 0 and time() - last_checkpoint >= self._checkpointInterval:
+                position, rewind = self._get_resume_position(reader)
+                self._checkpoint(workload_name, position, read_tasks - rewind)
+                last_checkpoint = time()
+
+            # We wait until a new message is received, or until the next task must be read or sent, a synchronized
+            # task must be armed or the next checkpoint is due, whichever comes first
+            deadline = dispatch_deadline
+            if self._preSendInterval >= 0 and not self._endReached:
+                read_deadline = self._start_timestamp_abs + task.timestamp - self._sendHorizon - self._start_timestamp
+                deadline = read_deadline if deadline is None else min(deadline, read_deadline)
+            if self._checkpointInterval > 0:
+                checkpoint_deadline = last_checkpoint + self._checkpointInterval
+                deadline = checkpoint_deadline if deadline is None else min(deadline, checkpoint_deadline)
+            if barrier_deadline is not None:
+                deadline = barrier_deadline if deadline is None else min(deadline, barrier_deadline)
+            self._wait_msgs(None if deadline is None else deadline - time())
 
         self._end_session()
+        # The session is complete, and cannot be resumed anymore
+        self._remove_checkpoint(workload_name)
 
     def _pull(self):
         """
@@ -233,21 +412,22 @@ class InjectorController:
         msg = MessageBuilder.command_greet(0)
         self._client.broadcast_msg(msg)
 
-        addrs = self._client.get_registered_hosts()
         self._writers = {}
         self._outputsDirs = {}
-        for addr in addrs:
-            self._outputsDirs[addr] = format_output_directory(self._resultsDir, addr)
-            # The outputs directory needs to be flushed before starting the new injection session
-            if not self._suppressOutput:
-                if isdir(self._outputsDirs[addr]):
-                    rmtree(self._outputsDirs[addr], ignore_errors=True)
-                # We create an execution log writer for each connected host
-                self._writers[addr] = ExecutionLogWriter(format_injection_filename(self._resultsDir, addr))
+        self._open_results_store()
 
         while True:
             # The loop does not end; it is up to users to terminate the listening process by killing the process
-            addr, msg = self._client.pop_msg_queue()
+            addr, msg = self._pop_msg()
+            if addr not in self._outputsDirs:
+                # Execution log writers are created when the first message from an host is received, since the engines
+                # reached through relays are not known in advance
+                self._outputsDirs[addr] = format_output_directory(self._resultsDir, addr)
+                # The outputs directory needs to be flushed before starting the new injection session
+                if not self._suppressOutput:
+                    if self._outputArchive is None and isdir(self._outputsDirs[addr]):
+                        rmtree(self._outputsDirs[addr], ignore_errors=True)
+                    self._writers[addr] = self._new_writer(addr, format_injection_filename(self._resultsDir, addr))
             self._process_msg_pull(addr, msg)
 
     def _init_session(self, workload_name):
@@ -258,21 +438,31 @@ class InjectorController:
         :return: the number of hosts that have accepted the injection start command, and the timestamp ID of the session
         """
         session_start_timestamp = time()
+        # A checkpoint left by a previous session of the workload must not be resumed anymore
+        self._remove_checkpoint(workload_name)
+        # Engines reset their string tables when a new session is started
+        self._strings.reset()
         msg_start = MessageBuilder.command_session(session_start_timestamp)
         self._client.broadcast_msg(msg_start)
 
         self._writers = {}
         self._outputsDirs = {}
-        self._pendingTasks = {}
+        self._open_results_store(workload_name)
+        self._pendingTasks = PendingTaskTracker()
+        self._hostTags = {}
+        self._targets = {}
+        self._hostClocks = {}
+        self._barriers = {}
+        self._reset_send_windows()
         session_accepted = set()
         session_replied = 0
-        session_sent = self._client.get_n_registered_hosts()
         session_check_start = time()
         session_check_now = time()
-        while session_check_now - session_check_start < self._sessionWait and session_replied < session_sent:
+        # The number of hosts is computed at each iteration, as relays announce the engines they serve
+        while session_check_now - session_check_start < self._sessionWait and session_replied < self._get_n_hosts():
             # We wait until we receive an ack (positive or negative) from all connected hosts, or either we time out
-            if self._client.peek_msg_queue() > 0:
-                addr, msg = self._client.pop_msg_queue()
+            if self._wait_msgs(self._sessionWait - (session_check_now - session_check_start)) > 0:
+                addr, msg = self._pop_msg()
                 if msg[MessageBuilder.FIELD_TYPE] == MessageBuilder.ACK_YES:
                     # If an host replies to the injection start command with a positive ack, its log writer is
                     # instantiated, together with its entry in the pendingTasks dictionary
@@ -280,31 +470,150 @@ class InjectorController:
                     session_accepted.add(addr)
                     session_replied += 1
                     self._outputsDirs[addr] = format_output_directory(self._resultsDir, addr, workload_name)
-                    # The outputs directory needs to be flushed before starting the new injection session
+                    # The outputs directory needs to be flushed before starting the new injection session. This is
+                    # not needed with the output archive, as old archives are simply renamed
                     if not self._suppressOutput:
-                        if isdir(self._outputsDirs[addr]):
+                        if self._outputArchive is None and isdir(self._outputsDirs[addr]):
                             rmtree(self._outputsDirs[addr], ignore_errors=True)
-                        self._writers[addr] = ExecutionLogWriter(format_injection_filename(self._resultsDir, addr, workload_name))
+                        self._writers[addr] = self._new_writer(addr, format_injection_filename(self._resultsDir, addr, workload_name))
                         self._writers[addr].write_entry(MessageBuilder.command_session(msg[MessageBuilder.FIELD_TIME]))
-                    self._pendingTasks[addr] = set()
+                    self._pendingTasks.add_host(addr)
+                    self._hostTags[addr] = set(msg.get(MessageBuilder.FIELD_TAGS, ()))
+                    self._hostCapacities[addr] = msg.get(MessageBuilder.FIELD_CAPACITY)
+                    self._update_send_window(addr)
                 elif msg[MessageBuilder.FIELD_TYPE] == MessageBuilder.ACK_NO:
                     # If an host rejects the injection start command, we discard it
                     InjectorController.logger.warning("Injection session request rejected by engine %s" % formatipport(addr))
                     session_replied += 1
-                    self._client.remove_host(addr)
-            sleep(self._sleepPeriod)
+                    self._remove_host(addr)
             session_check_now = time()
 
         if session_check_now - session_check_start >= self._sessionWait:
             # If we have reached the time out, it means that not all of the connected hosts have replied. This is
             # highly unlikely, but could still happen. In this case, we remove all hosts that have not replied
             InjectorController.logger.warning("Injection session startup reached the timeout limit")
-            for addr in self._client.get_registered_hosts():
+            for addr in self._get_hosts():
                 if addr not in session_accepted:
-                    self._client.remove_host(addr)
+                    self._remove_host(addr)
 
         return len(session_accepted), session_start_timestamp
 
+    def _resume_session(self, state, workload_name):
+        """
+        Resumes the injection session saved in a checkpoint, for all connected hosts
+
+        Engines on which the session kept running (which requires the RECOVER_AFTER_DISCONNECT option) keep their
+        pending tasks, and forward the messages they sent after the checkpoint was saved; the tasks of the others are
+        considered lost. Execution logs are truncated to their state at the checkpoint, and new records are appended.
+
+        :param state: The dictionary of the checkpoint
+        :param workload_name: The name of the workload being injected
+        :return: the number of hosts that have accepted to resume the session, and the timestamp ID of the session
+        """
+        InjectorController.logger.info("Resuming injection session from checkpoint, %s tasks were already read" % state['position'])
+        session_id = state['session_id']
+        self._start_timestamp = state['start_timestamp']
+        self._start_timestamp_abs = state['start_timestamp_abs']
+        # The same IDs are used for the strings that were already interned, as engines still know them
+        self._strings.reset()
+        self._strings.load(state['strings'])
+        self._hostStrings = {}
+
+        self._writers = {}
+        self._outputsDirs = {}
+        self._open_results_store(workload_name, state['results_store'], state['output_archive'])
+        self._pendingTasks = PendingTaskTracker()
+        self._hostTags = {}
+        self._targets = {}
+        self._hostClocks = {}
+        self._reset_send_windows()
+        self._terminatedTasks = {}
+        for host, entry in state['hosts'].items():
+            addr = tuple(strtoaddr(host))
+            self._pendingTasks.add_host(addr)
+            self._hostTags[addr] = set(entry['tags'])
+            self._hostStrings[addr] = StringTable()
+            self._hostStrings[addr].load(entry['strings'])
+            self._outputsDirs[addr] = format_output_directory(self._resultsDir, addr, workload_name)
+            if not self._suppressOutput:
+                self._writers[addr] = self._new_writer(addr, format_injection_filename(self._resultsDir, addr, workload_name),
+                                                       entry['log'])
+        for seq_num, targets in state['tasks']:
+            self._pendingTasks.add_task(seq_num, [tuple(strtoaddr(h)) for h in targets])
+        for seq_num, targets in state.get('dispatched', ()):
+            # Tasks read after the position of the checkpoint may have been sent to some of their engines already,
+            # which must not receive them again
+            self._terminatedTasks.setdefault(seq_num, set()).update(tuple(strtoaddr(h)) for h in targets)
+        self._barriers = {}
+        self._syncStarts = {}
+        for entry in state['barriers']:
+            barrier = SyncBarrier(entry['seq_num'], entry['timestamp'], [tuple(strtoaddr(h)) for h in entry['targets']],
+                                  time(), entry['broadcast'])
+            barrier.start = entry['start']
+            for host, start in entry['starts'].items():
+                barrier.add_start(tuple(strtoaddr(host)), start)
+            self._barriers[barrier.seqNum] = barrier
+
+        msg_start = MessageBuilder.command_session(session_id)
+        self._client.broadcast_msg(msg_start)
+        session_accepted = set()
+        session_replied = set()
+        session_check_start = time()
+        session_check_now = time()
+        while session_check_now - session_check_start < self._sessionWait and len(session_replied) < self._get_n_hosts():
+            if self._wait_msgs(self._sessionWait - (session_check_now - session_check_start)) > 0:
+                addr, msg = self._pop_msg()
+                msg_type = msg[MessageBuilder.FIELD_TYPE] if isinstance(msg, dict) else None
+                if msg_type == MessageBuilder.ACK_YES:
+                    session_accepted.add(addr)
+                    session_replied.add(addr)
+                    self._hostTags[addr] = set(msg.get(MessageBuilder.FIELD_TAGS, ()))
+                    self._hostCapacities[addr] = msg.get(MessageBuilder.FIELD_CAPACITY)
+                    self._update_send_window(addr)
+                    if addr not in self._outputsDirs:
+                        # The engine was not part of the session when the checkpoint was saved
+                        InjectorController.logger.info("Injection session started with engine %s" % formatipport(addr))
+                        self._outputsDirs[addr] = format_output_directory(self._resultsDir, addr, workload_name)
+                        if not self._suppressOutput:
+                            self._writers[addr] = self._new_writer(addr, format_injection_filename(self._resultsDir, addr, workload_name))
+                            self._writers[addr].write_entry(MessageBuilder.command_session(msg[MessageBuilder.FIELD_TIME]))
+                        self._pendingTasks.add_host(addr)
+                        continue
+                    InjectorController.logger.info("Injection session resumed with engine %s" % formatipport(addr))
+                    if not self._suppressOutput:
+                        self._writers[addr].write_entry(MessageBuilder.status_connection(time(), restored=True))
+                    if MessageBuilder.FIELD_ERR in msg:
+                        # The engine has started a new session, and all previously running tasks have been lost
+                        self._pendingTasks.reset_host(addr)
+                        self._discard_barriers(addr)
+                        self._hostStrings.pop(addr, None)
+                        if not self._suppressOutput:
+                            self._writers[addr].write_entry(MessageBuilder.status_reset(msg[MessageBuilder.FIELD_TIME]))
+                elif msg_type == MessageBuilder.ACK_NO:
+                    InjectorController.logger.warning("Injection session cannot be resumed with engine %s" % formatipport(addr))
+                    session_replied.add(addr)
+                    self._pendingTasks.remove_host(addr)
+                    self._discard_barriers(addr)
+                    self._remove_host(addr)
+                elif addr in self._outputsDirs:
+                    # Messages sent by engines after the checkpoint are processed as usual
+                    if msg_type == MessageBuilder.STATUS_END or msg_type == MessageBuilder.STATUS_ERR:
+                        self._terminatedTasks.setdefault(msg[MessageBuilder.FIELD_SEQNUM], set()).add(addr)
+                    elif MessageBuilder.FIELD_START in msg and msg[MessageBuilder.FIELD_SEQNUM] not in self._barriers:
+                        self._syncStarts.setdefault(msg[MessageBuilder.FIELD_SEQNUM], {})[addr] = msg[MessageBuilder.FIELD_START]
+                    self._process_msg_inject(addr, msg)
+            session_check_now = time()
+
+        for addr in self._pendingTasks.get_hosts():
+            if addr not in session_accepted:
+                # Engines that could not be reached, or did not reply, are discarded together with their tasks
+                InjectorController.logger.warning("Injection session could not be resumed with engine %s" % formatipport(addr))
+                self._pendingTasks.remove_host(addr)
+                self._discard_barriers(addr)
+                if addr in self._get_hosts():
+                    self._remove_host(addr)
+        return len(session_accepted), session_id
+
     def _end_session(self):
         """
         Terminates the injection session for all connected hosts
@@ -313,13 +622,13 @@ class InjectorController:
         self._client.broadcast_msg(msg_end)
 
         session_closed = 0
-        session_sent = self._client.get_n_registered_hosts()
+        session_sent = self._get_n_hosts()
         session_check_start = time()
         session_check_now = time()
         while session_check_now - session_check_start < self._sessionWait and session_closed < session_sent:
             # We wait until we have received an ack for the termination from all of the connected hosts, or we time out
-            if self._client.peek_msg_queue() > 0:
-                addr, msg = self._client.pop_msg_queue()
+            if self._wait_msgs(self._sessionWait - (session_check_now - session_check_start)) > 0:
+                addr, msg = self._pop_msg()
                 if msg[MessageBuilder.FIELD_TYPE] == MessageBuilder.ACK_YES:
                     InjectorController.logger.info("Injection session closed with engine %s" % formatipport(addr))
                     if not self._suppressOutput:
@@ -328,13 +637,32 @@ class InjectorController:
                 else:
                     # If we receive a message that is not an ack after all tasks have terminated, something is wrong
                     InjectorController.logger.error("Ack expected from engine %s, got %s" % (formatipport(addr), msg[MessageBuilder.FIELD_TYPE]))
-            sleep(self._sleepPeriod)
             session_check_now = time()
 
+        # Synchronized tasks whose start was not reported by all engines are logged with the available information
+        for barrier in list(self._barriers.values()):
+            self._close_barrier(barrier)
+        self._log_compression_stats()
         # All of the execution log writers are closed, and the session finishes
         if not self._suppressOutput:
             for writer in self._writers.values():
                 writer.close()
+        self._close_results_store()
+
+    def _log_compression_stats(self):
+        """
+        Logs the results of message compression for each connected host, if it was used
+        """
+        for addr in self._client.get_registered_hosts():
+            stats = self._client.get_host_compression_stats(addr)
+            if stats is None or (stats['recv_ratio'] is None and stats['sent_ratio'] is None):
+                continue
+            InjectorController.logger.info('Compression with host %s: received %s bytes as %s (ratio %.2f, %.3fs CPU), '
+                                           'sent %s bytes as %s (ratio %.2f, %.3fs CPU)'
+                                           % (formatipport(addr), stats['recv_bytes'], stats['recv_compressed'],
+                                              stats['recv_ratio'] or 1, stats['recv_cpu_time'], stats['sent_bytes'],
+                                              stats['sent_compressed'], stats['sent_ratio'] or 1,
+                                              stats['sent_cpu_time']))
 
     def _process_msg_inject(self, addr, msg):
         """
@@ -343,6 +671,10 @@ class InjectorController:
         :param addr: The address of the sender
         :param msg: The message dictionary
         """
+        # Relays report on all of their engines, including those that rejected the session or joined the relay after
+        # it started: their messages are ignored
+        if not self._pendingTasks.has_host(addr):
+            return
         # We process status messages for connections that are in the queue
         is_status, status = MessageClient.is_status_message(msg)
         if is_status and status == MessageClient.CONNECTION_LOST_MSG:
@@ -350,15 +682,22 @@ class InjectorController:
             if not self._suppressOutput:
                 self._writers[addr].write_entry(MessageBuilder.status_connection(time()))
         elif is_status and status == MessageClient.CONNECTION_RESTORED_MSG:
-            # If connection has been restored with an host, we send a new session start command
-            self._client.send_msg(addr, MessageBuilder.command_session(self._session_id))
-            self._client.send_msg(addr, MessageBuilder.command_set_time(self._get_timestamp(time())))
+            # If connection has been restored with an host, we send a new session start command. The host may have
+            # reset its string table, and interned strings must be defined again
+            self._strings.forget(addr)
+            self._send_msg(addr, MessageBuilder.command_session(self._session_id))
+            self._send_msg(addr, MessageBuilder.command_set_time(self._get_timestamp(time())))
         elif is_status and status == MessageClient.CONNECTION_FINALIZED_MSG:
-            self._pendingTasks.pop(addr, None)
+            self._pendingTasks.remove_host(addr)
+            self._discard_barriers(addr)
+            # Targets that were resolved including the host must not be used anymore
+            self._targets.clear()
             # If all connections to servers were finalized we assume that the injection can be terminated
-            if len(self._pendingTasks) == 0:
+            if self._pendingTasks.get_n_hosts() == 0:
                 self._endReached = True
                 self._reader.close()
+                self._dispatchQueue.clear()
+                self._dispatchedTasks = []
         else:
             msg_type = msg[MessageBuilder.FIELD_TYPE]
             if msg_type != MessageBuilder.ACK_YES and msg_type != MessageBuilder.ACK_NO:
@@ -368,18 +707,28 @@ class InjectorController:
             # We log on the terminal the content of the message in a pretty form
             if msg_type == MessageBuilder.STATUS_START:
                 InjectorController.logger.info("Task %s started on host %s" % (msg[MessageBuilder.FIELD_DATA], formatipport(addr)))
+                if MessageBuilder.FIELD_START in msg:
+                    self._update_barrier(addr, msg)
             elif msg_type == MessageBuilder.STATUS_RESTART:
                 InjectorController.logger.info("Task %s restarted on host %s" % (msg[MessageBuilder.FIELD_DATA], formatipport(addr)))
             elif msg_type == MessageBuilder.STATUS_END:
                 InjectorController.logger.info("Task %s terminated successfully on host %s" % (msg[MessageBuilder.FIELD_DATA], formatipport(addr)))
                 # If a task terminates, we remove its sequence number from the set of pending tasks for the host
-                self._pendingTasks[addr].discard(msg[MessageBuilder.FIELD_SEQNUM])
+                self._pendingTasks.complete_task(addr, msg[MessageBuilder.FIELD_SEQNUM])
+                if addr in self._fullHosts:
+                    self._dispatchDue = True
+                if self._barriers:
+                    self._update_barrier(addr, msg)
                 if not self._suppressOutput:
                     self._write_task_output(addr, msg)
             elif msg_type == MessageBuilder.STATUS_ERR:
                 InjectorController.logger.error("Task %s terminated with error code %s on host %s" % (
                     msg[MessageBuilder.FIELD_DATA], str(msg[MessageBuilder.FIELD_ERR]), formatipport(addr)))
-                self._pendingTasks[addr].discard(msg[MessageBuilder.FIELD_SEQNUM])
+                self._pendingTasks.complete_task(addr, msg[MessageBuilder.FIELD_SEQNUM])
+                if addr in self._fullHosts:
+                    self._dispatchDue = True
+                if self._barriers:
+                    self._update_barrier(addr, msg)
                 if not self._suppressOutput:
                     self._write_task_output(addr, msg)
             elif msg_type == MessageBuilder.ACK_YES:
@@ -390,12 +739,14 @@ class InjectorController:
                 if not self._suppressOutput:
                     self._writers[addr].write_entry(MessageBuilder.status_connection(time(), restored=True))
                 if MessageBuilder.FIELD_ERR in msg:
-                    self._pendingTasks[addr] = set()
+                    self._pendingTasks.reset_host(addr)
+                    self._discard_barriers(addr)
+                    self._dispatchDue = True
                     if not self._suppressOutput:
                         self._writers[addr].write_entry(MessageBuilder.status_reset(msg[MessageBuilder.FIELD_TIME]))
             elif msg_type == MessageBuilder.ACK_NO:
                 InjectorController.logger.warning("Session cannot be resumed with engine %s" % formatipport(addr))
-                self._client.remove_host(addr)
+                self._remove_host(addr)
 
     def _process_msg_pull(self, addr, msg):
         """
@@ -437,6 +788,501 @@ class InjectorController:
                 InjectorController.logger.info("Greetings. Engine %s is alive with %s currently active tasks. %s" % (
                     formatipport(addr), str(msg[MessageBuilder.FIELD_DATA]), status_string))
 
+    def _peek_msgs(self):
+        """
+        Returns the number of received messages that are ready to be processed
+
+        :return: The number of messages
+        """
+        while self._client.peek_msg_queue() > 0:
+            addr, msg = self._client.pop_msg_queue()
+            self._translate_msg(addr, msg)
+        return len(self._inbox)
+
+    def _wait_msgs(self, timeout=None):
+        """
+        Blocks until at least one received message is ready to be processed, or until a timeout expires
+
+        :param timeout: The maximum time in seconds to wait. If None, the method waits indefinitely
+        :return: The number of messages ready to be processed
+        """
+        deadline = None if timeout is None else time() + timeout
+        while self._peek_msgs() == 0:
+            remaining = None if deadline is None else deadline - time()
+            if remaining is not None and remaining <= 0:
+                break
+            addr, msg = self._client.pop_msg_queue(timeout=remaining)
+            if addr is None:
+                break
+            # Messages from relays may be translated into no messages at all, hence the loop
+            self._translate_msg(addr, msg)
+        return len(self._inbox)
+
+    def _pop_msg(self):
+        """
+        Returns the first received message, blocking until one is available
+
+        Messages forwarded by relays are returned as if they were sent by the engines that originated them.
+
+        :return: An (addr, msg) tuple
+        """
+        while len(self._inbox) == 0:
+            addr, msg = self._client.pop_msg_queue()
+            self._translate_msg(addr, msg)
+        return self._inbox.popleft()
+
+    def _translate_msg(self, addr, msg):
+        """
+        Translates a message received from a connected host, and adds the result to the internal queue
+
+        Messages forwarded by relays carry the address of the engine that sent them, and are attributed to it. The
+        status of connections with engines, as seen by relays, is translated to the usual status messages, while the
+        loss of connection with a relay is extended to all of the engines reached through it.
+
+        :param addr: The address of the connected host
+        :param msg: The message
+        """
+        is_status, status = MessageClient.is_status_message(msg)
+        if is_status:
+            if addr in self._relays:
+                for host in self._relays[addr]:
+                    self._inbox.append((host, status))
+                if status == MessageClient.CONNECTION_FINALIZED_MSG:
+                    for host in self._relays.pop(addr):
+                        self._relayedHosts.pop(host, None)
+            else:
+                self._inbox.append((addr, msg))
+            return
+        host = msg.pop(MessageBuilder.FIELD_HOST, None)
+        msg_type = msg[MessageBuilder.FIELD_TYPE]
+        if msg_type == MessageBuilder.STATUS_TIME_PROBE or msg_type == MessageBuilder.STATUS_CLOCK:
+            self._process_clock_msg(tuple(strtoaddr(host)) if host is not None else addr, msg)
+        elif msg_type == MessageBuilder.STATUS_READY:
+            # Synchronized tasks are armed as soon as all of their engines are ready
+            barrier = self._barriers.get(msg[MessageBuilder.FIELD_SEQNUM])
+            if barrier is not None and barrier.start is None:
+                barrier.set_ready(tuple(strtoaddr(host)) if host is not None else addr)
+                if barrier.is_ready():
+                    self._arm_barrier(barrier)
+        elif msg_type == MessageBuilder.STATUS_RELAY:
+            # A relay has announced the engines it serves. If it is itself reached through another relay, it is
+            # replaced by its engines
+            relay = tuple(strtoaddr(host)) if host is not None else addr
+            hosts = self._relays.setdefault(addr, set())
+            hosts.discard(relay)
+            self._relayedHosts.pop(relay, None)
+            for h in msg[MessageBuilder.FIELD_DATA]:
+                h_addr = tuple(strtoaddr(h))
+                hosts.add(h_addr)
+                self._relayedHosts[h_addr] = addr
+            InjectorController.logger.info("Relay %s serves %s engines" % (formatipport(relay), len(msg[MessageBuilder.FIELD_DATA])))
+        elif host is None:
+            self._inbox.append((addr, self._expand_msg(addr, msg)))
+        elif msg_type == MessageBuilder.STATUS_LOST:
+            self._inbox.append((tuple(strtoaddr(host)), MessageClient.CONNECTION_LOST_MSG))
+        elif msg_type == MessageBuilder.STATUS_RESTORED:
+            self._inbox.append((tuple(strtoaddr(host)), MessageClient.CONNECTION_RESTORED_MSG))
+        elif msg_type == MessageBuilder.STATUS_FINALIZED:
+            self._inbox.append((tuple(strtoaddr(host)), MessageClient.CONNECTION_FINALIZED_MSG))
+        else:
+            host = tuple(strtoaddr(host))
+            self._inbox.append((host, self._expand_msg(host, msg)))
+
+    def _process_clock_msg(self, addr, msg):
+        """
+        Processes a clock synchronization message sent by an engine
+
+        Probes are answered as soon as they are received, so that the processing of other messages does not add to the
+        delay measured by the engine. Clock reports are stored, and logged.
+
+        :param addr: The address of the engine
+        :param msg: The message dictionary
+        """
+        if msg[MessageBuilder.FIELD_TYPE] == MessageBuilder.STATUS_TIME_PROBE:
+            t1 = self._get_timestamp(time())
+            t0, nonce = msg[MessageBuilder.FIELD_PROBE]
+            reply = MessageBuilder.command_time_reply(t0, t1, self._get_timestamp(time()), nonce)
+            self._send_msg(addr, reply)
+        else:
+            offset, error, rtt = msg[MessageBuilder.FIELD_OFFSET], msg[MessageBuilder.FIELD_CLOCK_ERR], msg[MessageBuilder.FIELD_RTT]
+            log = InjectorController.logger.info if addr not in self._hostClocks else InjectorController.logger.debug
+            log('Clock of host %s: offset %.3f ms +/- %.3f ms, RTT %.3f ms' % (formatipport(addr), offset * 1000,
+                                                                             error * 1000, rtt * 1000))
+            self._hostClocks[addr] = (offset, error, rtt)
+            self._update_send_window(addr)
+
+    def _dispatch_tasks(self):
+        """
+        Sends the queued tasks to the engines whose send-ahead window includes their starting time, and whose pending
+        tasks are below their capacity
+
+        Each engine receives tasks in order of their starting time: once an engine cannot receive a task, it does not
+        receive any later one either. Tasks targeting all engines are broadcast if all engines can receive them.
+
+        :return: The time at which the next queued task enters the window of an engine, or None if there is none
+        """
+        self._dispatchDue = False
+        self._fullHosts = set()
+        hosts = self._pendingTasks.get_hosts()
+        if len(hosts) == 0:
+            self._dispatchQueue.clear()
+            self._dispatchedTasks = []
+            return None
+        now_timestamp = self._get_timestamp(time())
+        next_time = None
+        blocked = set()
+        queue = deque()
+        while len(self._dispatchQueue) > 0 and len(blocked) < len(hosts):
+            entry = self._dispatchQueue.popleft()
+            task, msg, targets, sent, position = entry
+            ready = []
+            for addr in (hosts if targets is None else targets):
+                if addr in blocked:
+                    continue
+                pending = self._pendingTasks.get_host_pending(addr)
+                if pending is None:
+                    # The engine is not part of the session anymore
+                    continue
+                window = self._sendWindows.get(addr, self._sendHorizon)
+                capacity = self._hostCapacities.get(addr) if self._preSendAdaptive else None
+                if task.timestamp >= now_timestamp + window and self._preSendInterval >= 0:
+                    blocked.add(addr)
+                    send_time = self._start_timestamp_abs + task.timestamp - window - self._start_timestamp
+                    next_time = send_time if next_time is None else min(next_time, send_time)
+                elif capacity is not None and pending >= capacity:
+                    blocked.add(addr)
+                    self._fullHosts.add(addr)
+                else:
+                    ready.append(addr)
+            barrier = self._barriers.get(task.seqNum) if task.sync else None
+            if targets is None and len(ready) == len(hosts):
+                self._client.broadcast_msg(self._strings.intern(msg))
+                self._pendingTasks.add_task(task.seqNum)
+                if barrier is not None and barrier.start is not None:
+                    # The task was armed before reaching its engines, which must receive the start time as well
+                    self._client.broadcast_msg(MessageBuilder.command_arm(task.seqNum, barrier.start))
+                if len(queue) > 0:
+                    self._dispatchedTasks.append([position, task.seqNum, hosts])
+                continue
+            if len(ready) > 0:
+                for addr in ready:
+                    self._send_msg(addr, msg)
+                    if barrier is not None and barrier.start is not None:
+                        self._send_msg(addr, MessageBuilder.command_arm(task.seqNum, barrier.start))
+                self._pendingTasks.add_task(task.seqNum, ready)
+                sent.update(ready)
+                # Once sent to some engines, a task is sent individually to the others as well
+                entry[2] = targets = set(hosts if targets is None else targets).difference(sent)
+            if targets is None or any(self._pendingTasks.get_host_pending(addr) is not None for addr in targets):
+                queue.append(entry)
+            elif len(queue) > 0:
+                self._dispatchedTasks.append([position, task.seqNum, sent])
+        queue.extend(self._dispatchQueue)
+        self._dispatchQueue = queue
+        if len(self._dispatchedTasks) > 0:
+            # Tasks that were read before all of the queued ones are not read again by a resumed session
+            first = queue[0][4] if len(queue) > 0 else None
+            self._dispatchedTasks = [entry for entry in self._dispatchedTasks if first is not None and entry[0] > first]
+        return next_time
+
+    def _get_resume_position(self, reader):
+        """
+        Returns the position in the workload from which a resumed session must read tasks again
+
+        This is the position of the first task that was not sent to all of its engines. Queued tasks are not always the
+        last ones that were read, as later tasks may be sent to other engines in the meantime.
+
+        :param reader: The Reader object of the workload
+        :return: A (position, number of tasks read from that position) tuple
+        """
+        # The task that was read last has not been queued yet, unless the end of the workload was reached
+        end = reader.tell() - (0 if self._endReached else 1)
+        position = self._dispatchQueue[0][4] if len(self._dispatchQueue) > 0 else end
+        return position, end - position
+
+    def _update_send_window(self, addr):
+        """
+        Computes the send-ahead window of an engine, from its last clock report
+
+        The window covers the time needed for commands to reach the engine, and the error of its clock, rounded up to
+        whole seconds so that engines with similar delays share the same window, and broadcasts are not split.
+
+        :param addr: The address of the engine
+        """
+        window = self._get_send_window(addr)
+        old_window = self._sendWindows.get(addr)
+        if window == old_window:
+            return
+        self._sendWindows[addr] = window
+        if window > self._sendHorizon:
+            self._sendHorizon = window
+        elif old_window == self._sendHorizon:
+            self._sendHorizon = max(self._sendWindows.values())
+        if old_window is None or window > old_window:
+            self._dispatchDue = True
+        if self._preSendAdaptive:
+            capacity = self._hostCapacities.get(addr)
+            InjectorController.logger.info("Send-ahead window of engine %s set to %s s, with %s" % (
+                formatipport(addr), window, 'capacity %s' % capacity if capacity is not None else 'unknown capacity'))
+
+    def _get_send_window(self, addr):
+        """
+        Returns the send-ahead window of an engine
+
+        :param addr: The address of the engine, or None for an engine whose delays are not known
+        :return: The window in seconds
+        """
+        if not self._preSendAdaptive:
+            return self._preSendInterval
+        clock = self._hostClocks.get(addr)
+        window = self._preSendMin
+        if clock is not None:
+            window += self._preSendRttFactor * clock[2] + clock[1]
+        return min(int(ceil(window)), self._preSendInterval)
+
+    def _reset_send_windows(self):
+        """
+        Discards the send-ahead windows and the tasks queued in a previous session
+        """
+        self._sendWindows = {}
+        self._hostCapacities = {}
+        self._sendHorizon = self._get_send_window(None)
+        self._dispatchQueue = deque()
+        self._dispatchedTasks = []
+        self._dispatchDue = False
+        self._fullHosts = set()
+
+    def _open_barrier(self, task, targets, terminated=None):
+        """
+        Starts tracking a synchronized task that is sent to its engines, which will be armed once they are ready
+
+        :param task: The Task object
+        :param targets: The addresses of the engines targeted by the task, or None if it is sent to all engines
+        :param terminated: The addresses of the engines that terminated the task before the controller was restarted
+        """
+        if task.seqNum in self._barriers:
+            # The barrier of a task that was queued before the checkpoint is restored together with its reports
+            return
+        broadcast = targets is None
+        if broadcast:
+            targets = self._pendingTasks.get_hosts()
+        # If engines are not ready, we stop waiting for them just in time to arm the task for its starting time, but
+        # never earlier than the timeout
+        lead = self._get_sync_lead(targets)
+        deadline = max(self._start_timestamp_abs + task.timestamp - self._start_timestamp - lead,
+                       time() + self._syncBarrierTimeout)
+        barrier = self._barriers[task.seqNum] = SyncBarrier(task.seqNum, task.timestamp, targets, deadline, broadcast)
+        if self._syncStarts:
+            for addr, start in self._syncStarts.pop(task.seqNum, {}).items():
+                barrier.add_start(addr, start)
+        for addr in (terminated or ()):
+            barrier.discard(addr)
+        if len(barrier.targets) == 0:
+            # All engines received the task before the controller was restarted, and its barrier was closed already
+            del self._barriers[task.seqNum]
+        elif barrier.is_ready():
+            # All engines started the task before the controller was restarted
+            self._arm_barrier(barrier)
+            if barrier.is_complete():
+                self._close_barrier(barrier)
+
+    def _check_barriers(self):
+        """
+        Arms the synchronized tasks whose engines did not all become ready within their deadline
+
+        :return: The earliest deadline among the synchronized tasks that are not armed yet, or None if there are none
+        """
+        next_deadline = None
+        now = time()
+        for barrier in self._barriers.values():
+            if barrier.start is not None:
+                continue
+            if barrier.deadline <= now:
+                InjectorController.logger.warning("Engines %s are not ready for synchronized task %s" % (
+                    ', '.join(formatipport(addr) for addr in barrier.get_not_ready()), barrier.seqNum))
+                self._arm_barrier(barrier)
+            elif next_deadline is None or barrier.deadline < next_deadline:
+                next_deadline = barrier.deadline
+        return next_deadline
+
+    def _arm_barrier(self, barrier):
+        """
+        Sends the start time of a synchronized task to its engines
+
+        The start time is the starting time of the task, unless it is too close to reach all engines in time, in which
+        case it is delayed according to their round-trip delays.
+
+        :param barrier: The SyncBarrier object of the task
+        """
+        barrier.start = max(barrier.timestamp, self._get_timestamp(time()) + self._get_sync_lead(barrier.targets))
+        msg = MessageBuilder.command_arm(barrier.seqNum, barrier.start)
+        if barrier.broadcast:
+            self._client.broadcast_msg(msg)
+        else:
+            for addr in barrier.targets:
+                self._send_msg(addr, msg)
+        InjectorController.logger.debug("Synchronized task %s armed on %s engines, %.3f s after its starting time"
+                                        % (barrier.seqNum, len(barrier.targets), barrier.start - barrier.timestamp))
+
+    def _update_barrier(self, addr, msg):
+        """
+        Updates the synchronized task a status message refers to, if any, and logs its start spread once complete
+
+        :param addr: The address of the engine
+        :param msg: The status message dictionary
+        """
+        barrier = self._barriers.get(msg[MessageBuilder.FIELD_SEQNUM])
+        if barrier is None:
+            return
+        if msg[MessageBuilder.FIELD_TYPE] == MessageBuilder.STATUS_START:
+            barrier.add_start(addr, msg[MessageBuilder.FIELD_START])
+        else:
+            # Engines that terminate the task without starting it are not waited for
+            barrier.discard(addr)
+        if barrier.is_complete():
+            self._close_barrier(barrier)
+
+    def _discard_barriers(self, addr):
+        """
+        Stops waiting for an engine in all synchronized tasks, as its tasks were lost
+
+        :param addr: The address of the engine
+        """
+        for barrier in list(self._barriers.values()):
+            barrier.discard(addr)
+            if barrier.is_complete():
+                self._close_barrier(barrier)
+
+    def _close_barrier(self, barrier):
+        """
+        Stops tracking a synchronized task, and logs the spread of the start times reported by its engines
+
+        Start times are measured on the session clocks of the engines, and the spread is affected by the error of
+        their clocks as well, whose largest bound is logged together with it.
+
+        :param barrier: The SyncBarrier object of the task
+        """
+        del self._barriers[barrier.seqNum]
+        starts = list(barrier.get_starts().values())
+        if len(starts) == 0:
+            InjectorController.logger.warning("Synchronized task %s was not started by any engine" % barrier.seqNum)
+            return
+        errors = [self._hostClocks[addr][1] for addr in barrier.get_starts() if addr in self._hostClocks]
+        InjectorController.logger.info("Synchronized task %s started on %s engines with a spread of %.3f ms, up to "
+                                       "%.3f ms after its starting time (clock error up to %s)"
+                                       % (barrier.seqNum, len(starts), (max(starts) - min(starts)) * 1000,
+                                          (max(starts) - barrier.timestamp) * 1000,
+                                          '%.3f ms' % (max(errors) * 1000) if len(errors) > 0 else 'unknown'))
+        if len(starts) < len(barrier.targets):
+            InjectorController.logger.warning("Synchronized task %s was not started by %s engines"
+                                              % (barrier.seqNum, len(barrier.targets) - len(starts)))
+
+    def _get_sync_lead(self, targets):
+        """
+        Returns how far ahead the start time of a synchronized task must be, for its arm command to reach the engines
+
+        :param targets: The addresses of the engines targeted by the task
+        :return: The time in seconds
+        """
+        rtt = max((self._hostClocks[addr][2] for addr in targets if addr in self._hostClocks), default=0)
+        return 2 * rtt + self._syncStartMargin
+
+    def _expand_msg(self, addr, msg):
+        """
+        Replaces the IDs of interned strings in a message received from an engine with the strings themselves
+
+        :param addr: The address of the engine
+        :param msg: The message dictionary
+        :return: The expanded message dictionary
+        """
+        table = self._hostStrings.get(addr)
+        if table is None:
+            table = self._hostStrings[addr] = StringTable()
+        return table.expand(msg)
+
+    def _get_targets(self, task):
+        """
+        Returns the engines targeted by a task, among the ones in the injection session
+
+        :param task: The Task object
+        :return: A tuple of engine addresses, or None if the task targets all engines
+        """
+        if task.hosts is None:
+            return None
+        targets = self._targets.get(task.hosts)
+        if targets is None:
+            # Workloads usually reuse a few groups of engines, and resolved targets are cached
+            targets = []
+            for entry in task.hosts.split(CSVWriter.L1_DELIMITER_CHAR):
+                entry = entry.strip()
+                if entry == '':
+                    continue
+                matched = [addr for addr in self._pendingTasks.get_hosts()
+                           if entry in self._hostTags.get(addr, ()) or entry == formatipport(addr)]
+                if len(matched) == 0:
+                    InjectorController.logger.warning('Target %s of task %s does not match any engine in the '
+                                                      'session' % (entry, task.seqNum))
+                targets.extend(addr for addr in matched if addr not in targets)
+            targets = self._targets[task.hosts] = tuple(targets)
+        return targets
+
+    def _send_msg(self, addr, msg):
+        """
+        Sends a message to a single engine, through its relay if needed
+
+        :param addr: The address of the engine
+        :param msg: The message dictionary
+        """
+        msg = self._strings.intern(dict(msg), addr)
+        relay = self._relayedHosts.get(addr)
+        if relay is not None:
+            msg[MessageBuilder.FIELD_HOST] = formatipport(addr)
+            self._client.send_msg(relay, msg)
+        else:
+            self._client.send_msg(addr, msg)
+
+    def _remove_host(self, addr):
+        """
+        Removes an engine from the injection session
+
+        Engines reached through relays are simply not considered anymore, as the connection with the relay is shared.
+
+        :param addr: The address of the engine
+        """
+        self._hostClocks.pop(addr, None)
+        self._hostCapacities.pop(addr, None)
+        self._fullHosts.discard(addr)
+        if self._sendWindows.pop(addr, None) == self._sendHorizon:
+            self._sendHorizon = max(self._sendWindows.values(), default=self._get_send_window(None))
+        relay = self._relayedHosts.pop(addr, None)
+        if relay is not None:
+            self._relays[relay].discard(addr)
+        else:
+            self._client.remove_host(addr)
+
+    def _get_hosts(self):
+        """
+        Returns the addresses of all engines involved in the session, whether directly connected or reached through
+        relays
+
+        :return: A list of addresses
+        """
+        hosts = []
+        for addr in self._client.get_registered_hosts():
+            if addr in self._relays:
+                hosts.extend(self._relays[addr])
+            else:
+                hosts.append(addr)
+        return hosts
+
+    def _get_n_hosts(self):
+        """
+        Returns the number of engines involved in the session, whether directly connected or reached through relays
+
+        :return: The number of engines
+        """
+        return sum(len(self._relays[addr]) if addr in self._relays else 1 for addr in self._client.get_registered_hosts())
+
     def _get_timestamp(self, t):
         """
         Returns the current timestamp in virtual workload time
@@ -452,13 +1298,142 @@ class InjectorController:
 
         :return: True if there are pending tasks, False otherwise
         """
-        if self._pendingTasks is not None:
-            for s in self._pendingTasks.values():
-                # If the set of Task sequence number is not empty for at least one connected host, it means there are
-                # pending tasks, and we return
-                if len(s) > 0:
-                    return True
-        return False
+        return self._pendingTasks is not None and self._pendingTasks.has_pending()
+
+    def _new_writer(self, addr, path, position=None):
+        """
+        Creates the writer of the execution log of a host, buffered if a flush interval was configured
+
+        :param addr: The address of the host
+        :param path: The path of the execution log, if stored in a CSV file
+        :param position: The position to which an existing CSV file is truncated, when resuming a session. If None,
+            the file is overwritten
+        :return: A Writer object
+        """
+        if self._resultsStore is not None:
+            return self._resultsStore.get_writer(addr)
+        return ExecutionLogWriter(path, flusher=self._logFlusher, buffer_size=self._logBufferSize, position=position)
+
+    def _open_results_store(self, workload_name=None, store_position=None, archive_position=None):
+        """
+        Opens the database storing the execution logs of all hosts for a new session, if the sqlite backend is used,
+        and the archive storing the outputs of tasks, if enabled
+
+        :param workload_name: The name of the workload, or None for listening sessions
+        :param store_position: The position to which an existing database is restored, when resuming a session
+        :param archive_position: The position to which an existing archive is truncated, when resuming a session
+        """
+        self._close_results_store()
+        if self._resultsBackend == InjectorController.BACKEND_SQLITE and not self._suppressOutput:
+            self._resultsStore = ResultsStore(format_results_db_filename(self._resultsDir, workload_name),
+                                              flusher=self._logFlusher, position=store_position)
+        if self._useOutputArchive and not self._suppressOutput:
+            self._outputArchive = OutputArchiveWriter(format_output_archive(self._resultsDir, workload_name),
+                                                      flusher=self._logFlusher, codec=self._outputCodec,
+                                                      position=archive_position)
+
+    def _close_results_store(self):
+        """
+        Closes the database storing the execution logs and the archive storing the outputs of tasks, if any
+        """
+        if self._resultsStore is not None:
+            self._resultsStore.close()
+            self._resultsStore = None
+        if self._outputArchive is not None:
+            self._outputArchive.close()
+            self._outputArchive = None
+
+    def _checkpoint(self, workload_name, position, read_tasks):
+        """
+        Saves the state of the injection session to its checkpoint file, from which it can be resumed
+
+        The state must match the messages received so far from each host, whose sequence numbers are saved as well.
+        Hence, all received messages are processed first, and the checkpoint is skipped if new ones keep arriving.
+
+        :param workload_name: The name of the workload being injected
+        :param position: The position in the workload of the first task that was not sent yet
+        :param read_tasks: The number of tasks read from the workload so far
+        :return: True if the checkpoint was saved, False otherwise
+        """
+        seq_nums = None
+        for attempt in range(InjectorController._CHECKPOINT_ATTEMPTS):
+            while self._peek_msgs() > 0:
+                addr, msg = self._pop_msg()
+                self._process_msg_inject(addr, msg)
+            seq_nums = self._client.get_consumed_seq_nums()
+            if seq_nums is not None:
+                break
+        if seq_nums is None:
+            InjectorController.logger.warning("Checkpoint skipped, as messages from hosts keep arriving")
+            return False
+        hosts = {}
+        for addr in self._pendingTasks.get_hosts():
+            writer = self._writers.get(addr)
+            hosts[formatipport(addr)] = {
+                'tags': sorted(self._hostTags.get(addr, ())),
+                'strings': self._hostStrings[addr].get_strings() if addr in self._hostStrings else {},
+                'log': writer.get_position() if isinstance(writer, ExecutionLogWriter) else None}
+        state = {
+            'workload': self._reader.get_path(),
+            'position': position,
+            'read_tasks': read_tasks,
+            'end_reached': self._endReached,
+            'session_id': self._session_id,
+            'start_timestamp': self._start_timestamp,
+            'start_timestamp_abs': self._start_timestamp_abs,
+            'strings': self._strings.get_strings(),
+            'hosts': hosts,
+            'tasks': [[seq_num, [formatipport(addr) for addr in targets]]
+                      for seq_num, targets in self._pendingTasks.get_tasks()],
+            'dispatched': [[entry[0].seqNum, [formatipport(addr) for addr in entry[3]]]
+                           for entry in self._dispatchQueue if len(entry[3]) > 0] +
+                          [[seq_num, [formatipport(addr) for addr in sent]] for _, seq_num, sent in self._dispatchedTasks],
+            'seq_nums': {formatipport(addr): list(seq_num) for addr, seq_num in seq_nums.items()},
+            'barriers': [{'seq_num': b.seqNum, 'timestamp': b.timestamp, 'start': b.start, 'broadcast': b.broadcast,
+                          'targets': [formatipport(addr) for addr in b.targets],
+                          'starts': {formatipport(addr): start for addr, start in b.get_starts().items()}}
+                         for b in self._barriers.values()],
+            'results_store': self._resultsStore.get_position() if self._resultsStore is not None else None,
+            'output_archive': self._outputArchive.get_position() if self._outputArchive is not None else None}
+        path = format_checkpoint_filename(self._resultsDir, workload_name)
+        try:
+            with open(path + '.tmp', 'w') as checkpoint_file:
+                json.dump(state, checkpoint_file)
+            # The previous checkpoint is replaced atomically, so that a valid one always exists
+            replace(path + '.tmp', path)
+        except OSError as e:
+            InjectorController.logger.error("Cannot save checkpoint to path %s: %s" % (path, e))
+            return False
+        InjectorController.logger.debug("Checkpoint saved with %s pending tasks" % self._pendingTasks.get_n_pending())
+        return True
+
+    def _load_checkpoint(self, workload_name):
+        """
+        Loads the last checkpoint of the injection session of a workload
+
+        :param workload_name: The name of the workload
+        :return: The dictionary of the checkpoint, or None if it does not exist or cannot be read
+        """
+        path = format_checkpoint_filename(self._resultsDir, workload_name)
+        if not isfile(path):
+            InjectorController.logger.warning("No checkpoint found for workload %s, a new session will be started" % workload_name)
+            return None
+        try:
+            with open(path, 'r') as checkpoint_file:
+                return json.load(checkpoint_file)
+        except (OSError, ValueError) as e:
+            InjectorController.logger.error("Cannot read checkpoint from path %s: %s" % (path, e))
+            return None
+
+    def _remove_checkpoint(self, workload_name):
+        """
+        Deletes the checkpoint of the injection session of a workload, if present
+
+        :param workload_name: The name of the workload
+        """
+        path = format_checkpoint_filename(self._resultsDir, workload_name)
+        if isfile(path):
+            remove(path)
 
     def _write_task_output(self, addr, msg):
         """
@@ -472,6 +1447,9 @@ class InjectorController:
         """
         if MessageBuilder.FIELD_OUTPUT not in msg or not isinstance(msg[MessageBuilder.FIELD_OUTPUT], str):
             return
+        if self._outputArchive is not None:
+            self._outputArchive.write_output(addr, msg)
+            return
         if not isdir(self._outputsDirs[addr]):
             mkdir(self._outputsDirs[addr])
         output_file = open(format_output_filename(self._outputsDirs[addr], msg), 'w')
@@ -487,6 +1465,9 @@ class InjectorController:
             if self._writers is not None and not self._suppressOutput:
                 for w in self._writers.values():
                     w.close()
+            self._close_results_store()
+            if self._logFlusher is not None:
+                self._logFlusher.stop()
             if self._reader is not None:
                 self._reader.close()
             self._client.stop()
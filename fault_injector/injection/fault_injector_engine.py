@@ -22,8 +22,8 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import logging, signal
-from time import time
+import logging, random, signal
+from time import time, monotonic
 from fault_injector.network.msg_server import MessageServer
 from fault_injector.injection.thread_pool import InjectionThreadPool
 from fault_injector.network.msg_builder import MessageBuilder
@@ -41,28 +41,39 @@ class InjectorEngine:
     # Logger for the class
     logger = logging.getLogger('InjectorEngine')
 
+    # Interval in seconds between the probes of the burst that synchronizes the clock at the start of a session
+    SYNC_BURST_INTERVAL = 0.2
+
     @staticmethod
-    def build(config=None, port=None):
+    def build(config=None, port=None, unix_path=None):
         """
         Static method that automatically builds an InjectorServer object starting from a given configuration file
         
         :param config: The path to the json configuration file
         :param port: Listening port for the server
+        :param unix_path: Path of the Unix domain socket on which the server listens, for local controllers
         :return: An InjectionServer object
         """
         cfg = ConfigLoader.getConfig(config)
 
         if port is None and 'SERVER_PORT' in cfg:
             port = cfg['SERVER_PORT']
+        if unix_path is None:
+            unix_path = cfg['SERVER_UNIX_PATH']
 
-        se = MessageServer(port=port, re_send_msgs=cfg['RECOVER_AFTER_DISCONNECT'])
+        se = MessageServer(port=port, re_send_msgs=cfg['RECOVER_AFTER_DISCONNECT'], unix_path=unix_path,
+                           **MessageServer.options_from_config(cfg))
         pool = InjectionThreadPool(msg_server=se, max_requests=cfg['MAX_REQUESTS'], skip_expired=cfg['SKIP_EXPIRED'],
                                    retry_tasks=cfg['RETRY_TASKS'], retry_on_error=cfg['RETRY_TASKS_ON_ERROR'], log_outputs=cfg['LOG_OUTPUTS'],
-                                   root=cfg['ENABLE_ROOT'], numa_cores=(cfg['NUMA_CORES_FAULTS'], cfg['NUMA_CORES_BENCHMARKS']))
-        inj_s = InjectorEngine(serverobj=se, poolobj=pool, kill_abruptly=cfg['ABRUPT_TASK_KILL'], aux_commands=cfg['AUX_COMMANDS'])
+                                   root=cfg['ENABLE_ROOT'], numa_cores=(cfg['NUMA_CORES_FAULTS'], cfg['NUMA_CORES_BENCHMARKS']),
+                                   clock_samples=cfg['CLOCK_SYNC_SAMPLES'])
+        inj_s = InjectorEngine(serverobj=se, poolobj=pool, kill_abruptly=cfg['ABRUPT_TASK_KILL'], aux_commands=cfg['AUX_COMMANDS'],
+                               tags=cfg['ENGINE_TAGS'], sync_period=cfg['CLOCK_SYNC_PERIOD'],
+                               sync_samples=cfg['CLOCK_SYNC_SAMPLES'])
         return inj_s
 
-    def __init__(self, serverobj, poolobj, kill_abruptly=True, aux_commands=None):
+    def __init__(self, serverobj, poolobj, kill_abruptly=True, aux_commands=None, tags=None, sync_period=30,
+                 sync_samples=8):
         """
         Constructor for the class
         
@@ -70,6 +81,9 @@ class InjectorEngine:
         :param poolobj: InjectionThreadPool object to be used
         :param kill_abruptly: Boolean flag. See InjectionThreadPool for details
         :param aux_commands: A list of commands corresponding to subtasks that must be executed alongside the server
+        :param tags: A list of tags of the engine, sent to controllers so that workloads can target groups of engines
+        :param sync_period: The interval in seconds between clock synchronization probes sent to the session master
+        :param sync_samples: The number of probes sent in a burst when the session time is set by the master
         """
         assert isinstance(serverobj, MessageServer), 'InjectorEngine needs a Server object in its constructor!'
         self._server = serverobj
@@ -78,6 +92,24 @@ class InjectorEngine:
         self._session_timestamp = -1
         self._kill_abruptly = kill_abruptly
         self._pool = poolobj
+        self._tags = list(tags) if tags is not None else []
+        # Timestamp of the last task received in the session, and sequence numbers of the tasks received with it. Since
+        # tasks are sent in timestamp order, tasks that precede them are received again only in resumed sessions
+        self._lastTaskTime = None
+        self._lastTaskSeqNums = set()
+        self._sessionResumed = False
+        # Dictionary of the synchronized tasks received in the session that were not armed by the master yet
+        self._heldTasks = {}
+        # Clock of the session, and state of the probes used to synchronize it with the clock of the master: local time
+        # at which the outstanding probe was sent and its random nonce, number of probes sent since the time was set,
+        # and monotonic time at which the next probe is due
+        self._clock = poolobj.clock
+        self._syncPeriod = sync_period
+        self._syncSamples = sync_samples
+        self._probeTime = None
+        self._probeNonce = None
+        self._sentProbes = 0
+        self._nextProbe = None
 
     def listen(self):
         """
@@ -90,26 +122,47 @@ class InjectorEngine:
         self._server.start()
         self._pool.start()
         while True:
-            # Waiting for a new requests to arrive
-            addr, msg = self._server.pop_msg_queue()
+            # Waiting for a new requests to arrive, or for the next clock synchronization probe to be due
+            timeout = None if self._nextProbe is None else max(self._nextProbe - monotonic(), 0)
+            addr, msg = self._server.pop_msg_queue(timeout=timeout)
+            self._check_probe()
+            if msg is None:
+                continue
             msg_type = msg[MessageBuilder.FIELD_TYPE]
             # If a session command has arrived, we process it accordingly
             if msg_type == MessageBuilder.COMMAND_START_SESSION or msg_type == MessageBuilder.COMMAND_END_SESSION:
                 self._update_session(addr, msg)
             # The set time is sent by the master after a successful ack and defines when the 'workload' is started
+            # The session clock is then synchronized with the clock of the master, starting with a burst of probes
             elif msg_type == MessageBuilder.COMMAND_SET_TIME and self._master is not None and addr == self._master:
-                self._pool.reset_session(msg[MessageBuilder.FIELD_TIME], time())
-            # If the master has sent a clock correction request, we process it
-            elif msg_type == MessageBuilder.COMMAND_CORRECT_TIME and self._master is not None and addr == self._master:
-                self._pool.correct_time(msg[MessageBuilder.FIELD_TIME])
+                self._clock.reset(msg[MessageBuilder.FIELD_TIME])
+                self._probeTime = None
+                self._sentProbes = 0
+                self._nextProbe = monotonic()
+                self._check_probe()
+            elif msg_type == MessageBuilder.COMMAND_TIME_REPLY and self._master is not None and addr == self._master:
+                self._process_time_reply(msg)
             # Processing a termination command
             elif msg_type == MessageBuilder.COMMAND_TERMINATE:
                 self._check_for_termination(addr, msg)
             # If a new command has been issued by the current session master, we add it to the thread pool queue
             elif addr == self._master and msg[MessageBuilder.FIELD_TYPE] == MessageBuilder.COMMAND_START:
-                self._pool.submit_task(Task.msg_to_task(msg))
+                task = Task.msg_to_task(self._pool.stringTable.expand(msg))
+                if self._is_new_task(task):
+                    if task.sync:
+                        self._hold_task(task)
+                    else:
+                        self._pool.submit_task(task)
+                elif task.sync:
+                    # A restarted master waits again for the engines to be ready. Tasks that were armed already are
+                    # not affected by the new start time
+                    self._server.send_msg(addr, MessageBuilder.status_ready(time(), task.seqNum))
+            elif addr == self._master and msg_type == MessageBuilder.COMMAND_ARM:
+                self._arm_task(msg)
             elif msg_type == MessageBuilder.COMMAND_GREET:
-                reply = MessageBuilder.status_greet(time(), self._pool.active_tasks(), self._master is not None)
+                # The interned strings are sent as well, so that the host can expand the status messages it receives
+                reply = MessageBuilder.status_greet(time(), self._pool.active_tasks(), self._master is not None,
+                                                    self._pool.stringTable.get_strings())
                 self._server.send_msg(addr, reply)
             else:
                 InjectorEngine.logger.warning('Invalid command sent from non-master host %s', formatipport(addr))
@@ -140,6 +193,8 @@ class InjectorEngine:
             # If the current master has terminated its session, we react accordingly
             self._master = None
             self._session_timestamp = -1
+            self._reset_tasks()
+            self._nextProbe = None
             ack = True
             InjectorEngine.logger.info('Injection session terminated with controller %s' % formatipport(addr))
         elif msg[MessageBuilder.FIELD_TYPE] == MessageBuilder.COMMAND_START_SESSION:
@@ -153,7 +208,11 @@ class InjectorEngine:
                 if not self._server.reSendMsgs or self._session_timestamp != session_ts or self._master is None:
                     self._pool.stop(kill_abruptly=True)
                     self._pool.start()
+                    self._reset_tasks()
                     err = -1
+                else:
+                    # Tasks that were already received may be sent again by the controller
+                    self._sessionResumed = True
                 # If there is no current master, or the previous one lost its connection, we accept the
                 # session start request of the new host
                 self._master = addr
@@ -163,7 +222,107 @@ class InjectorEngine:
             else:
                 InjectorEngine.logger.info('Injection session rejected with controller %s' % formatipport(addr))
             # An ack (positive or negative) is sent to the sender host
-        self._server.send_msg(addr, MessageBuilder.ack(time(), ack, err))
+        # Accepted session starts carry the tags of the engine, and its capacity, that limits the number of tasks the
+        # controller sends ahead of time
+        session_start = ack and msg[MessageBuilder.FIELD_TYPE] == MessageBuilder.COMMAND_START_SESSION
+        capacity = self._pool.get_capacity() if session_start else None
+        self._server.send_msg(addr, MessageBuilder.ack(time(), ack, err, self._tags if ack else None, capacity))
+
+    def _check_probe(self):
+        """
+        Sends a clock synchronization probe to the session master, if one is due
+        """
+        if self._nextProbe is None or monotonic() < self._nextProbe:
+            return
+        if self._master is None:
+            self._nextProbe = None
+            return
+        # A probe whose reply was not received yet is simply superseded by the new one. The nonce identifies the replies
+        # meant for this engine, as engines behind a relay may also receive those meant for the others
+        self._probeTime = self._clock.local_time()
+        self._probeNonce = random.getrandbits(32)
+        self._sentProbes += 1
+        interval = InjectorEngine.SYNC_BURST_INTERVAL if self._sentProbes < self._syncSamples else self._syncPeriod
+        self._nextProbe = monotonic() + interval
+        self._server.send_msg(self._master, MessageBuilder.status_time_probe(self._probeTime, self._probeNonce))
+
+    def _process_time_reply(self, msg):
+        """
+        Updates the session clock with the reply of the master to a clock synchronization probe
+
+        Once the initial burst of probes is complete, the estimated offset and its error bound are reported to the
+        master after each reply.
+
+        :param msg: The reply message
+        """
+        t3 = self._clock.local_time()
+        t0, t1, t2, nonce = msg[MessageBuilder.FIELD_PROBE]
+        if self._probeTime is None or t0 != self._probeTime or nonce != self._probeNonce:
+            # Late replies to superseded probes are discarded, as their delay is not known precisely, and so are the
+            # replies to probes of other engines
+            return
+        self._probeTime = None
+        self._pool.add_clock_sample(t0, t1, t2, t3)
+        offset, error, rtt = self._clock.get_offset(), self._clock.get_error(), self._clock.get_rtt()
+        InjectorEngine.logger.debug('Clock sample: offset %.3f ms, delay %.3f ms. Estimated offset %.3f ms +/- %.3f ms'
+                                    % (((t1 - t0) + (t2 - t3)) * 500, ((t3 - t0) - (t2 - t1)) * 1000, offset * 1000,
+                                       error * 1000))
+        if self._sentProbes >= self._syncSamples:
+            if self._sentProbes == self._syncSamples:
+                InjectorEngine.logger.info('Clock synchronized with controller %s: offset %.3f ms +/- %.3f ms, RTT '
+                                           '%.3f ms' % (formatipport(self._master), offset * 1000, error * 1000,
+                                                        rtt * 1000))
+            self._server.send_msg(self._master, MessageBuilder.status_clock(time(), offset, error, rtt))
+
+    def _hold_task(self, task):
+        """
+        Holds a synchronized task until it is armed by the master, and informs the master that it is ready to start it
+
+        :param task: The Task object
+        """
+        self._heldTasks[task.seqNum] = task
+        self._server.send_msg(self._master, MessageBuilder.status_ready(time(), task.seqNum))
+
+    def _arm_task(self, msg):
+        """
+        Submits a synchronized task to the thread pool, with the start time set by the master
+
+        :param msg: The arm command message
+        """
+        task = self._heldTasks.pop(msg[MessageBuilder.FIELD_SEQNUM], None)
+        if task is None:
+            # The task was already armed before the master was restarted
+            return
+        task.timestamp = msg[MessageBuilder.FIELD_START]
+        self._pool.submit_task(task)
+
+    def _is_new_task(self, task):
+        """
+        Checks whether a task was not already received in the current session, and keeps track of it
+
+        :param task: The Task object
+        :return: True if the task must be executed, False if it is a duplicate
+        """
+        last_time = self._lastTaskTime
+        if last_time is not None and self._sessionResumed and (task.timestamp < last_time or (
+                task.timestamp == last_time and task.seqNum in self._lastTaskSeqNums)):
+            InjectorEngine.logger.debug('Task %s was already received, ignoring it' % task.seqNum)
+            return False
+        if last_time is None or task.timestamp > last_time:
+            self._lastTaskTime = task.timestamp
+            self._lastTaskSeqNums = set()
+        if task.timestamp == self._lastTaskTime:
+            self._lastTaskSeqNums.add(task.seqNum)
+        return True
+
+    def _reset_tasks(self):
+        """
+        Discards the information about the tasks received in the current session
+        """
+        self._lastTaskTime = None
+        self._lastTaskSeqNums = set()
+        self._sessionResumed = False
+        self._heldTasks = {}
 
     def _signalhandler(self, sig, frame):
         """
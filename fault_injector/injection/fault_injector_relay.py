@@ -0,0 +1,184 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging, signal, threading
+from time import time
+from fault_injector.network.msg_server import MessageServer
+from fault_injector.network.msg_client import MessageClient
+from fault_injector.network.msg_builder import MessageBuilder
+from fault_injector.util.misc import formatipport, strtoaddr, VER_ID
+from fault_injector.util.config_tools import ConfigLoader
+
+
+class InjectorRelay:
+    """
+    This class implements a relay, that sits between a controller and a subset of the engines of an injection session
+
+    Towards controllers, the relay acts as an engine: commands received from them are broadcast to all of the engines
+    connected to the relay, or sent to a single engine if the command is addressed to it. Towards engines, the relay
+    acts as a controller: all of their messages are forwarded to the connected controllers, tagged with the address of
+    the engine that produced them, so that controllers can treat them as if they were directly connected.
+
+    Relays can be stacked, in order to build a tree of arbitrary depth: a relay announces the engines it serves to the
+    upper level whenever a session is started, and routes commands for engines served by lower-level relays to them.
+    """
+
+    # Logger for the class
+    logger = logging.getLogger('InjectorRelay')
+
+    @staticmethod
+    def build(config=None, port=None, hosts=None):
+        """
+        Static method that automatically builds an InjectorRelay object starting from a given configuration file
+
+        :param config: The path to the json configuration file
+        :param port: Listening port for controllers
+        :param hosts: the list of engines as ip:port strings. This list has priority over the hosts specified in the
+            input configuration file
+        :return: An InjectorRelay object
+        """
+        cfg = ConfigLoader.getConfig(config)
+
+        if port is None and 'SERVER_PORT' in cfg:
+            port = cfg['SERVER_PORT']
+        if hosts is None or len(hosts) == 0:
+            hosts = cfg['HOSTS']
+
+        se = MessageServer(port=port, re_send_msgs=cfg['RECOVER_AFTER_DISCONNECT'], unix_path=cfg['SERVER_UNIX_PATH'],
+                           **MessageServer.options_from_config(cfg))
+        cl = MessageClient(retry_interval=cfg['RETRY_INTERVAL'], retry_period=cfg['RETRY_PERIOD'], re_send_msgs=cfg['RECOVER_AFTER_DISCONNECT'],
+                           retry_backoff=cfg['RETRY_BACKOFF'], dns_ttl=cfg['DNS_CACHE_TTL'], connect_timeout=cfg['CONNECT_TIMEOUT'],
+                           max_pending_connects=cfg['MAX_PENDING_CONNECTIONS'], **MessageClient.options_from_config(cfg))
+        hosts = [strtoaddr(h) for h in hosts if strtoaddr(h) is not None]
+        if len(hosts) > 0:
+            connected, failed, duration = cl.add_servers(hosts)
+            if len(failed) > 0:
+                InjectorRelay.logger.warning('Could not connect to %s hosts out of %s: %s' % (len(failed), len(hosts),
+                                             ', '.join(formatipport(addr) for addr in failed)))
+        return InjectorRelay(serverobj=se, clientobj=cl)
+
+    def __init__(self, serverobj, clientobj):
+        """
+        Constructor for the class
+
+        :param serverobj: Server object to be used for communication with controllers
+        :param clientobj: Client object to be used for communication with engines
+        """
+        assert isinstance(serverobj, MessageServer), 'InjectorRelay needs a Server object in its constructor!'
+        assert isinstance(clientobj, MessageClient), 'InjectorRelay needs a Client object in its constructor!'
+        self._server = serverobj
+        self._client = clientobj
+        # Dictionary that maps the addresses of engines served by lower-level relays, in ip:port format, to the
+        # (ip, port) addresses of such relays
+        self._routes = {}
+        self._thread = None
+
+    def listen(self):
+        """
+        Starts forwarding messages between controllers and engines
+        """
+        InjectorRelay.logger.info("FINJ Injection Relay v%s started" % VER_ID)
+        signal.signal(signal.SIGINT, self._signalhandler)
+        signal.signal(signal.SIGTERM, self._signalhandler)
+        self._server.start()
+        self._client.start()
+        # Messages from engines are forwarded by a separate thread
+        self._thread = threading.Thread(target=self._forward_up, daemon=True)
+        self._thread.start()
+        self._forward_down()
+
+    def stop(self):
+        """
+        Stops the relay
+        """
+        self._server.stop()
+        self._client.stop()
+
+    def _forward_down(self):
+        """
+        Forwards the commands sent by controllers to engines
+        """
+        while True:
+            addr, msg = self._server.pop_msg_queue()
+            msg_type = msg[MessageBuilder.FIELD_TYPE]
+            # Controllers are informed about the engines served by the relay before a session is started
+            if msg_type == MessageBuilder.COMMAND_START_SESSION or msg_type == MessageBuilder.COMMAND_GREET:
+                self._server.send_msg(addr, MessageBuilder.status_relay(time(), self._get_hosts()))
+            host = msg.get(MessageBuilder.FIELD_HOST)
+            if host is None:
+                self._client.broadcast_msg(msg)
+            elif host in self._routes:
+                # The engine is served by a lower-level relay, which also needs the address of the engine
+                self._client.send_msg(self._routes[host], msg)
+            else:
+                engine = strtoaddr(host)
+                del msg[MessageBuilder.FIELD_HOST]
+                if engine is not None and tuple(engine) in self._client.get_registered_hosts():
+                    self._client.send_msg(tuple(engine), msg)
+                else:
+                    InjectorRelay.logger.warning('Cannot forward command to unknown engine %s' % host)
+
+    def _forward_up(self):
+        """
+        Forwards the messages sent by engines to controllers, tagged with the address of the engine
+        """
+        while True:
+            addr, msg = self._client.pop_msg_queue()
+            is_status, status = MessageClient.is_status_message(msg)
+            if is_status:
+                # Changes in the status of connections with engines are forwarded as messages as well
+                if status == MessageClient.CONNECTION_LOST_MSG:
+                    msg = MessageBuilder.status_connection(time())
+                elif status == MessageClient.CONNECTION_RESTORED_MSG:
+                    msg = MessageBuilder.status_connection(time(), restored=True)
+                elif status == MessageClient.CONNECTION_FINALIZED_MSG:
+                    msg = MessageBuilder.status_finalized(time())
+                else:
+                    continue
+            elif msg[MessageBuilder.FIELD_TYPE] == MessageBuilder.STATUS_RELAY:
+                # A lower-level relay has announced its engines: commands for them will be routed through it
+                for host in msg[MessageBuilder.FIELD_DATA]:
+                    self._routes[host] = addr
+            # Messages coming from lower-level relays are already tagged
+            if MessageBuilder.FIELD_HOST not in msg:
+                msg[MessageBuilder.FIELD_HOST] = formatipport(addr)
+            self._server.broadcast_msg(msg)
+
+    def _get_hosts(self):
+        """
+        Returns the addresses of the engines directly connected to this relay
+
+        :return: A list of addresses in ip:port format
+        """
+        return [formatipport(addr) for addr in self._client.get_registered_hosts()]
+
+    def _signalhandler(self, sig, frame):
+        """
+        A signal handler to perform a graceful exit procedure on SIGINT
+        """
+        if sig == signal.SIGINT or sig == signal.SIGTERM:
+            InjectorRelay.logger.info('Exit requested by user. Cleaning up...')
+            self.stop()
+            InjectorRelay.logger.info('Injection relay stopped by user!')
+            exit()
@@ -0,0 +1,131 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from time import monotonic
+from threading import Lock
+from collections import deque
+
+
+class SessionClock:
+    """
+    Clock keeping the time of an injection session, synchronized with the clock of the session's master
+
+    The local time of the session is measured on the monotonic clock of the host, starting from the timestamp set by
+    the master, and is not affected by adjustments of the system clock. Its offset against the clock of the master is
+    estimated from NTP-style exchanges of timestamped probes: each exchange yields an offset sample whose error is
+    bounded by half of its round-trip delay. The sample with the smallest error bound, among the most recent ones, is
+    used to correct the local time, so that samples delayed by network or scheduling jitter are discarded.
+    """
+
+    # Maximum frequency error (in seconds per second) assumed for the local clock, used to increase the error bound
+    # of samples as they age
+    MAX_DRIFT = 15e-6
+
+    def __init__(self, samples=8):
+        """
+        Constructor for the class
+
+        :param samples: The number of most recent samples among which the best one is selected
+        """
+        self._lock = Lock()
+        # Session timestamp at which the clock was reset, and the corresponding monotonic time
+        self._base = 0
+        self._baseMono = monotonic()
+        # Recent samples, as (delay, offset, monotonic time) tuples, and the sample that is currently applied
+        self._samples = deque(maxlen=samples)
+        self._best = None
+
+    def reset(self, timestamp):
+        """
+        Sets the local time of the session, discarding all previous samples
+
+        :param timestamp: The current session timestamp, as sent by the master
+        """
+        with self._lock:
+            self._base = timestamp
+            self._baseMono = monotonic()
+            self._samples.clear()
+            self._best = None
+
+    def local_time(self):
+        """
+        Returns the local time of the session, without applying the estimated offset
+
+        :return: The local session timestamp
+        """
+        return self._base + monotonic() - self._baseMono
+
+    def now(self):
+        """
+        Returns the time of the session, corrected with the estimated offset against the clock of the master
+
+        :return: The session timestamp
+        """
+        best = self._best
+        return self.local_time() + (best[1] if best is not None else 0)
+
+    def add_sample(self, t0, t1, t2, t3):
+        """
+        Adds the result of a probe exchange with the master, and selects the sample to be applied to the clock
+
+        :param t0: The local time at which the probe was sent
+        :param t1: The time of the master at which the probe was received
+        :param t2: The time of the master at which the reply was sent
+        :param t3: The local time at which the reply was received
+        """
+        # The delay excludes the time spent by the master between reception and reply. Small negative values can only
+        # be caused by the resolution of the clocks
+        delay = max((t3 - t0) - (t2 - t1), 0)
+        offset = ((t1 - t0) + (t2 - t3)) / 2
+        with self._lock:
+            now = monotonic()
+            self._samples.append((delay, offset, now))
+            self._best = min(self._samples, key=lambda s: s[0] / 2 + SessionClock.MAX_DRIFT * (now - s[2]))
+
+    def get_offset(self):
+        """
+        Returns the estimated offset of the clock of the master against the local clock
+
+        :return: The offset in seconds, or None if no sample is available
+        """
+        best = self._best
+        return best[1] if best is not None else None
+
+    def get_error(self):
+        """
+        Returns the bound on the error of the estimated offset
+
+        :return: The error bound in seconds, or None if no sample is available
+        """
+        best = self._best
+        return best[0] / 2 + SessionClock.MAX_DRIFT * (monotonic() - best[2]) if best is not None else None
+
+    def get_rtt(self):
+        """
+        Returns the round-trip delay of the sample that is currently applied
+
+        :return: The round-trip delay in seconds, or None if no sample is available
+        """
+        best = self._best
+        return best[0] if best is not None else None
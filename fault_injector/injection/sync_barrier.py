@@ -0,0 +1,116 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+class SyncBarrier:
+    """
+    Class that tracks a synchronized task, which must start at the same instant on all of the engines it targets.
+
+    Engines hold synchronized tasks until they are armed with a start time by the controller, which waits until all
+    targeted engines are ready before doing so. The start times reported by the engines, according to their session
+    clocks, are then collected in order to compute the spread achieved across them.
+    """
+
+    def __init__(self, seq_num, timestamp, targets, deadline, broadcast=False):
+        """
+        Constructor for the class
+
+        :param seq_num: The sequence number of the task
+        :param timestamp: The starting time of the task in the workload
+        :param targets: The addresses of the engines targeted by the task
+        :param deadline: The absolute time after which the task is armed, even if some engines are not ready
+        :param broadcast: True if the task was sent to all engines, and must be armed in the same way
+        """
+        self.seqNum = seq_num
+        self.timestamp = timestamp
+        self.targets = set(targets)
+        self.deadline = deadline
+        self.broadcast = broadcast
+        # Start time the task was armed with, or None if it was not armed yet
+        self.start = None
+        # Engines that are ready to start the task, and start times reported by engines
+        self._ready = set()
+        self._starts = {}
+
+    def set_ready(self, addr):
+        """
+        Marks an engine as ready to start the task
+
+        :param addr: The address of the engine
+        """
+        if addr in self.targets:
+            self._ready.add(addr)
+
+    def is_ready(self):
+        """
+        Returns whether all targeted engines are ready to start the task
+
+        :return: True if the task can be armed, False otherwise
+        """
+        return len(self._ready) == len(self.targets)
+
+    def get_not_ready(self):
+        """
+        Returns the engines that are not ready to start the task
+
+        :return: A list of engine addresses
+        """
+        return [addr for addr in self.targets if addr not in self._ready]
+
+    def add_start(self, addr, start):
+        """
+        Stores the start time of the task reported by an engine
+
+        :param addr: The address of the engine
+        :param start: The start time, according to the session clock of the engine
+        """
+        if addr in self.targets:
+            self._starts[addr] = start
+            self._ready.add(addr)
+
+    def discard(self, addr):
+        """
+        Stops waiting for an engine that will not start the task, for example because it was reset or the task expired
+
+        :param addr: The address of the engine
+        """
+        if addr not in self._starts:
+            self.targets.discard(addr)
+            self._ready.discard(addr)
+
+    def is_complete(self):
+        """
+        Returns whether all engines that are still targeted have reported their start time
+
+        :return: True if the barrier is complete, False otherwise
+        """
+        return self.start is not None and len(self._starts) == len(self.targets)
+
+    def get_starts(self):
+        """
+        Returns the start times reported by engines
+
+        :return: A dictionary from engine addresses to start times
+        """
+        return self._starts
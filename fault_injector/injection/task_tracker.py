@@ -0,0 +1,245 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+class PendingTaskTracker:
+    """
+    Class that keeps track of the tasks that were sent to engines, and whose termination was not received yet.
+
+    Engines are assigned a bit index, and each task is associated to a bitmap of the engines that still have to
+    complete it, together with their number. Tasks sent to all engines share the same bitmap, so that adding a task
+    does not depend on the number of engines, and a global counter of outstanding (task, engine) pairs makes checking
+    for pending tasks constant-time. The number of pending tasks of each engine is obtained in the same way, from the
+    number of tasks sent to all engines since it was added or reset, corrected by a per-engine counter.
+    """
+
+    def __init__(self):
+        """
+        Constructor for the class
+        """
+        # Dictionary from engine addresses to their bit indexes, and list of the indexes freed by removed engines
+        self._indexes = {}
+        self._freeIndexes = []
+        # Bitmap of all engines currently tracked
+        self._allMask = 0
+        # Dictionary from task sequence numbers to [bitmap, count] lists of the engines that still have to complete them
+        self._tasks = {}
+        # Total number of outstanding (task, engine) pairs
+        self._outstanding = 0
+        # Number of tasks sent to all engines, and dictionaries from engine bit indexes to the value of that number
+        # when they were added or reset, and to the difference between their pending tasks and the tasks sent to all
+        # engines since then
+        self._broadcasts = 0
+        self._hostBases = {}
+        self._hostCounts = {}
+
+    def add_host(self, addr):
+        """
+        Adds an engine to the tracker. Tasks that were added before the engine are not associated to it
+
+        :param addr: The address of the engine
+        """
+        if addr in self._indexes:
+            return
+        index = self._freeIndexes.pop() if len(self._freeIndexes) > 0 else len(self._indexes)
+        self._indexes[addr] = index
+        self._allMask |= 1 << index
+        self._hostBases[index] = self._broadcasts
+        self._hostCounts[index] = 0
+
+    def remove_host(self, addr):
+        """
+        Removes an engine from the tracker, discarding all of its pending tasks
+
+        :param addr: The address of the engine
+        """
+        if addr not in self._indexes:
+            return
+        self.reset_host(addr)
+        index = self._indexes.pop(addr)
+        self._allMask &= ~(1 << index)
+        del self._hostBases[index]
+        del self._hostCounts[index]
+        self._freeIndexes.append(index)
+
+    def reset_host(self, addr):
+        """
+        Discards all pending tasks of an engine, for example because they were lost after a connection loss
+
+        :param addr: The address of the engine
+        """
+        index = self._indexes.get(addr)
+        if index is None:
+            return
+        bit = 1 << index
+        done = []
+        for seq_num, entry in self._tasks.items():
+            if entry[0] & bit:
+                entry[0] &= ~bit
+                entry[1] -= 1
+                self._outstanding -= 1
+                if entry[1] == 0:
+                    done.append(seq_num)
+        for seq_num in done:
+            del self._tasks[seq_num]
+        self._hostBases[index] = self._broadcasts
+        self._hostCounts[index] = 0
+
+    def add_task(self, seq_num, targets=None):
+        """
+        Adds a task that was sent to a set of engines
+
+        :param seq_num: The sequence number of the task
+        :param targets: The addresses of the engines to which the task was sent. If None, the task was sent to all of
+            the engines in the tracker
+        """
+        if targets is None:
+            mask, count = self._allMask, len(self._indexes)
+        else:
+            mask = 0
+            for addr in targets:
+                index = self._indexes.get(addr)
+                if index is not None:
+                    mask |= 1 << index
+            count = PendingTaskTracker._count_bits(mask)
+        entry = self._tasks.get(seq_num)
+        if entry is not None:
+            # Sequence numbers are supposed to be unique, but a task may be sent again to some engines
+            new_mask = mask & ~entry[0]
+            entry[0] |= new_mask
+            count = PendingTaskTracker._count_bits(new_mask)
+            entry[1] += count
+            self._count_host_tasks(new_mask)
+        elif count > 0:
+            self._tasks[seq_num] = [mask, count]
+            if targets is None:
+                self._broadcasts += 1
+            else:
+                self._count_host_tasks(mask)
+        self._outstanding += count
+
+    def complete_task(self, addr, seq_num):
+        """
+        Marks a task as completed by an engine
+
+        :param addr: The address of the engine
+        :param seq_num: The sequence number of the task
+        :return: True if the task was pending on the engine, False otherwise
+        """
+        entry = self._tasks.get(seq_num)
+        index = self._indexes.get(addr)
+        if entry is None or index is None or not entry[0] & (1 << index):
+            return False
+        entry[0] &= ~(1 << index)
+        entry[1] -= 1
+        self._outstanding -= 1
+        self._hostCounts[index] -= 1
+        if entry[1] == 0:
+            del self._tasks[seq_num]
+        return True
+
+    def get_tasks(self):
+        """
+        Returns the pending tasks, together with the engines that still have to complete them
+
+        :return: A list of (sequence number, list of engine addresses) tuples
+        """
+        hosts = {index: addr for addr, index in self._indexes.items()}
+        tasks = []
+        for seq_num, entry in self._tasks.items():
+            tasks.append((seq_num, [addr for index, addr in hosts.items() if entry[0] & (1 << index)]))
+        return tasks
+
+    def has_pending(self):
+        """
+        Returns whether some tasks are still to be completed by some engine
+
+        :return: True if there are pending tasks, False otherwise
+        """
+        return self._outstanding > 0
+
+    def get_n_pending(self):
+        """
+        Returns the number of outstanding (task, engine) pairs
+
+        :return: An integer
+        """
+        return self._outstanding
+
+    def get_host_pending(self, addr):
+        """
+        Returns the number of tasks that are still to be completed by an engine
+
+        :param addr: The address of the engine
+        :return: An integer, or None if the engine is not in the tracker
+        """
+        index = self._indexes.get(addr)
+        if index is None:
+            return None
+        return self._broadcasts - self._hostBases[index] + self._hostCounts[index]
+
+    def get_hosts(self):
+        """
+        Returns the addresses of the engines in the tracker
+
+        :return: A list of addresses
+        """
+        return list(self._indexes.keys())
+
+    def has_host(self, addr):
+        """
+        Returns whether an engine is in the tracker
+
+        :param addr: The address of the engine
+        :return: True if the engine is in the tracker, False otherwise
+        """
+        return addr in self._indexes
+
+    def get_n_hosts(self):
+        """
+        Returns the number of engines in the tracker
+
+        :return: An integer
+        """
+        return len(self._indexes)
+
+    def _count_host_tasks(self, mask):
+        """
+        Adds a task to the pending tasks of the engines in a bitmap
+
+        :param mask: An integer bitmap of engine indexes
+        """
+        for index in self._hostCounts:
+            if mask & (1 << index):
+                self._hostCounts[index] += 1
+
+    @staticmethod
+    def _count_bits(mask):
+        """
+        Returns the number of bits set in a bitmap
+
+        :param mask: An integer bitmap
+        :return: The number of bits set to 1
+        """
+        return bin(mask).count('1')
@@ -31,6 +31,8 @@ from collections import deque
 from fault_injector.util.misc import VALUE_ALL_CORES, SUDO_ID
 from fault_injector.network.msg_entity import MessageEntity
 from fault_injector.network.msg_builder import MessageBuilder
+from fault_injector.network.msg_strings import StringTable
+from fault_injector.injection.session_clock import SessionClock
 from fault_injector.io.task import Task
 from fault_injector.util.misc import format_numa_command, is_shell_script
 from sys import stdout
@@ -155,6 +157,14 @@ class ThreadPool(ABC):
         # The list of worker thread objects
         self._threads = []
 
+    def get_capacity(self):
+        """
+        Returns the number of threads in the pool, which is the number of tasks that can be executed concurrently
+
+        :return: The number of threads
+        """
+        return self._maxRequests
+
     def active_tasks(self):
         """
         Returns the number of threads in the pool that are currently running subprocesses
@@ -276,10 +286,8 @@ class InjectionThreadPool(ThreadPool):
     # Logger for the class
     logger = logging.getLogger('InjectionThreadPool')
 
-    CORRECTION_THRESHOLD = 60
-
     def __init__(self, msg_server, max_requests=20, skip_expired=True, retry_tasks=True, retry_on_error=False,
-                 log_outputs=True, root=False, numa_cores=(None, None)):
+                 log_outputs=True, root=False, numa_cores=(None, None), clock_samples=8):
         """
         Constructor for the class
         
@@ -296,6 +304,8 @@ class InjectionThreadPool(ThreadPool):
             access to be set on the host OS
         :param numa_cores: A tuple containing two strings. The first is the list of core IDs to be used by the NUMA policy
             for fault programs, and the second is for benchmark programs
+        :param clock_samples: The number of most recent clock synchronization samples among which the one applied to
+            the session clock is selected
         """
         super().__init__(max_requests)
         assert isinstance(msg_server, MessageEntity), 'Messaging object must be a MessageEntity instance!'
@@ -308,39 +318,29 @@ class InjectionThreadPool(ThreadPool):
         self._root = root
         # This flag determines whether we are running in a posix system or not. Used for shell argument parsing
         self._posix_shell = os.name == 'posix'
-        # Timestamps for the starting time of the injection session in absolute and relative time
-        self._session_start = 0
-        self._session_start_abs = 0
-        self._correction_factor = 0
+        # Clock of the injection session, synchronized by the engine with the clock of the session master
+        self.clock = SessionClock(samples=clock_samples)
         # Condition object used to wake up threads that are in sleep state (waiting for their tasks' starting times)
         self._sleepCondition = Condition()
+        # Table of the strings interned by the session master, used to expand its commands and to intern the status
+        # messages sent back. It is reset together with the pool
+        self.stringTable = StringTable()
 
-    def reset_session(self, timestamp, abs_timestamp):
+    def add_clock_sample(self, t0, t1, t2, t3):
         """
-        Resets the internal timestamps to the starting time of a new injection session
-        
-        :param timestamp: The relative timestamp of the new injection session
-        :param abs_timestamp: The absolute timestamp of the new injection session
-        """
-        self._session_start = timestamp
-        self._session_start_abs = abs_timestamp
-
-    def correct_time(self, timestamp):
-        """
-        This method applies correction to the local clock if necessary
+        Updates the session clock with the result of a clock synchronization exchange with the master
 
-        We compare the timestamp of the injector server (in relative workload time) to the local timestamp of the pool.
-        If the local clock drifts against the remote clock by more than a threshold, we compute an adaptive correction
-        factor for it. In other words, the correction is applied when the pool is "too much behind or in advance in
-        the workload's time" against the remote clock.
+        Threads waiting for the starting times of their tasks are woken up, so that they apply the correction.
 
-        :param timestamp: The workload timestamp of the injector host
+        :param t0: The local time at which the probe was sent
+        :param t1: The time of the master at which the probe was received
+        :param t2: The time of the master at which the reply was sent
+        :param t3: The local time at which the reply was received
         """
-        my_timestamp = time() - self._session_start_abs + self._session_start
-        diff = timestamp - my_timestamp - self._correction_factor
-        if abs(diff) > InjectionThreadPool.CORRECTION_THRESHOLD and self._session_start_abs > 0:
-            InjectionThreadPool.logger.warning("Clock is drifting by %s secs against the controller's clock" % str(diff))
-            self._correction_factor += 0.1 * diff
+        self.clock.add_sample(t0, t1, t2, t3)
+        self._sleepCondition.acquire()
+        self._sleepCondition.notify_all()
+        self._sleepCondition.release()
 
     def stop(self, kill_abruptly=True):
         """
@@ -372,9 +372,9 @@ class InjectionThreadPool(ThreadPool):
                 self._threads[i] = None
             self._initialized = False
             self._threads.clear()
-            self._session_start = 0
-            self._session_start_abs = 0
+            self.clock.reset(0)
             self._retry_tasks = retry_tasks_old
+            self.stringTable.reset()
             ThreadPool.logger.debug('Thread pool successfully stopped')
 
     def _execute_task(self, task):
@@ -384,14 +384,15 @@ class InjectionThreadPool(ThreadPool):
         
         :param task: The task object, in this case a Task instantiation 
         """
-        # The elapsed time since the start of the session is computed
-        elapsed_time = time() - self._session_start_abs + self._correction_factor
-        # The time that is left until the scheduled start of the task is computed, and we sleep until that time
-        time_to_task = task.timestamp - self._session_start - elapsed_time
+        # The time that is left until the scheduled start of the task is computed, and we sleep until that time.
+        # Since the session clock may be corrected while sleeping, the time left is computed again when woken up
+        time_to_task = task.timestamp - self.clock.now()
         if time_to_task > 0:
-            self._sleepCondition.acquire()
-            self._sleepCondition.wait(time_to_task)
-            self._sleepCondition.release()
+            while time_to_task > 0 and not current_thread().has_to_terminate():
+                self._sleepCondition.acquire()
+                self._sleepCondition.wait(time_to_task)
+                self._sleepCondition.release()
+                time_to_task = task.timestamp - self.clock.now()
         # If the scheduled start time for the task has already passed (is expired) we can either skip it
         # (if skip_expired is True) or still start it immediately
         elif time_to_task < 0 and self._skip_expired:
@@ -408,6 +409,9 @@ class InjectionThreadPool(ThreadPool):
         task_timeout = task_duration if task_duration != Task.VALUE_DUR_NO_LIM else None
         task_end_time = None
         task_start_time = time()
+        # Synchronized tasks also report their start time according to the session clock, which is comparable across
+        # engines
+        task_start_clock = self.clock.now() if task.sync else None
         # We spawn a subprocess running the task with its arguments
         p = current_thread().start_process(args=task_args, root=self._root, stdout=PIPE, stderr=subprocess.STDOUT, shell=is_script)
         if p is None and not current_thread().has_to_terminate():
@@ -422,7 +426,7 @@ class InjectionThreadPool(ThreadPool):
         outdata = ''
         InjectionThreadPool.logger.info('Executing new task %s' % task.args)
         # All connected hosts are informed that the task has been started
-        self._inform_start(task, task_start_time)
+        self._inform_start(task, task_start_time, task_start_clock)
         rcode = 0
         try:
             # If there is no timeout for the task, we just wait for its termination and store its return code
@@ -471,17 +475,18 @@ class InjectionThreadPool(ThreadPool):
         else:
             InjectionThreadPool.logger.info('Task %s terminated normally' % task.args)
 
-    def _inform_start(self, task, timestamp):
+    def _inform_start(self, task, timestamp, start=None):
         """
         Method that sends a broadcast message to all connected hosts when a task is started
         
         :param task: The msg related to the task that has been started
         :param timestamp: The timestamp related to the starting time
+        :param start: The starting time according to the session clock, for synchronized tasks
         """
         task.timestamp = timestamp
-        msg = MessageBuilder.status_start(task)
+        msg = MessageBuilder.status_start(task, start)
         if msg is not None:
-            self._server.broadcast_msg(msg)
+            self._server.broadcast_msg(self.stringTable.intern(msg, assign=False))
 
     def _inform_restart(self, task, timestamp, rcode):
         """
@@ -495,7 +500,7 @@ class InjectionThreadPool(ThreadPool):
         error = None if rcode == 0 else rcode
         msg = MessageBuilder.status_restart(task, error)
         if msg is not None:
-            self._server.broadcast_msg(msg)
+            self._server.broadcast_msg(self.stringTable.intern(msg, assign=False))
 
     def _process_result(self, task, timestamp, rcode, outdata=''):
         """
@@ -515,7 +520,7 @@ class InjectionThreadPool(ThreadPool):
         else:
             msg = MessageBuilder.status_end(task, outdata)
         if msg is not None and not current_thread().has_to_terminate():
-            self._server.broadcast_msg(msg)
+            self._server.broadcast_msg(self.stringTable.intern(msg, assign=False))
 
     def format_task_args(self, task):
         """
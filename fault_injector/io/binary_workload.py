@@ -0,0 +1,289 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging, mmap, struct
+from fault_injector.io.reader import Reader, CSVReader
+from fault_injector.io.writer import Writer
+from fault_injector.io.task import Task
+
+
+class BinaryWorkload:
+    """
+    Constants describing the layout of compiled binary workloads.
+
+    A binary workload starts with a header, followed by one fixed-width record for each task, in timestamp order. The
+    args, cores and hosts strings of tasks are stored once in a string table at the end of the file, and records refer
+    to them by their index. Since records are fixed-width and ordered, they can be accessed by position, and the
+    position of any timestamp can be found with a binary search.
+    """
+
+    EXT = '.bwl'
+    MAGIC = b'FINJWL01'
+    # Magic, number of tasks, number of strings, offset of the string table
+    HEADER = struct.Struct('<8sQQQ')
+    # Timestamp, duration, seqNum, args, cores and hosts string IDs, isFault, sync
+    RECORD = struct.Struct('<qqqIIIBB2x')
+    TIMESTAMP = struct.Struct('<q')
+    # Offsets of the strings in the string table
+    OFFSET = struct.Struct('<Q')
+    # Values used in records in place of None
+    NONE_INT = -2 ** 63
+    NONE_STRING = 2 ** 32 - 1
+
+
+class BinaryWorkloadWriter(Writer):
+    """
+    Writer class that compiles Task objects into a binary workload. Records are kept in memory, and the file is
+    written when the writer is closed
+    """
+
+    # Logger for the class
+    logger = logging.getLogger('BinaryWorkloadWriter')
+
+    @staticmethod
+    def compile(csv_path, path):
+        """
+        Compiles a CSV workload into a binary one
+
+        :param csv_path: Path of the CSV workload
+        :param path: Path of the binary workload
+        :return: The number of compiled tasks
+        """
+        reader = CSVReader(csv_path)
+        writer = BinaryWorkloadWriter(path)
+        task = reader.read_entry()
+        while task is not None:
+            writer.write_entry(task)
+            task = reader.read_entry()
+        reader.close()
+        return writer.close()
+
+    def __init__(self, path):
+        """
+        Constructor for the class
+
+        :param path: Path of the output file
+        """
+        super().__init__(path)
+        self._records = bytearray()
+        self._nTasks = 0
+        self._strings = []
+        self._stringIds = {}
+        self._lastTimestamp = None
+        self._sorted = True
+
+    def write_entry(self, entry):
+        """
+        Adds a Task to the workload
+
+        :param entry: The Task object
+        :return: True if successful, False otherwise
+        """
+        if not isinstance(entry, Task):
+            BinaryWorkloadWriter.logger.error('Input Task to write_entry is malformed')
+            return False
+        timestamp = entry.timestamp if entry.timestamp is not None else BinaryWorkload.NONE_INT
+        if self._lastTimestamp is not None and timestamp < self._lastTimestamp:
+            self._sorted = False
+        self._lastTimestamp = timestamp
+        self._records += BinaryWorkload.RECORD.pack(
+            timestamp, entry.duration if entry.duration is not None else BinaryWorkload.NONE_INT,
+            entry.seqNum if entry.seqNum is not None else BinaryWorkload.NONE_INT, self._intern(entry.args),
+            self._intern(entry.cores), self._intern(entry.hosts), 1 if entry.isFault else 0,
+            1 if entry.sync else 0)
+        self._nTasks += 1
+        return True
+
+    def close(self):
+        """
+        Writes the binary workload to the output file
+
+        :return: The number of tasks written
+        """
+        records = self._records
+        size = BinaryWorkload.RECORD.size
+        if not self._sorted:
+            # Tasks are expected to be ordered by timestamp, but sorting them here is cheap
+            BinaryWorkloadWriter.logger.warning('Workload %s is not ordered by timestamp, sorting it' % self._path)
+            order = sorted(range(self._nTasks), key=lambda i: BinaryWorkload.TIMESTAMP.unpack_from(records, i * size)[0])
+            records = b''.join(records[i * size:(i + 1) * size] for i in order)
+        encoded = [s.encode() for s in self._strings]
+        table_offset = BinaryWorkload.HEADER.size + len(records)
+        with open(self._path, 'wb') as out_file:
+            out_file.write(BinaryWorkload.HEADER.pack(BinaryWorkload.MAGIC, self._nTasks, len(encoded), table_offset))
+            out_file.write(records)
+            # The offsets of strings are relative to the end of the offsets array, with one more entry marking the end
+            offset = 0
+            for data in encoded:
+                out_file.write(BinaryWorkload.OFFSET.pack(offset))
+                offset += len(data)
+            out_file.write(BinaryWorkload.OFFSET.pack(offset))
+            for data in encoded:
+                out_file.write(data)
+        self._records = bytearray()
+        return self._nTasks
+
+    def _intern(self, string):
+        """
+        Returns the ID of a string in the string table, adding it if needed
+
+        :param string: The string, or None
+        :return: The ID of the string
+        """
+        if string is None:
+            return BinaryWorkload.NONE_STRING
+        s_id = self._stringIds.get(string)
+        if s_id is None:
+            s_id = self._stringIds[string] = len(self._strings)
+            self._strings.append(string)
+        return s_id
+
+
+class BinaryWorkloadReader(Reader):
+    """
+    Reader class for binary workloads, which are memory-mapped. Besides sequential reading, it supports seeking to
+    any task by its position or by its timestamp
+    """
+
+    # Logger for the class
+    logger = logging.getLogger('BinaryWorkloadReader')
+
+    def __init__(self, path):
+        """
+        Constructor for the class
+
+        :param path: Path of the binary workload
+        """
+        super().__init__(path)
+        self._file = None
+        self._map = None
+        self._pos = 0
+        self._nTasks = 0
+        # Strings are decoded once, the first time they are read
+        self._strings = {}
+        try:
+            self._file = open(path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self._nTasks, self._nStrings, self._tableOffset = BinaryWorkload.HEADER.unpack_from(self._map, 0)
+            if magic != BinaryWorkload.MAGIC:
+                raise ValueError('not a binary workload')
+            self._dataOffset = self._tableOffset + BinaryWorkload.OFFSET.size * (self._nStrings + 1)
+        except (OSError, ValueError, struct.error) as e:
+            BinaryWorkloadReader.logger.error('Cannot read workload from path %s: %s' % (path, e))
+            self._nTasks = 0
+            self.close()
+
+    def read_entry(self):
+        """
+        Reads the next Task from the workload
+
+        :return: a Task object, or None if the end of the workload was reached
+        """
+        if self._map is None or self._pos >= self._nTasks:
+            return None
+        timestamp, duration, seq_num, args, cores, hosts, is_fault, sync = BinaryWorkload.RECORD.unpack_from(
+            self._map, BinaryWorkload.HEADER.size + self._pos * BinaryWorkload.RECORD.size)
+        self._pos += 1
+        none_int = BinaryWorkload.NONE_INT
+        return Task(args=self._get_string(args), timestamp=timestamp if timestamp != none_int else None,
+                    duration=duration if duration != none_int else None,
+                    seqNum=seq_num if seq_num != none_int else None, isFault=is_fault == 1,
+                    cores=self._get_string(cores), hosts=self._get_string(hosts), sync=sync == 1)
+
+    def get_n_tasks(self):
+        """
+        Returns the number of tasks in the workload
+
+        :return: An integer
+        """
+        return self._nTasks
+
+    def tell(self):
+        """
+        Returns the position of the next task to be read
+
+        :return: The number of tasks before it
+        """
+        return self._pos
+
+    def seek(self, pos):
+        """
+        Moves to the task at a given position
+
+        :param pos: The number of tasks before it
+        """
+        self._pos = max(0, min(pos, self._nTasks))
+
+    def seek_time(self, timestamp):
+        """
+        Moves to the first task whose timestamp is equal or greater than the given one, with a binary search
+
+        :param timestamp: The timestamp in workload time
+        :return: The position of the task
+        """
+        low, high = 0, self._nTasks
+        while low < high:
+            mid = (low + high) // 2
+            if self._get_timestamp(mid) < timestamp:
+                low = mid + 1
+            else:
+                high = mid
+        self._pos = low
+        return low
+
+    def close(self):
+        """
+        Unmaps and closes the workload file
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _get_timestamp(self, pos):
+        """
+        Returns the timestamp of the task at a given position
+
+        :param pos: The position of the task
+        :return: The timestamp
+        """
+        return BinaryWorkload.TIMESTAMP.unpack_from(self._map, BinaryWorkload.HEADER.size + pos * BinaryWorkload.RECORD.size)[0]
+
+    def _get_string(self, s_id):
+        """
+        Returns a string from the string table
+
+        :param s_id: The ID of the string
+        :return: The string, or None
+        """
+        if s_id == BinaryWorkload.NONE_STRING:
+            return None
+        string = self._strings.get(s_id)
+        if string is None:
+            pos = self._tableOffset + s_id * BinaryWorkload.OFFSET.size
+            start, end = struct.unpack_from('<QQ', self._map, pos)
+            string = self._strings[s_id] = self._map[self._dataOffset + start:self._dataOffset + end].decode()
+        return string
@@ -0,0 +1,299 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging, os, struct
+from threading import RLock
+from fault_injector.io.writer import CSVWriter
+from fault_injector.network.msg_builder import MessageBuilder
+from fault_injector.network.msg_compression import Compression
+from fault_injector.util.misc import formatipport, strtoaddr, format_task_filename, format_output_directory, OUT_PREFIX
+
+
+class OutputArchiveWriter:
+    """
+    Class that stores the outputs of the tasks of a session in a single append-only archive, instead of one file per
+    task.
+
+    The archive is made of a data file, containing the length-prefixed (and optionally compressed) outputs, and of a
+    text index file, with one line for each output containing its host, sequence number, task name, offset and length
+    in the data file. Outputs are buffered in memory, and compressed and appended to the archive when flushed.
+    """
+
+    # Logger for the class
+    logger = logging.getLogger('OutputArchiveWriter')
+
+    DATA_EXT = '.dat'
+    INDEX_EXT = '.idx'
+    # Length prefix of records in the data file. Records start with a byte identifying their compression codec
+    RECORD_HEADER = struct.Struct('>I')
+
+    @staticmethod
+    def rotate(path):
+        """
+        Renames an existing archive, so that a new one can be created at the same path. The first free numeric suffix
+        is appended to the names of its files
+
+        :param path: Path of the archive, without extension
+        """
+        if not os.path.isfile(path + OutputArchiveWriter.DATA_EXT):
+            return
+        k = 1
+        while os.path.isfile('%s.%s%s' % (path, k, OutputArchiveWriter.DATA_EXT)):
+            k += 1
+        for ext in (OutputArchiveWriter.DATA_EXT, OutputArchiveWriter.INDEX_EXT):
+            if os.path.isfile(path + ext):
+                os.rename(path + ext, '%s.%s%s' % (path, k, ext))
+
+    def __init__(self, path, flusher=None, codec=Compression.CODEC_NONE, level=None, position=None):
+        """
+        Constructor for the class. An existing archive at the same path is rotated, unless a position is given
+
+        :param path: Path of the archive, without extension
+        :param flusher: A LogFlusher object used to write buffered outputs from a background thread. If None, outputs
+            are written immediately
+        :param codec: The codec used to compress outputs, one of the Compression.CODEC_* constants
+        :param level: The compression level. If None, the default of the codec is used
+        :param position: If not None, an existing archive is truncated to this position, as returned by get_position,
+            and new outputs are appended to it
+        """
+        self._path = path
+        self._flusher = flusher
+        self._codec = codec
+        self._level = level
+        self._pending = []
+        # Outputs are swapped out under a lock, while the files are written under a separate lock. The locks are
+        # re-entrant, as the archive is closed by signal handlers as well
+        self._pendingLock = RLock()
+        self._fileLock = RLock()
+        self._dataFile = None
+        self._indexFile = None
+        self._offset = 0
+        try:
+            if position is not None and os.path.isfile(path + OutputArchiveWriter.DATA_EXT):
+                self._offset = position[0]
+                os.truncate(path + OutputArchiveWriter.DATA_EXT, position[0])
+                os.truncate(path + OutputArchiveWriter.INDEX_EXT, position[1])
+                self._dataFile = open(path + OutputArchiveWriter.DATA_EXT, 'ab')
+                self._indexFile = open(path + OutputArchiveWriter.INDEX_EXT, 'a')
+            else:
+                OutputArchiveWriter.rotate(path)
+                self._dataFile = open(path + OutputArchiveWriter.DATA_EXT, 'wb')
+                self._indexFile = open(path + OutputArchiveWriter.INDEX_EXT, 'w')
+            if self._flusher is not None:
+                self._flusher.register(self)
+        except OSError as e:
+            OutputArchiveWriter.logger.error('Cannot create output archive at path %s: %s' % (path, e))
+            self._dataFile = None
+
+    def get_path(self):
+        """
+        Returns the path of the archive, without extension
+
+        :return: A path
+        """
+        return self._path
+
+    def write_output(self, addr, msg):
+        """
+        Adds the output of a task to the archive
+
+        :param addr: The address of the host that executed the task
+        :param msg: The task end message, containing the output
+        :return: True if successful, False otherwise
+        """
+        if self._dataFile is None:
+            OutputArchiveWriter.logger.error('No open output archive to write to')
+            return False
+        entry = (formatipport(addr), msg[MessageBuilder.FIELD_SEQNUM], format_task_filename(msg),
+                 msg[MessageBuilder.FIELD_OUTPUT])
+        with self._pendingLock:
+            self._pending.append(entry)
+        if self._flusher is None:
+            self.flush()
+        return True
+
+    def flush(self):
+        """
+        Compresses and appends all buffered outputs to the archive
+        """
+        with self._fileLock:
+            with self._pendingLock:
+                pending = self._pending
+                self._pending = []
+            if len(pending) == 0 or self._dataFile is None:
+                return
+            try:
+                for host, seq_num, name, output in pending:
+                    data = output.encode()
+                    if self._codec != Compression.CODEC_NONE:
+                        data = Compression.compress(self._codec, data, self._level)
+                    else:
+                        data = bytes((Compression.CODEC_NONE,)) + data
+                    self._dataFile.write(OutputArchiveWriter.RECORD_HEADER.pack(len(data)))
+                    self._dataFile.write(data)
+                    self._indexFile.write(CSVWriter.DELIMITER_CHAR.join((host, str(seq_num), name, str(self._offset),
+                                                                         str(len(data)))) + '\n')
+                    self._offset += OutputArchiveWriter.RECORD_HEADER.size + len(data)
+                # The data file is flushed first, so that the index never refers to missing data
+                self._dataFile.flush()
+                self._indexFile.flush()
+            except OSError as e:
+                OutputArchiveWriter.logger.error('Cannot write %s outputs to archive %s: %s' % (len(pending), self._path, e))
+
+    def get_position(self):
+        """
+        Writes all buffered outputs, and returns the sizes of the files of the archive
+
+        :return: A [data size, index size] list, or None if the archive is not open
+        """
+        self.flush()
+        with self._fileLock:
+            if self._dataFile is None:
+                return None
+            return [self._dataFile.tell(), self._indexFile.tell()]
+
+    def close(self):
+        """
+        Writes all buffered outputs and closes the archive
+        """
+        if self._flusher is not None:
+            self._flusher.unregister(self)
+        self.flush()
+        with self._fileLock:
+            if self._dataFile is not None:
+                self._dataFile.close()
+                self._indexFile.close()
+                self._dataFile = None
+
+
+class OutputArchiveReader:
+    """
+    Class that reads the task outputs stored in an archive created by OutputArchiveWriter
+    """
+
+    # Logger for the class
+    logger = logging.getLogger('OutputArchiveReader')
+
+    def __init__(self, path):
+        """
+        Constructor for the class
+
+        :param path: Path of the archive, with or without extension
+        """
+        for ext in (OutputArchiveWriter.DATA_EXT, OutputArchiveWriter.INDEX_EXT):
+            if path.endswith(ext):
+                path = path[:-len(ext)]
+        self._path = path
+        # List of (host, seqNum, name) entries in the order they were written, and dictionary from (host, seqNum)
+        # keys to (name, offset, length) tuples
+        self._entries = []
+        self._index = {}
+        self._dataFile = None
+        try:
+            with open(path + OutputArchiveWriter.INDEX_EXT, 'r') as index_file:
+                for line in index_file:
+                    # Task names may contain the delimiter, and are parsed from both ends of the line
+                    fields = line.rstrip('\n').split(CSVWriter.DELIMITER_CHAR, 2)
+                    fields = fields[:2] + fields[2].rsplit(CSVWriter.DELIMITER_CHAR, 2) if len(fields) == 3 else []
+                    if not line.endswith('\n') or len(fields) != 5:
+                        # The last line may be truncated if the controller was killed
+                        continue
+                    host, seq_num, name, offset, length = fields
+                    key = (host, int(seq_num))
+                    if key not in self._index:
+                        self._entries.append((host, int(seq_num), name))
+                    self._index[key] = (name, int(offset), int(length))
+            self._dataFile = open(path + OutputArchiveWriter.DATA_EXT, 'rb')
+        except (OSError, ValueError) as e:
+            OutputArchiveReader.logger.error('Cannot read output archive at path %s: %s' % (path, e))
+
+    def get_path(self):
+        """
+        Returns the path of the archive, without extension
+
+        :return: A path
+        """
+        return self._path
+
+    def get_entries(self, host=None):
+        """
+        Returns the outputs stored in the archive
+
+        :param host: If not None, only the outputs of the host with this ip:port address are returned
+        :return: A list of (host, seqNum, name) tuples
+        """
+        return [e for e in self._entries if host is None or e[0] == host]
+
+    def read_output(self, host, seq_num):
+        """
+        Reads the output of a task
+
+        :param host: The ip:port address of the host that executed the task
+        :param seq_num: The sequence number of the task
+        :return: The output as a string, or None if it is not in the archive
+        """
+        entry = self._index.get((host, seq_num))
+        if entry is None or self._dataFile is None:
+            return None
+        name, offset, length = entry
+        self._dataFile.seek(offset + OutputArchiveWriter.RECORD_HEADER.size)
+        data = self._dataFile.read(length)
+        try:
+            if len(data) != length:
+                raise ValueError('Truncated record')
+            data = data[1:] if data[0] == Compression.CODEC_NONE else Compression.decompress(data)
+        except ValueError as e:
+            OutputArchiveReader.logger.error('Corrupt output of task %s on host %s: %s' % (seq_num, host, e))
+            return None
+        return data.decode()
+
+    def extract_all(self, results_dir, workload_name=None):
+        """
+        Extracts all outputs to one file per task, with the same layout produced by controllers when the archive is
+        not used
+
+        :param results_dir: Directory in which the output directories of hosts are created
+        :param workload_name: Name of the workload of the session, or None for listening sessions
+        :return: The number of extracted outputs
+        """
+        count = 0
+        for host, seq_num, name in self._entries:
+            output = self.read_output(host, seq_num)
+            if output is None:
+                continue
+            out_dir = format_output_directory(results_dir, tuple(strtoaddr(host)), workload_name)
+            if not os.path.isdir(out_dir):
+                os.makedirs(out_dir)
+            with open(out_dir + OUT_PREFIX + name + '.log', 'w') as out_file:
+                out_file.write(output)
+            count += 1
+        return count
+
+    def close(self):
+        """
+        Closes the archive
+        """
+        if self._dataFile is not None:
+            self._dataFile.close()
+            self._dataFile = None
@@ -58,6 +58,24 @@ class Reader(ABC):
         """
         raise(NotImplementedError, 'This method must be implemented!')
 
+    @abstractmethod
+    def tell(self):
+        """
+        Returns the position of the next entry to be read
+
+        :return: The number of entries before it
+        """
+        raise (NotImplementedError, 'This method must be implemented!')
+
+    @abstractmethod
+    def seek(self, pos):
+        """
+        Moves to the entry at a given position, as returned by tell
+
+        :param pos: The number of entries before it
+        """
+        raise (NotImplementedError, 'This method must be implemented!')
+
     @abstractmethod
     def close(self):
         """
@@ -95,13 +113,10 @@ class CSVReader(Reader):
         :param path: Path of the workload file
         """
         super().__init__(path)
-        try:
-            self._rfile = open(self._path, 'r')
-            self._reader = csv.DictReader(self._rfile, delimiter=CSVWriter.DELIMITER_CHAR, quotechar=CSVWriter.QUOTE_CHAR,
-                                          restval=CSVWriter.NONE_VALUE)
-        except (FileNotFoundError, IOError):
-            CSVReader.logger.error("Cannot read workload from path %s" % self._path)
-            self._reader = None
+        self._rfile = None
+        # Number of entries read so far
+        self._pos = 0
+        self._open()
 
     def read_entry(self):
         """
@@ -117,6 +132,7 @@ class CSVReader(Reader):
         except (StopIteration, IOError):
             self._rfile.close()
             return None
+        self._pos += 1
         # After reading the line, we strip all eventually present spaces and tabs
         filtered_line = {}
         for key, value in line.items():
@@ -129,6 +145,31 @@ class CSVReader(Reader):
                                    "like the attributes of the Task class.")
         return task
 
+    def tell(self):
+        """
+        Returns the position of the next task to be read
+
+        :return: The number of tasks before it
+        """
+        return self._pos
+
+    def seek(self, pos):
+        """
+        Moves to the task at a given position. Since CSV rows have variable length, the tasks before it are read and
+        discarded
+
+        :param pos: The number of tasks before it
+        """
+        if pos < self._pos or self._reader is None:
+            self.close()
+            self._open()
+        while self._reader is not None and self._pos < pos:
+            try:
+                next(self._reader)
+            except (StopIteration, IOError):
+                break
+            self._pos += 1
+
     def close(self):
         """
         Closes the reader file stream
@@ -137,6 +178,19 @@ class CSVReader(Reader):
             self._rfile.close()
             self._reader = None
 
+    def _open(self):
+        """
+        Opens the workload file, positioning the reader at its first entry
+        """
+        self._pos = 0
+        try:
+            self._rfile = open(self._path, 'r')
+            self._reader = csv.DictReader(self._rfile, delimiter=CSVWriter.DELIMITER_CHAR, quotechar=CSVWriter.QUOTE_CHAR,
+                                          restval=CSVWriter.NONE_VALUE)
+        except (FileNotFoundError, IOError):
+            CSVReader.logger.error("Cannot read workload from path %s" % self._path)
+            self._reader = None
+
 
 class ExecutionLogReader(Reader):
     """
@@ -154,13 +208,9 @@ class ExecutionLogReader(Reader):
         """
         super().__init__(path)
         self._rfile = None
-        try:
-            self._rfile = open(self._path, 'r')
-            self._reader = csv.DictReader(self._rfile, delimiter=CSVWriter.DELIMITER_CHAR,
-                                          quotechar=CSVWriter.QUOTE_CHAR, restval=CSVWriter.NONE_VALUE)
-        except (FileNotFoundError, IOError):
-            ExecutionLogReader.logger.error('Cannot read execution log from path %s' % self._path)
-            self._reader = None
+        # Number of entries read so far
+        self._pos = 0
+        self._open()
 
     def read_entry(self):
         """
@@ -175,6 +225,7 @@ class ExecutionLogReader(Reader):
         except (StopIteration, IOError):
             self._rfile.close()
             return None
+        self._pos += 1
         # After reading the line, we strip all eventually present spaces and tabs
         filtered_line = {}
         for key, value in line.items():
@@ -182,6 +233,31 @@ class ExecutionLogReader(Reader):
         filtered_line = self._resolve_none_entries(filtered_line)
         return filtered_line
 
+    def tell(self):
+        """
+        Returns the position of the next entry to be read
+
+        :return: The number of entries before it
+        """
+        return self._pos
+
+    def seek(self, pos):
+        """
+        Moves to the entry at a given position. Since CSV rows have variable length, the entries before it are read and
+        discarded
+
+        :param pos: The number of entries before it
+        """
+        if pos < self._pos or self._reader is None:
+            self.close()
+            self._open()
+        while self._reader is not None and self._pos < pos:
+            try:
+                next(self._reader)
+            except (StopIteration, IOError):
+                break
+            self._pos += 1
+
     def close(self):
         """
         Closes the reader file stream
@@ -189,3 +265,16 @@ class ExecutionLogReader(Reader):
         if self._rfile is not None:
             self._rfile.close()
             self._reader = None
+
+    def _open(self):
+        """
+        Opens the execution log file, positioning the reader at its first entry
+        """
+        self._pos = 0
+        try:
+            self._rfile = open(self._path, 'r')
+            self._reader = csv.DictReader(self._rfile, delimiter=CSVWriter.DELIMITER_CHAR,
+                                          quotechar=CSVWriter.QUOTE_CHAR, restval=CSVWriter.NONE_VALUE)
+        except (FileNotFoundError, IOError):
+            ExecutionLogReader.logger.error('Cannot read execution log from path %s' % self._path)
+            self._reader = None
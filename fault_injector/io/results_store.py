@@ -0,0 +1,247 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging, sqlite3, os
+from threading import RLock
+from fault_injector.io.writer import Writer, ExecutionLogWriter
+from fault_injector.network.msg_builder import MessageBuilder
+from fault_injector.util.misc import formatipport, strtoaddr, format_injection_filename
+
+
+class ResultsStore:
+    """
+    Class that stores the execution log records of all hosts of a session in a single SQLite database, as an
+    alternative to one CSV file per host.
+
+    Records are buffered in memory and inserted in batches, each in a single transaction. The events table has a host
+    column in addition to the fields of MessageBuilder dictionaries, and is indexed by (host, timestamp), seqNum and
+    type, so that queries across hosts do not require scanning all records.
+    """
+
+    # Logger for the class
+    logger = logging.getLogger('ResultsStore')
+
+    FIELD_HOST = 'host'
+    TABLE = 'events'
+    # SQL types of the fields of MessageBuilder dictionaries; the others are stored as text
+    _INT_FIELDS = (MessageBuilder.FIELD_TIME, MessageBuilder.FIELD_SEQNUM, MessageBuilder.FIELD_DUR,
+                   MessageBuilder.FIELD_ISF, MessageBuilder.FIELD_ERR)
+    _INDEXES = ((FIELD_HOST, MessageBuilder.FIELD_TIME), (MessageBuilder.FIELD_SEQNUM,), (MessageBuilder.FIELD_TYPE,))
+
+    def __init__(self, path, flusher=None, batch_size=1000, position=None):
+        """
+        Constructor for the class. Any existing database at the given path is overwritten, unless a position is given
+
+        :param path: Path of the database file
+        :param flusher: A LogFlusher object used to insert buffered records from a background thread. If None, records
+            are inserted by the thread that writes them, once a batch is complete
+        :param batch_size: Number of buffered records above which they are inserted
+        :param position: If not None, records of an existing database inserted after this position, as returned by
+            get_position, are deleted, and new records are added to it
+        """
+        self._path = path
+        self._flusher = flusher
+        self._batchSize = batch_size
+        self._fields = [ResultsStore.FIELD_HOST] + MessageBuilder.FIELDS
+        self._insertQuery = 'INSERT INTO %s (%s) VALUES (%s)' % (ResultsStore.TABLE, ', '.join(self._fields),
+                                                               ', '.join('?' for f in self._fields))
+        self._rows = []
+        # Rows are swapped out under a lock, while the database is accessed under a separate lock. As for execution log
+        # writers, the locks are re-entrant so that the store can be closed by signal handlers
+        self._rowsLock = RLock()
+        self._dbLock = RLock()
+        self._db = None
+        try:
+            if position is not None and os.path.isfile(path):
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                with self._db:
+                    self._db.execute('DELETE FROM %s WHERE id > ?' % ResultsStore.TABLE, (position,))
+                if self._flusher is not None:
+                    self._flusher.register(self)
+                return
+            if os.path.isfile(path):
+                os.remove(path)
+            # The database may be accessed by the thread of the flusher
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            columns = ', '.join('%s %s' % (f, 'INTEGER' if f in ResultsStore._INT_FIELDS else 'TEXT') for f in self._fields)
+            self._db.execute('CREATE TABLE %s (id INTEGER PRIMARY KEY, %s)' % (ResultsStore.TABLE, columns))
+            for index in ResultsStore._INDEXES:
+                self._db.execute('CREATE INDEX %s_%s ON %s (%s)' % (ResultsStore.TABLE, '_'.join(index),
+                                                                  ResultsStore.TABLE, ', '.join(index)))
+            self._db.commit()
+            if self._flusher is not None:
+                self._flusher.register(self)
+        except (sqlite3.Error, OSError) as e:
+            ResultsStore.logger.error('Cannot create results database at path %s: %s' % (path, e))
+            self._db = None
+
+    def get_path(self):
+        """
+        Returns the path of the database file
+
+        :return: A file path
+        """
+        return self._path
+
+    def get_writer(self, addr):
+        """
+        Returns a writer object for the execution log records of a host, which are stored in this database
+
+        :param addr: The address of the host
+        :return: A HostLogWriter object
+        """
+        return HostLogWriter(self, addr)
+
+    def write_entry(self, addr, entry):
+        """
+        Buffers an execution log record of a host
+
+        :param addr: The address of the host
+        :param entry: A MessageBuilder dictionary
+        :return: True if successful, False otherwise
+        """
+        if self._db is None:
+            ResultsStore.logger.error('No open database to write to')
+            return False
+        if not isinstance(entry, dict):
+            ResultsStore.logger.error('Input Dict to write_entry is malformed')
+            return False
+        row = [formatipport(addr)] + [entry.get(f) for f in MessageBuilder.FIELDS]
+        with self._rowsLock:
+            self._rows.append(row)
+            full = len(self._rows) >= self._batchSize
+        if full:
+            if self._flusher is not None:
+                self._flusher.request_flush()
+            else:
+                self.flush()
+        return True
+
+    def flush(self):
+        """
+        Inserts all buffered records in the database, in a single transaction
+        """
+        with self._dbLock:
+            with self._rowsLock:
+                rows = self._rows
+                self._rows = []
+            if len(rows) == 0 or self._db is None:
+                return
+            try:
+                with self._db:
+                    self._db.executemany(self._insertQuery, rows)
+            except sqlite3.Error as e:
+                ResultsStore.logger.error('Cannot write %s records to database %s: %s' % (len(rows), self._path, e))
+
+    def get_position(self):
+        """
+        Inserts all buffered records, and returns the ID of the last one
+
+        :return: An integer ID, or None if the database is not open
+        """
+        self.flush()
+        with self._dbLock:
+            if self._db is None:
+                return None
+            try:
+                return self._db.execute('SELECT COALESCE(MAX(id), 0) FROM %s' % ResultsStore.TABLE).fetchone()[0]
+            except sqlite3.Error as e:
+                ResultsStore.logger.error('Cannot read database %s: %s' % (self._path, e))
+                return None
+
+    def close(self):
+        """
+        Inserts all buffered records and closes the database
+        """
+        if self._flusher is not None:
+            self._flusher.unregister(self)
+        self.flush()
+        with self._dbLock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    @staticmethod
+    def export_csv(path, results_dir, workload_name=None):
+        """
+        Exports the records of a results database to one CSV execution log per host, with the same layout and names
+        produced by the controller when the database is not used
+
+        :param path: Path of the database file
+        :param results_dir: Directory in which execution logs are written
+        :param workload_name: Name of the workload of the session. If None, logs are named as those of listening
+            sessions
+        :return: The list of paths of the written execution logs
+        """
+        db = sqlite3.connect(path)
+        paths = []
+        try:
+            fields = ', '.join(MessageBuilder.FIELDS)
+            for host, in db.execute('SELECT DISTINCT %s FROM %s' % (ResultsStore.FIELD_HOST, ResultsStore.TABLE)).fetchall():
+                out_path = format_injection_filename(results_dir, tuple(strtoaddr(host)), workload_name)
+                writer = ExecutionLogWriter(out_path)
+                query = 'SELECT %s FROM %s WHERE %s = ? ORDER BY id' % (fields, ResultsStore.TABLE, ResultsStore.FIELD_HOST)
+                for row in db.execute(query, (host,)):
+                    entry = dict(zip(MessageBuilder.FIELDS, row))
+                    if entry[MessageBuilder.FIELD_ISF] is not None:
+                        entry[MessageBuilder.FIELD_ISF] = bool(entry[MessageBuilder.FIELD_ISF])
+                    writer.write_entry(entry)
+                writer.close()
+                paths.append(out_path)
+        finally:
+            db.close()
+        return paths
+
+
+class HostLogWriter(Writer):
+    """
+    Writer class for the execution log records of a single host, which are stored in a shared ResultsStore database.
+    It can be used in place of an ExecutionLogWriter
+    """
+
+    def __init__(self, store, addr):
+        """
+        Constructor for the class
+
+        :param store: The ResultsStore object
+        :param addr: The address of the host
+        """
+        super().__init__(store.get_path())
+        self._store = store
+        self._addr = addr
+
+    def write_entry(self, entry):
+        """
+        Writes an entry to the execution log of the host
+
+        :param entry: a MessageBuilder dictionary
+        :return: True if successful, False otherwise
+        """
+        return self._store.write_entry(self._addr, entry)
+
+    def close(self):
+        """
+        Does nothing, as the database is shared by all hosts and is closed with the ResultsStore object
+        """
+        pass
@@ -33,19 +33,27 @@ class Task:
     # Hardcoded value to represent Tasks that have no bounded duration
     VALUE_DUR_NO_LIM = 0
 
-    def __init__(self, args='', timestamp=0, duration=0, seqNum=0, isFault=False, cores='0'):
+    # Attributes that may be missing from workload entries, in which case their default value is used
+    OPTIONAL_FIELDS = ('hosts', 'sync')
+
+    def __init__(self, args='', timestamp=0, duration=0, seqNum=0, isFault=False, cores='0', hosts=None, sync=False):
         self.args = args
         self.timestamp = timestamp
         self.duration = duration
         self.seqNum = seqNum
         self.isFault = isFault
         self.cores = cores
+        # Engine addresses and tags targeted by the task, separated by CSVWriter.L1_DELIMITER_CHAR. If None, the task
+        # is sent to all engines
+        self.hosts = hosts
+        # If True, the task must start at the same instant on all of the engines it targets
+        self.sync = sync
 
     @staticmethod
     def dict_to_task(entry):
         """
         Converts a dictionary to a Task object. Mind that the dictionary MUST contain all of the attributes in the Task
-        class, with the same naming
+        class, with the same naming, except for the optional ones
         
         :param entry: a dictionary
         :return: a Task object
@@ -55,8 +63,13 @@ class Task:
         t = Task()
         try:
             for a in vars(t):
+                if a in Task.OPTIONAL_FIELDS and a not in entry:
+                    continue
                 v_type = type(getattr(t, a))
-                if entry[a] is not None:
+                if entry[a] is not None and getattr(t, a) is None:
+                    # Attributes with no default value are kept as strings
+                    v = entry[a]
+                elif entry[a] is not None:
                     v = v_type(entry[a]) if v_type != bool else entry[a] == 'True'
                 else:
                     v = None
@@ -97,4 +110,5 @@ class Task:
         t.timestamp = msg[MessageBuilder.FIELD_TIME]
         t.duration = msg[MessageBuilder.FIELD_DUR]
         t.cores = msg[MessageBuilder.FIELD_CORES] if MessageBuilder.FIELD_CORES in msg else None
+        t.sync = msg.get(MessageBuilder.FIELD_SYNC, False)
         return t
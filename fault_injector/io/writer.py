@@ -22,7 +22,9 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import csv, logging
+import csv, logging, os
+from io import StringIO
+from threading import Thread, Condition, RLock
 from abc import ABC, abstractmethod
 from fault_injector.io.task import Task
 from fault_injector.network.msg_builder import MessageBuilder
@@ -139,31 +141,145 @@ class CSVWriter(Writer):
             self._writer = None
 
 
+class LogFlusher:
+    """
+    Class that flushes the buffers of a set of ExecutionLogWriter objects to disk from a background thread, either
+    periodically or when one of the buffers grows too large
+    """
+
+    # Logger for the class
+    logger = logging.getLogger('LogFlusher')
+
+    def __init__(self, interval=1, fsync=False):
+        """
+        Constructor for the class
+
+        :param interval: Maximum time in seconds for which written entries are kept in memory
+        :param fsync: If True, files are synchronized to the storage device after each flush, and not only written to
+            the page cache of the operating system
+        """
+        self.interval = interval
+        self.fsync = fsync
+        self._writers = set()
+        self._cond = Condition()
+        self._flushRequested = False
+        self._thread = None
+        self._stopped = False
+
+    def register(self, writer):
+        """
+        Adds a writer to the set of flushed ones, starting the flushing thread if needed
+
+        :param writer: An ExecutionLogWriter object
+        """
+        with self._cond:
+            self._writers.add(writer)
+            if self._thread is None:
+                self._stopped = False
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def unregister(self, writer):
+        """
+        Removes a writer from the set of flushed ones
+
+        :param writer: An ExecutionLogWriter object
+        """
+        with self._cond:
+            self._writers.discard(writer)
+
+    def request_flush(self):
+        """
+        Wakes up the flushing thread before its period expires
+        """
+        with self._cond:
+            self._flushRequested = True
+            self._cond.notify()
+
+    def stop(self):
+        """
+        Stops the flushing thread, after flushing all writers one last time
+        """
+        with self._cond:
+            thread = self._thread
+            self._thread = None
+            self._stopped = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+        self.flush_all()
+
+    def flush_all(self):
+        """
+        Flushes the buffers of all writers
+        """
+        with self._cond:
+            writers = list(self._writers)
+        for writer in writers:
+            writer.flush()
+
+    def _run(self):
+        """
+        Main loop of the flushing thread
+        """
+        while True:
+            with self._cond:
+                if not self._stopped and not self._flushRequested:
+                    self._cond.wait(self.interval)
+                if self._stopped:
+                    break
+                self._flushRequested = False
+            self.flush_all()
+
+
 class ExecutionLogWriter(Writer):
     """
     Writer class for execution log records corresponding to injection or listening sessions
+
+    If a LogFlusher object is supplied, entries are written to an in-memory buffer, which is flushed to disk by the
+    background thread of the flusher. Otherwise, the file is flushed after each entry.
     """
 
     # Logger for the class
     logger = logging.getLogger('ExecutionLogWriter')
 
-    def __init__(self, path):
+    def __init__(self, path, flusher=None, buffer_size=65536, position=None):
         """
         Constructor for the class
         
         :param path: path of the output file 
+        :param flusher: A LogFlusher object used to flush the buffer of the writer. If None, no buffer is used
+        :param buffer_size: Size in characters of the buffer above which an early flush is requested to the flusher
+        :param position: If not None, an existing file is truncated to this position, as returned by get_position,
+            and new entries are appended to it. Otherwise, the file is overwritten
         """
         super().__init__(path)
         self._wfile = None
+        self._flusher = flusher
+        self._bufferSize = buffer_size
+        self._buffer = StringIO() if flusher is not None else None
+        # The buffer is swapped out under a lock, while writes to the file are serialized by a separate lock, so that
+        # the thread writing entries is never blocked by disk I/O. The locks are re-entrant, as the writer is closed by
+        # signal handlers, which may interrupt the main thread while it is holding them
+        self._bufferLock = RLock()
+        self._fileLock = RLock()
         # The fields written in the CSV file correspond to those of a MessageBuilder dictionary
         self._fieldnames = MessageBuilder.FIELDS
         fieldict = {k: k for k in self._fieldnames}
         try:
-            self._wfile = open(self._path, 'w')
-            self._writer = csv.DictWriter(self._wfile, fieldnames=self._fieldnames, delimiter=CSVWriter.DELIMITER_CHAR,
+            resume = position is not None and os.path.isfile(self._path)
+            if resume:
+                # Entries written after the position are discarded, as they will be received again
+                os.truncate(self._path, position)
+            self._wfile = open(self._path, 'a' if resume else 'w')
+            self._writer = csv.DictWriter(self._buffer if self._buffer is not None else self._wfile,
+                                          fieldnames=self._fieldnames, delimiter=CSVWriter.DELIMITER_CHAR,
                                           quotechar=CSVWriter.QUOTE_CHAR, restval=CSVWriter.NONE_VALUE,
                                           extrasaction='ignore')
-            self._writer.writerow(fieldict)
+            if not resume:
+                self._writer.writerow(fieldict)
+            if self._flusher is not None:
+                self._flusher.register(self)
         except (FileNotFoundError, IOError):
             ExecutionLogWriter.logger.error('Cannot write execution log record to path %s' % self._path)
             self._writer = None
@@ -181,8 +297,15 @@ class ExecutionLogWriter(Writer):
         if not isinstance(entry, dict):
             ExecutionLogWriter.logger.error('Input Dict to write_entry is malformed')
             return False
+        entry = self._trim_none_values(entry)
+        if self._buffer is not None:
+            with self._bufferLock:
+                self._writer.writerow(entry)
+                full = self._buffer.tell() >= self._bufferSize
+            if full:
+                self._flusher.request_flush()
+            return True
         try:
-            entry = self._trim_none_values(entry)
             self._writer.writerow(entry)
             self._wfile.flush()
             return True
@@ -190,10 +313,47 @@ class ExecutionLogWriter(Writer):
             self._wfile.close()
             return False
 
+    def flush(self):
+        """
+        Writes the entries in the buffer to the output file
+        """
+        if self._buffer is None:
+            return
+        with self._fileLock:
+            with self._bufferLock:
+                data = self._buffer.getvalue()
+                self._buffer.seek(0)
+                self._buffer.truncate()
+            if len(data) == 0 or self._wfile.closed:
+                return
+            try:
+                self._wfile.write(data)
+                self._wfile.flush()
+                if self._flusher.fsync:
+                    os.fsync(self._wfile.fileno())
+            except (OSError, ValueError) as e:
+                ExecutionLogWriter.logger.error('Cannot write execution log records to path %s: %s' % (self._path, e))
+
+    def get_position(self):
+        """
+        Flushes the buffer, and returns the size of the output file
+
+        :return: The position in the file after the last entry, or None if the file is not open
+        """
+        self.flush()
+        with self._fileLock:
+            if self._wfile is None or self._wfile.closed:
+                return None
+            return self._wfile.tell()
+
     def close(self):
         """
         Closes the output file stream
         """
         if self._wfile is not None:
-            self._wfile.close()
+            if self._flusher is not None:
+                self._flusher.unregister(self)
+            self.flush()
+            with self._fileLock:
+                self._wfile.close()
             self._writer = None
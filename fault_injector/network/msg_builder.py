@@ -43,11 +43,17 @@ class MessageBuilder:
     STATUS_RESET = 'status_reset'
     STATUS_LOST = 'detected_lost'
     STATUS_RESTORED = 'detected_restored'
+    STATUS_FINALIZED = 'detected_finalized'
+    STATUS_RELAY = 'status_relay'
+    STATUS_TIME_PROBE = 'status_time_probe'
+    STATUS_CLOCK = 'status_clock'
+    STATUS_READY = 'status_ready'
 
     COMMAND_START = 'command_start'
     COMMAND_START_SESSION = 'command_session_s'
     COMMAND_SET_TIME = 'command_set_time'
-    COMMAND_CORRECT_TIME = 'command_correct_time'
+    COMMAND_TIME_REPLY = 'command_time_reply'
+    COMMAND_ARM = 'command_arm'
     COMMAND_END_SESSION = 'command_session_e'
     COMMAND_TERMINATE = 'command_term'
     COMMAND_GREET = 'command_greet'
@@ -62,15 +68,37 @@ class MessageBuilder:
     FIELD_OUTPUT = 'output'
     FIELD_ERR = 'error'
     FIELD_CORES = 'cores'
+    # Address of the engine a message refers to, when it is forwarded through a relay
+    FIELD_HOST = 'host'
+    # IDs of the interned args and cores strings of a message, and a dictionary of interned strings by ID
+    FIELD_DATA_ID = 'argsId'
+    FIELD_CORES_ID = 'coresId'
+    FIELD_STRINGS = 'strings'
+    # Tags of an engine, used to target tasks to groups of engines
+    FIELD_TAGS = 'tags'
+    # Number of tasks an engine can execute concurrently, advertised when a session starts
+    FIELD_CAPACITY = 'capacity'
+    # Timestamps of a clock synchronization exchange, which are not truncated like the time field, and the offset, error bound and round-trip delay of a clock
+    FIELD_PROBE = 'probe'
+    FIELD_OFFSET = 'offset'
+    FIELD_CLOCK_ERR = 'clockError'
+    FIELD_RTT = 'rtt'
+    # Flag of synchronized tasks, and precise start time of a synchronized task, as armed or as reported by engines
+    FIELD_SYNC = 'sync'
+    FIELD_START = 'startTime'
 
     # List of all available fields (except output, which is treated separately)
     FIELDS = [FIELD_TIME, FIELD_TYPE, FIELD_DATA, FIELD_SEQNUM, FIELD_DUR, FIELD_ISF, FIELD_CORES, FIELD_ERR]
 
     @staticmethod
-    def ack(timestamp, positive=True, error=None):
+    def ack(timestamp, positive=True, error=None, tags=None, capacity=None):
         msg = {MessageBuilder.FIELD_TYPE: MessageBuilder.ACK_YES if positive else MessageBuilder.ACK_NO}
         if error is not None:
             msg[MessageBuilder.FIELD_ERR] = error
+        if tags:
+            msg[MessageBuilder.FIELD_TAGS] = tags
+        if capacity is not None:
+            msg[MessageBuilder.FIELD_CAPACITY] = capacity
         msg = MessageBuilder._build_fields(msg, None, None, None, timestamp, None, None)
         return msg
 
@@ -87,9 +115,16 @@ class MessageBuilder:
         return msg
 
     @staticmethod
-    def command_correct_time(timestamp):
-        msg = {MessageBuilder.FIELD_TYPE: MessageBuilder.COMMAND_CORRECT_TIME}
-        msg = MessageBuilder._build_fields(msg, None, None, None, timestamp, None, None)
+    def command_time_reply(t0, t1, t2, nonce):
+        msg = {MessageBuilder.FIELD_TYPE: MessageBuilder.COMMAND_TIME_REPLY,
+               MessageBuilder.FIELD_PROBE: [t0, t1, t2, nonce]}
+        msg = MessageBuilder._build_fields(msg, None, None, None, t2, None, None)
+        return msg
+
+    @staticmethod
+    def command_arm(seq_num, start):
+        msg = {MessageBuilder.FIELD_TYPE: MessageBuilder.COMMAND_ARM, MessageBuilder.FIELD_START: start}
+        msg = MessageBuilder._build_fields(msg, None, None, seq_num, start, None, None)
         return msg
 
     @staticmethod
@@ -109,6 +144,38 @@ class MessageBuilder:
         msg = MessageBuilder._build_fields(msg, None, None, None, timestamp, None, None)
         return msg
 
+    @staticmethod
+    def status_finalized(timestamp):
+        msg = {MessageBuilder.FIELD_TYPE: MessageBuilder.STATUS_FINALIZED}
+        msg = MessageBuilder._build_fields(msg, None, None, None, timestamp, None, None)
+        return msg
+
+    @staticmethod
+    def status_relay(timestamp, hosts):
+        msg = {MessageBuilder.FIELD_TYPE: MessageBuilder.STATUS_RELAY}
+        msg = MessageBuilder._build_fields(msg, hosts, None, None, timestamp, None, None)
+        return msg
+
+    @staticmethod
+    def status_time_probe(timestamp, nonce):
+        msg = {MessageBuilder.FIELD_TYPE: MessageBuilder.STATUS_TIME_PROBE,
+               MessageBuilder.FIELD_PROBE: [timestamp, nonce]}
+        msg = MessageBuilder._build_fields(msg, None, None, None, timestamp, None, None)
+        return msg
+
+    @staticmethod
+    def status_clock(timestamp, offset, error, rtt):
+        msg = {MessageBuilder.FIELD_TYPE: MessageBuilder.STATUS_CLOCK, MessageBuilder.FIELD_OFFSET: offset,
+               MessageBuilder.FIELD_CLOCK_ERR: error, MessageBuilder.FIELD_RTT: rtt}
+        msg = MessageBuilder._build_fields(msg, None, None, None, timestamp, None, None)
+        return msg
+
+    @staticmethod
+    def status_ready(timestamp, seq_num):
+        msg = {MessageBuilder.FIELD_TYPE: MessageBuilder.STATUS_READY}
+        msg = MessageBuilder._build_fields(msg, None, None, seq_num, timestamp, None, None)
+        return msg
+
     @staticmethod
     def status_reset(timestamp):
         msg = {MessageBuilder.FIELD_TYPE: MessageBuilder.STATUS_RESET}
@@ -116,20 +183,26 @@ class MessageBuilder:
         return msg
 
     @staticmethod
-    def status_greet(timestamp, num, active):
+    def status_greet(timestamp, num, active, strings=None):
         msg = {MessageBuilder.FIELD_TYPE: MessageBuilder.STATUS_GREET}
+        if strings is not None:
+            msg[MessageBuilder.FIELD_STRINGS] = strings
         msg = MessageBuilder._build_fields(msg, num, None, None, timestamp, active, None)
         return msg
 
     @staticmethod
     def command_start(t):
         msg = {MessageBuilder.FIELD_TYPE: MessageBuilder.COMMAND_START}
+        if t.sync:
+            msg[MessageBuilder.FIELD_SYNC] = True
         msg = MessageBuilder._build_fields(msg, t.args, t.duration, t.seqNum, t.timestamp, t.isFault, t.cores)
         return msg
 
     @staticmethod
-    def status_start(t):
+    def status_start(t, start=None):
         msg = {MessageBuilder.FIELD_TYPE: MessageBuilder.STATUS_START}
+        if start is not None:
+            msg[MessageBuilder.FIELD_START] = start
         msg = MessageBuilder._build_fields(msg, t.args, t.duration, t.seqNum, t.timestamp, t.isFault, t.cores)
         return msg
 
@@ -22,9 +22,13 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import select, socket, logging
+import errno, selectors, socket, struct, logging, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from random import uniform
 from fault_injector.network.msg_entity import MessageEntity
-from fault_injector.util.misc import formatipport
+from fault_injector.network.msg_multicast import MulticastSender
+from fault_injector.util.misc import formatipport, is_unix_addr, UNIX_ID
 from time import time
 
 
@@ -37,45 +41,146 @@ class MessageClient(MessageEntity):
     # Logger for the class
     logger = logging.getLogger('MessageClient')
 
-    def __init__(self, socket_timeout=10, retry_interval=600, retry_period=30, re_send_msgs=False):
+    # Period in seconds of the barriers sent to servers in the multicast stream, from which they detect lost datagrams
+    MCAST_SYNC_INTERVAL = 1
+
+    def __init__(self, socket_timeout=10, retry_interval=600, retry_period=30, re_send_msgs=False, retry_backoff=1,
+                 dns_ttl=300, connect_timeout=10, max_pending_connects=256, **kwargs):
         """
         Constructor for the class
         
         :param socket_timeout: timeout for the sockets
         :param retry_interval: the total span of time in which to retry connections with failed hosts
-        :param retry_period: the period of single connection retries
+        :param retry_period: the maximum period of single connection retries
         :param re_send_msgs: if True, the entity will keep track of sent/received messages, and eventually attempt
             to resend them to hosts that have not received them due to a connection loss
+        :param retry_backoff: the period after the first failed connection retry. It is doubled at each following
+            failure, up to retry_period, and randomized to prevent all lost hosts from being retried at once
+        :param dns_ttl: the time in seconds for which resolved host addresses are cached
+        :param connect_timeout: the timeout in seconds for establishing connections in add_servers
+        :param max_pending_connects: the maximum number of connections that are established concurrently in add_servers
+        :param kwargs: All of the other arguments supported by MessageEntity
         """
-        super().__init__(socket_timeout=socket_timeout, re_send_msgs=re_send_msgs)
-        self._readSet = [self._dummy_sock_r]
+        super().__init__(socket_timeout=socket_timeout, re_send_msgs=re_send_msgs, **kwargs)
         # Dictionary of hosts for which we are trying to re-establish connection, with (ip, port) keys
         self._dangling = {}
+        # Dictionary of pending non-blocking connection attempts to dangling hosts, with (socket, deadline) values
+        self._connecting = {}
+        # Time at which the next dangling host must be processed
+        self._nextRetry = None
+        # Dictionary of resolved addresses for host names, with (ip, timestamp) values
+        self._dnsCache = {}
+        self._resolving = set()
         # Dictionary of last (received, sent) tuples for sequence numbers from connected hosts
         self._seq_nums = {}
         self.retry_interval = retry_interval
         self.retry_period = retry_period
+        self.retry_backoff = retry_backoff
+        self.dns_ttl = dns_ttl
+        self.connect_timeout = connect_timeout
+        self.max_pending_connects = max(max_pending_connects, 1)
+        # Counter used to assign member IDs to servers that join the multicast stream, and time at which barriers
+        # must be sent next
+        self._mcastMemberId = 0
+        self._nextMcastSync = time()
+        if self.multicast_group is not None:
+            try:
+                self._mcastSender = MulticastSender(self.multicast_group, interface=self.multicast_interface,
+                                                    ttl=self.multicast_ttl)
+            except OSError:
+                MessageClient.logger.warning('Multicast is not available, broadcast messages will be sent to each server')
 
     def add_servers(self, addrs):
         """
         Method that opens connection with a specified list of ips/ports of servers
+
+        Connections are established concurrently through non-blocking sockets, with at most max_pending_connects
+        attempts in progress at any time, each of which fails after connect_timeout seconds. Therefore, the time
+        required to connect to all servers depends on the slowest of them, and not on their number.
         
         :param addrs: The addresses of servers to which to connect, in (ip, port) tuple format
+        :return: A (connected, failed, duration) tuple, containing the lists of addresses to which connection was and
+            was not established, and the time in seconds that was required
         """
         if addrs is None:
             MessageClient.logger.error('You must specify one or more addresses to start the client')
-            return
+            return None
         if not isinstance(addrs, (list, tuple)):
             addrs = [addrs]
-        for addr in addrs:
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.connect((socket.gethostbyname(addr[0]), addr[1]))
-                self._register_host(sock)
-                MessageClient.logger.info('Successfully connected to server %s' % formatipport(addr))
-            except (ConnectionError, ConnectionRefusedError, TimeoutError, ConnectionAbortedError, socket.gaierror):
-                MessageClient.logger.warning('Could not connect to %s' % formatipport(addr))
-                pass
+        start_time = time()
+        connected = []
+        failed = []
+        # Host names are resolved concurrently as well, before starting to connect
+        hostnames = list({addr[0] for addr in addrs})
+        if len(hostnames) > 0:
+            with ThreadPoolExecutor(max_workers=min(32, len(hostnames))) as executor:
+                resolved = dict(zip(hostnames, executor.map(self._try_resolve, hostnames)))
+        pending = deque(addrs)
+        # Sockets of in-progress connections, with their (address, deadline) tuples. Since all attempts have the same
+        # timeout, the dictionary is also sorted by deadline
+        in_flight = {}
+        selector = selectors.DefaultSelector()
+        while len(pending) > 0 or len(in_flight) > 0:
+            while len(pending) > 0 and len(in_flight) < self.max_pending_connects:
+                addr = pending.popleft()
+                ip = resolved[addr[0]]
+                sock = self._connect_nonblocking(addr, ip) if ip is not None else None
+                if sock is None:
+                    MessageClient.logger.warning('Could not connect to %s' % formatipport(addr))
+                    failed.append(addr)
+                    continue
+                in_flight[sock] = (addr, time() + self.connect_timeout)
+                selector.register(sock, selectors.EVENT_WRITE)
+            if len(in_flight) == 0:
+                continue
+            timeout = max(next(iter(in_flight.values()))[1] - time(), 0)
+            for key, mask in selector.select(timeout):
+                sock = key.fileobj
+                addr = in_flight.pop(sock)[0]
+                selector.unregister(sock)
+                try:
+                    err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if err != 0:
+                        raise OSError(err, 'Connection failed')
+                    reg_addr = self._register_host(sock)
+                    if self.reSendMsgs and reg_addr in self._seq_nums:
+                        # Messages received by a previous client are known, and only the following ones are forwarded
+                        self._send_msg(self._seq_nums[reg_addr][0], reg_addr, None)
+                    self._join_multicast(reg_addr)
+                    connected.append(addr)
+                    MessageClient.logger.info('Successfully connected to server %s' % formatipport(addr))
+                except OSError:
+                    sock.close()
+                    failed.append(addr)
+                    MessageClient.logger.warning('Could not connect to %s' % formatipport(addr))
+            # Attempts that have exceeded their timeout are aborted
+            time_now = time()
+            for sock, (addr, deadline) in list(in_flight.items()):
+                if deadline > time_now:
+                    break
+                in_flight.pop(sock)
+                selector.unregister(sock)
+                sock.close()
+                failed.append(addr)
+                MessageClient.logger.warning('Connection to %s timed out' % formatipport(addr))
+        selector.close()
+        duration = time() - start_time
+        MessageClient.logger.info('Connected to %s servers out of %s in %.2f seconds' % (len(connected), len(addrs), duration))
+        return connected, failed, duration
+
+    def restore_seq_nums(self, seq_nums):
+        """
+        Sets the sequence numbers of the last messages received from servers, for example by a previous client whose
+        state was saved through get_consumed_seq_nums
+
+        Must be called before add_servers: once connected, servers with re_send_msgs enabled will forward the
+        messages that follow such sequence numbers.
+
+        :param seq_nums: A dictionary from (ip, port) addresses to sequence numbers in tuple format
+        """
+        for addr, seq_num in seq_nums.items():
+            self._update_seq_num(addr, tuple(seq_num), received=True)
+            self._queuedSeqNums[addr] = tuple(seq_num)
 
     def _listen(self):
         """
@@ -85,29 +190,44 @@ class MessageClient(MessageEntity):
         at the message queue and taking action
         """
         MessageClient.logger.info('Client has been started')
+        timeout = self.sock_timeout
         while not self._hasToFinish:
-            try:
-                read, wr, err = select.select(self._readSet, [], self._readSet, self.sock_timeout)
-                for sock in err:
-                    # All of the sockets reported in error state by select must be removed
-                    self._remove_host(sock.getpeername())
-                for sock in read:
-                    if sock == self._dummy_sock_r:
-                        self._flush_output_queue()
-                    elif not self._liveness_check(sock):
-                        self._remove_host(sock.getpeername())
-                    else:
-                        data, seq_num = self._recv_msg(sock)
+            for key, mask in self._selector.select(timeout):
+                sock = key.fileobj
+                if sock is self._dummy_sock_r:
+                    self._flush_output_queue()
+                elif key.data in self._connecting:
+                    self._complete_connection(key.data)
+                elif self._is_registered(key.data):
+                    conn = key.data
+                    peername = conn.addr
+                    # Pending outbound frames are written when the socket becomes writable
+                    if mask & selectors.EVENT_WRITE and not self._flush_connection(conn):
+                        self._remove_host(peername)
+                        continue
+                    if not mask & selectors.EVENT_READ:
+                        continue
+                    msgs = self._recv_msgs(conn)
+                    if msgs is None:
+                        self._remove_host(peername)
+                        continue
+                    for data, seq_num in msgs:
                         if data:
-                            self._add_to_input_queue(sock.getpeername(), data)
-                # We try to re-establish connection with lost hosts, if present
-                self._restore_dangling_connections()
-            except socket.timeout:
-                pass
-            except select.error:
-                self._trim_dead_sockets()
-        for sock in self._registeredHosts.values():
+                            self._add_to_input_queue(peername, data, seq_num if self.reSendMsgs else None)
+            # Heartbeats are sent, and hosts that have stopped responding are removed
+            timeout = self._check_heartbeats()
+            # Servers that lost the last multicast datagrams detect it from the barriers
+            timeout = min(timeout, self._check_multicast())
+            # We try to re-establish connection with lost hosts, if present
+            timeout = min(timeout, self._restore_dangling_connections())
+        for sock, deadline in self._connecting.values():
             sock.close()
+        self._selector.close()
+        self._msgHistory.close()
+        if self._mcastSender is not None:
+            self._mcastSender.close()
+        for conn in self._registeredHosts.values():
+            conn.close()
         MessageClient.logger.info('Client has been shut down')
 
     def _update_seq_num(self, addr, seq_num, received=True):
@@ -121,8 +241,8 @@ class MessageClient(MessageEntity):
         if addr not in self._seq_nums:
             self._seq_nums[addr] = [seq_num, None] if received else [None, seq_num]
             return
-        # We do not check for the value of the new sequence number. This can be done because, since we are using TCP,
-        # we expect data to arrive in the same order as it was originally sent, thus resulting in increasing seq nums
+        # We do not check for the value of the new sequence number. This can be done because messages are sent in a
+        # single lane of a TCP connection, and arrive in the same order as they were sent, with increasing seq nums
         if received:
             self._seq_nums[addr][0] = seq_num
         else:
@@ -139,45 +259,292 @@ class MessageClient(MessageEntity):
         # When connection is lost, we inject a status message for that host in the input queue
         self._add_to_input_queue(address, MessageEntity.CONNECTION_LOST_MSG)
         if not now and address not in self._dangling:
-            first_time = time() - self.retry_period
-            # This list contains two items: the timestamp of when connection was lost, and the timestamp of the last
-            # re-connection attempt
-            self._dangling[address] = [first_time, first_time]
+            time_now = time()
+            # This list contains three items: the timestamp of when connection was lost, the timestamp of the next
+            # re-connection attempt, and the number of failed attempts so far
+            self._dangling[address] = [time_now, time_now, 0]
+            self._nextRetry = time_now
+
+    def _check_multicast(self):
+        """
+        Periodically sends a barrier to the servers that joined the multicast stream, if datagrams were sent since the
+        last one
+
+        Gaps are otherwise detected only from the following datagrams or messages: this way, servers that lost the last
+        datagrams request them even when no more messages are sent.
+
+        :return: The time in seconds until the next check, to be used as timeout for the selector
+        """
+        if self._mcastSender is None:
+            return self.sock_timeout
+        time_now = time()
+        if time_now < self._nextMcastSync:
+            return min(self._nextMcastSync - time_now, self.sock_timeout)
+        to_remove = [addr for addr, conn in self._registeredHosts.items()
+                     if conn.multicast and not self._sync_multicast(conn)]
+        for addr in to_remove:
+            self._remove_host(addr)
+        self._nextMcastSync = time_now + MessageClient.MCAST_SYNC_INTERVAL
+        return min(MessageClient.MCAST_SYNC_INTERVAL, self.sock_timeout)
 
     def _restore_dangling_connections(self):
         """
         Tries to re-establish connection with "dangling" hosts
 
         A "dangling" host is one whose connection has been recently lost, in a time window that falls within
-        retry_interval. If the connection could not be established by the end of the time window, the host is dropped
+        retry_interval. If the connection could not be established by the end of the time window, the host is dropped.
+        Connection attempts are non-blocking, and are completed by the listener loop when the sockets become writable,
+        so that unreachable hosts never delay communication with the others.
+
+        :return: The time in seconds until the next dangling host must be processed, used as timeout for the selector
         """
-        if len(self._dangling) > 0:
-            time_now = time()
-            to_pop = []
-            for addr, time_list in self._dangling.items():
-                # If a dangling host has passed its retry interval, we remove it completely
-                if time_now - time_list[1] > self.retry_interval:
-                    self._add_to_input_queue(addr, MessageEntity.CONNECTION_FINALIZED_MSG)
-                    to_pop.append(addr)
-                # We retry establishing a connection with the dangling host
-                elif time_now - time_list[0] >= self.retry_period:
-                    time_list[0] = time_now
-                    try:
-                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        sock.connect((socket.gethostbyname(addr[0]), addr[1]))
-                        self._register_host(sock, overwrite=True)
-                        if self.reSendMsgs:
-                            self._forward_old_msgs(self._seq_nums[addr][1], addr)
-                            self._send_msg(self._seq_nums[addr][0], addr, None)
-                        to_pop.append(addr)
-                        # When connection is re-established, we inject a status message for that host in the input queue
-                        self._add_to_input_queue(addr, MessageEntity.CONNECTION_RESTORED_MSG)
-                        MessageClient.logger.info('Connection to server %s was successfully restored' % formatipport(addr))
-                    except (ConnectionError, ConnectionRefusedError, TimeoutError, ConnectionAbortedError):
-                        pass
-            # We remove all hosts for which connection was re-established from the dangling ones
-            for addr in to_pop:
-                self._dangling.pop(addr, None)
-            to_pop.clear()
+        time_now = time()
+        if self._nextRetry is None or time_now < self._nextRetry:
+            return self.sock_timeout if self._nextRetry is None else min(self._nextRetry - time_now, self.sock_timeout)
+        next_retry = None
+        to_pop = []
+        for addr, time_list in self._dangling.items():
+            # If a dangling host has passed its retry interval, we remove it completely
+            if time_now - time_list[0] > self.retry_interval:
+                self._abort_connection(addr)
+                self._add_to_input_queue(addr, MessageEntity.CONNECTION_FINALIZED_MSG)
+                to_pop.append(addr)
+                continue
+            if addr in self._connecting:
+                # Pending connection attempts that do not complete within the socket timeout are considered failed
+                if time_now >= self._connecting[addr][1]:
+                    self._abort_connection(addr)
+                    self._schedule_retry(addr, time_now)
+            # We retry establishing a connection with the dangling host
+            elif time_now >= time_list[1]:
+                self._start_connection(addr, time_now)
+            if addr in self._connecting:
+                deadline = self._connecting[addr][1]
+            else:
+                deadline = time_list[1]
+            next_retry = deadline if next_retry is None else min(next_retry, deadline)
+        # We remove all hosts that were finalized from the dangling ones
+        for addr in to_pop:
+            self._dangling.pop(addr, None)
+        self._nextRetry = next_retry
+        return self.sock_timeout if next_retry is None else max(min(next_retry - time_now, self.sock_timeout), 0)
+
+    def _start_connection(self, addr, time_now):
+        """
+        Starts a non-blocking connection attempt to a dangling host
+
+        :param addr: The (ip, port) address of the dangling host
+        :param time_now: The current timestamp
+        """
+        ip = self._resolve(addr[0])
+        if ip is None:
+            # The host name is being resolved in the background, and the attempt is postponed
+            self._schedule_retry(addr, time_now)
+            return
+        sock = self._connect_nonblocking(addr, ip)
+        if sock is None:
+            self._schedule_retry(addr, time_now)
+            return
+        self._connecting[addr] = (sock, time_now + self.sock_timeout)
+        # Pending connections are identified in the selector by their address
+        self._selector.register(sock, selectors.EVENT_WRITE, addr)
+
+    def _connect_nonblocking(self, addr, ip):
+        """
+        Creates a non-blocking socket and starts connecting it to a certain address
 
+        :param addr: The (ip, port) address of the target host. Can also be a (unix, path) tuple for Unix sockets
+        :param ip: The resolved IP address of the target host
+        :return: The socket object, or None if the connection attempt failed immediately
+        """
+        if is_unix_addr(addr):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            target = addr[1]
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            target = (ip, addr[1])
+        sock.setblocking(False)
+        try:
+            self._configure_socket(sock)
+            err = sock.connect_ex(target)
+        except OSError as e:
+            err = e.errno
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            sock.close()
+            return None
+        return sock
+
+    def _complete_connection(self, addr):
+        """
+        Completes a connection attempt to a dangling host, once its socket has become writable
 
+        :param addr: The (ip, port) address of the dangling host
+        """
+        sock = self._connecting.pop(addr)[0]
+        self._selector.unregister(sock)
+        err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err != 0:
+            sock.close()
+            self._schedule_retry(addr, time())
+            return
+        try:
+            reg_addr = self._register_host(sock, overwrite=True)
+        except OSError:
+            sock.close()
+            self._schedule_retry(addr, time())
+            return
+        self._dangling.pop(addr, None)
+        if self.reSendMsgs:
+            # If no message was ever exchanged with the host, the whole history is forwarded
+            last_recv, last_sent = self._seq_nums.get(addr, (None, None))
+            self._forward_old_msgs(last_sent, addr)
+            self._send_msg(last_recv if last_recv is not None else (0, 0), addr, None)
+        self._join_multicast(reg_addr)
+        # When connection is re-established, we inject a status message for that host in the input queue
+        self._add_to_input_queue(addr, MessageEntity.CONNECTION_RESTORED_MSG)
+        MessageClient.logger.info('Connection to server %s was successfully restored' % formatipport(addr))
+
+    def _join_multicast(self, addr):
+        """
+        Asks a newly connected server to receive broadcast messages through the multicast stream
+
+        Broadcast messages are sent to the server through multicast from now on, unless it answers that it cannot
+        join the stream.
+
+        :param addr: The address of the server, or None if it was not registered
+        """
+        if self._mcastSender is None or addr is None or addr not in self._registeredHosts:
+            return
+        conn = self._registeredHosts[addr]
+        group = self._mcastSender.group
+        self._mcastMemberId = (self._mcastMemberId + 1) % 4294967296
+        conn.multicast = True
+        conn.mcastId = self._mcastMemberId
+        conn.mcastStart = conn.mcastSynced = self._mcastSender.nextSeq
+        payload = MessageEntity._CONTROL_JOIN_PAYLOAD.pack(MessageEntity._CONTROL_MCAST_JOIN, self._mcastSender.streamId,
+                                                           conn.mcastId, conn.mcastStart, group[1],
+                                                           socket.inet_aton(group[0]))
+        if not self._send_control_payload(addr, payload):
+            self._remove_host(addr)
+
+    def _process_multicast_control(self, conn, ctl_type, payload, msgs):
+        """
+        Processes a control frame related to multicast broadcasts
+
+        Servers that cannot join the multicast stream are sent the datagrams they missed as repairs, and go back to
+        receiving broadcast messages separately. Requests for missing datagrams are answered with the
+        datagrams themselves, if they are still available.
+
+        :param conn: the MessageConnection object from which the frame was received
+        :param ctl_type: the type of control frame, one of the _CONTROL_MCAST_* constants
+        :param payload: the payload of the control frame
+        :param msgs: the list of messages received from the host before the frame, and not yet processed
+        :return: True if successful, False if the host must be considered dead
+        """
+        sender = self._mcastSender
+        if ctl_type == MessageEntity._CONTROL_MCAST_NACK and sender is not None and conn.multicast:
+            MessageClient.logger.warning('Server %s cannot join the multicast stream' % formatipport(conn.addr))
+            conn.multicast = False
+            datagrams = sender.get_datagrams(conn.mcastStart, sender.nextSeq)
+            if datagrams is None:
+                return False
+            # Messages sent after the datagrams are held by the server until the repairs are received
+            for datagram in datagrams:
+                if not self._send_control_payload(conn.addr, bytes([MessageEntity._CONTROL_MCAST_DATA]) + datagram):
+                    return False
+        elif ctl_type == MessageEntity._CONTROL_MCAST_REPAIR and sender is not None:
+            try:
+                ctl_type, stream_id, first, last = MessageEntity._CONTROL_REPAIR_PAYLOAD.unpack(payload)
+            except struct.error:
+                MessageClient.logger.error('Corrupt control frame received from %s' % formatipport(conn.addr))
+                return True
+            datagrams = sender.get_datagrams(first, last) if stream_id == sender.streamId else None
+            if datagrams is None:
+                MessageClient.logger.error('Cannot repair multicast stream for %s, datagrams are not available'
+                                           % formatipport(conn.addr))
+                return False
+            for datagram in datagrams:
+                if not self._send_control_payload(conn.addr, bytes([MessageEntity._CONTROL_MCAST_DATA]) + datagram):
+                    return False
+        return True
+
+    def _abort_connection(self, addr):
+        """
+        Aborts a pending connection attempt to a dangling host, if present
+
+        :param addr: The (ip, port) address of the dangling host
+        """
+        if addr in self._connecting:
+            sock = self._connecting.pop(addr)[0]
+            self._selector.unregister(sock)
+            sock.close()
+
+    def _schedule_retry(self, addr, time_now):
+        """
+        Schedules the next connection attempt to a dangling host, using a randomized exponential backoff
+
+        :param addr: The (ip, port) address of the dangling host
+        :param time_now: The current timestamp
+        """
+        time_list = self._dangling.get(addr)
+        if time_list is None:
+            return
+        delay = min(self.retry_backoff * (2 ** time_list[2]), self.retry_period)
+        time_list[1] = time_now + uniform(delay / 2, delay)
+        time_list[2] += 1
+        if self._nextRetry is None or time_list[1] < self._nextRetry:
+            self._nextRetry = time_list[1]
+
+    def _resolve(self, host, blocking=False):
+        """
+        Resolves a host name to an IP address, using a cache of previously resolved addresses
+
+        Expired entries are refreshed in the background, while still using the previous address.
+
+        :param host: The host name or IP address to be resolved. Unix socket addresses need no resolution
+        :param blocking: If True, host names that are not cached are resolved immediately. Otherwise, they are resolved
+            in the background and None is returned
+        :return: The resolved IP address, or None if it is not available
+        """
+        if host == UNIX_ID:
+            return host
+        try:
+            socket.inet_aton(host)
+            return host
+        except OSError:
+            pass
+        entry = self._dnsCache.get(host)
+        if entry is not None and time() - entry[1] < self.dns_ttl:
+            return entry[0]
+        if blocking:
+            self._dnsCache[host] = (socket.gethostbyname(host), time())
+            return self._dnsCache[host][0]
+        if host not in self._resolving:
+            self._resolving.add(host)
+            threading.Thread(target=self._resolve_background, args=(host,), daemon=True).start()
+        return entry[0] if entry is not None else None
+
+    def _try_resolve(self, host):
+        """
+        Resolves a host name to an IP address, blocking if it is not cached
+
+        :param host: The host name or IP address to be resolved
+        :return: The resolved IP address, or None if resolution failed
+        """
+        try:
+            return self._resolve(host, blocking=True)
+        except OSError:
+            MessageClient.logger.warning('Could not resolve host name %s' % host)
+            return None
+
+    def _resolve_background(self, host):
+        """
+        Resolves a host name and stores its address in the cache. Meant to be run in a separate thread
+
+        :param host: The host name to be resolved
+        """
+        try:
+            self._dnsCache[host] = (socket.gethostbyname(host), time())
+        except OSError:
+            MessageClient.logger.warning('Could not resolve host name %s' % host)
+        self._resolving.discard(host)
@@ -0,0 +1,147 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import lzma, zlib
+from time import process_time
+
+
+class Compression:
+    """
+    Class that compresses and decompresses the payloads of messages, and keeps statistics about its results for a
+    single connection.
+
+    Compressed payloads start with a byte identifying the codec, so that they can always be decompressed regardless
+    of the codec used by the receiver for its own messages.
+    """
+
+    # Codecs supported for compression, identified by their names in configuration files
+    CODEC_NONE = 0
+    CODEC_ZLIB = 1
+    CODEC_LZMA = 2
+    CODECS = {'zlib': CODEC_ZLIB, 'lzma': CODEC_LZMA}
+
+    @staticmethod
+    def codec_from_name(name):
+        """
+        Returns the ID of a codec from its name
+
+        :param name: The name of the codec, as a string. If None, compression is disabled
+        :return: One of the CODEC_* constants
+        """
+        if name is None:
+            return Compression.CODEC_NONE
+        assert name in Compression.CODECS, 'Unknown compression codec %s' % name
+        return Compression.CODECS[name]
+
+    @staticmethod
+    def compress(codec, payload, level=None):
+        """
+        Compresses a payload
+
+        :param codec: The codec to be used, one of the CODEC_* constants other than CODEC_NONE
+        :param payload: The payload, as a bytes-like object
+        :param level: The compression level, with the meaning of the codec. If None, the codec default is used
+        :return: The compressed payload, as a bytes object
+        """
+        if codec == Compression.CODEC_ZLIB:
+            data = zlib.compress(payload, level if level is not None else -1)
+        else:
+            data = lzma.compress(payload, preset=level)
+        return bytes((codec,)) + data
+
+    @staticmethod
+    def decompress(data):
+        """
+        Decompresses a payload produced by compress
+
+        :param data: The compressed payload, as a bytes-like object
+        :return: The original payload, as a bytes object. Raises ValueError if the payload is corrupt
+        """
+        if len(data) == 0:
+            raise ValueError('Empty compressed payload')
+        codec = data[0]
+        try:
+            if codec == Compression.CODEC_ZLIB:
+                return zlib.decompress(data[1:])
+            elif codec == Compression.CODEC_LZMA:
+                return lzma.decompress(data[1:])
+        except (zlib.error, lzma.LZMAError) as e:
+            raise ValueError(str(e))
+        raise ValueError('Unknown compression codec %s' % codec)
+
+    def __init__(self):
+        """
+        Constructor for the class
+        """
+        # The codec agreed with the remote host for outbound messages
+        self.codec = Compression.CODEC_NONE
+        # Original and compressed bytes, and CPU time in seconds, for sent and received messages. The CPU time is that
+        # of the whole process, as thread-specific clocks are not available in all supported Python versions
+        self.sentBytes = 0
+        self.sentCompressed = 0
+        self.sentTime = 0
+        self.recvBytes = 0
+        self.recvCompressed = 0
+        self.recvTime = 0
+
+    def add_sent(self, size, compressed_size, elapsed):
+        """
+        Accounts for a compressed outbound message
+
+        :param size: The original size of the payload
+        :param compressed_size: The size of the compressed payload
+        :param elapsed: The CPU time in seconds spent compressing it
+        """
+        self.sentBytes += size
+        self.sentCompressed += compressed_size
+        self.sentTime += elapsed
+
+    def decompress_received(self, data):
+        """
+        Decompresses an inbound payload, accounting for it
+
+        :param data: The compressed payload
+        :return: The original payload. Raises ValueError if the payload is corrupt
+        """
+        start = process_time()
+        payload = Compression.decompress(data)
+        self.recvTime += process_time() - start
+        self.recvBytes += len(payload)
+        self.recvCompressed += len(data)
+        return payload
+
+    def get_stats(self):
+        """
+        Returns the statistics of the connection
+
+        :return: A dictionary containing the original and compressed bytes, the compression ratio and the CPU time for
+            both sent and received messages. Ratios are None if no message was compressed
+        """
+        return {'codec': self.codec,
+                'sent_bytes': self.sentBytes, 'sent_compressed': self.sentCompressed,
+                'sent_ratio': self.sentBytes / self.sentCompressed if self.sentCompressed > 0 else None,
+                'sent_cpu_time': self.sentTime,
+                'recv_bytes': self.recvBytes, 'recv_compressed': self.recvCompressed,
+                'recv_ratio': self.recvBytes / self.recvCompressed if self.recvCompressed > 0 else None,
+                'recv_cpu_time': self.recvTime}
@@ -0,0 +1,326 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging, struct
+from tempfile import TemporaryFile
+from time import time
+from collections import deque
+from fault_injector.network.msg_frame import FrameBuffer
+from fault_injector.network.msg_compression import Compression
+from fault_injector.util.misc import formatipport
+
+
+class MessageConnection:
+    """
+    Class that stores the state of a connection with a remote host: its socket, the buffer for received data, and the
+    queue of outbound frames that are waiting to be written to the (non-blocking) socket.
+
+    Outbound frames are organized in priority lanes: whenever a frame has been completely written, the next one is
+    taken from the highest-priority lane that is not empty. Messages all go to the same lane, and are written in the
+    order they were queued: only control frames, which are consumed by the messaging layer itself, are sent in the
+    control lane. Since large messages are split into chunks, control frames never wait for more than a single chunk
+    to be transmitted.
+
+    The outbound queue is bounded by a high-water mark: once it is exceeded, the behavior of the connection depends on
+    the selected overflow policy, until the queue drains below the low-water mark. Control frames are not subject to
+    the overflow policy, as hosts rely on them to keep the connection alive and to deliver the other messages.
+
+    The sequence numbers of tracked messages are kept until they are completely written to the socket, so that messages
+    that are discarded together with the queue, when the connection is lost, can be forwarded again.
+    """
+
+    # Logger for the class
+    logger = logging.getLogger('MessageConnection')
+
+    # Overflow policies: outbound frames are dropped, the connection is closed, or frames are spilled to disk
+    POLICY_DROP = 'drop'
+    POLICY_DISCONNECT = 'disconnect'
+    POLICY_SPILL = 'spill'
+    POLICIES = (POLICY_DROP, POLICY_DISCONNECT, POLICY_SPILL)
+
+    # Priority lanes for outbound frames, from highest to lowest priority. Control frames that can overtake messages,
+    # such as heartbeats, are sent in the control lane, and all messages in the messages lane
+    LANE_CONTROL = 0
+    LANE_MESSAGES = 1
+    N_LANES = 2
+
+    # Length, lane and sequence number prefix of frames stored in spill files. The sequence number is only valid if
+    # the flag before it is set
+    _SPILL_HEADER = struct.Struct('>IBBII')
+
+    def __init__(self, sock, addr, high_water=16777216, low_water=4194304, policy=POLICY_DISCONNECT):
+        """
+        Constructor for the class
+
+        :param sock: The socket of the connection
+        :param addr: The (ip, port) address of the remote host
+        :param high_water: Size in bytes of the outbound queue above which the overflow policy is applied
+        :param low_water: Size in bytes of the outbound queue below which the connection goes back to normal operation
+        :param policy: The overflow policy, one of the POLICY_* constants
+        """
+        assert policy in MessageConnection.POLICIES, 'Unknown overflow policy %s' % policy
+        self.sock = sock
+        self.addr = addr
+        self.recvBuffer = FrameBuffer()
+        # Events for which the socket is currently registered in the selector of the messaging thread
+        self.events = 0
+        self.highWater = high_water
+        self.lowWater = min(low_water, high_water)
+        self.policy = policy
+        self.droppedFrames = 0
+        # Timestamps of the last reception of data and of the last heartbeat sent, and the smoothed heartbeat RTT
+        self.lastRecv = time()
+        self.lastPing = self.lastRecv
+        self.rtt = None
+        # True if the host receives broadcast messages through multicast, its member ID in the stream, the first
+        # datagram it should receive, and the number of datagrams it was told to have been sent. Messages received from
+        # the host, but waiting for earlier multicast datagrams, are held
+        self.multicast = False
+        self.mcastId = 0
+        self.mcastStart = 0
+        self.mcastSynced = 0
+        self.held = None
+        # The compression codec agreed with the host, and the related statistics
+        self.compression = Compression()
+        # Outbound (frame, sequence number) tuples for each lane, the one currently being written and the bytes already
+        # sent of it, and the total number of bytes still to be sent. The sequence number is set only for the last
+        # frame of tracked messages
+        self._lanes = tuple(deque() for i in range(MessageConnection.N_LANES))
+        self._current = None
+        self._outOffset = 0
+        self._outBytes = 0
+        # Sequence numbers of the tracked messages that were not completely written yet, in the order they were queued,
+        # and the ones among them that were written after messages queued later, due to their lanes. The sequence
+        # number of the last message such that all tracked messages up to it were written is kept as well
+        self._unsentSeqs = deque()
+        self._writtenSeqs = set()
+        self.sentSeqNum = None
+        # True from when the high-water mark is exceeded, to when the queue drains below the low-water mark
+        self._overflow = False
+        # Spill file, and the positions and size of the frames stored in it
+        self._spillFile = None
+        self._spillReadPos = 0
+        self._spillWritePos = 0
+        self._spillBytes = 0
+
+    def has_output(self):
+        """
+        Returns whether there are outbound frames waiting to be written to the socket
+
+        :return: True if there are pending frames, False otherwise
+        """
+        return self._outBytes > 0 or self._spillBytes > 0
+
+    def get_output_size(self):
+        """
+        Returns the number of outbound bytes waiting to be sent, both in memory and spilled to disk
+
+        :return: A number of bytes
+        """
+        return self._outBytes + self._spillBytes
+
+    def enqueue(self, frames, lane=LANE_CONTROL, seq_num=None, control=False, ordered=False):
+        """
+        Adds the frames of a message to one of the outbound lanes of the connection, applying the overflow policy if
+        needed
+
+        :param frames: A list of bytes-like objects containing the encoded frames of a message
+        :param lane: The lane of the frames, one of the LANE_* constants
+        :param seq_num: The sequence number of the message in tuple format, if it must be tracked until written
+        :param control: If True, the frames are a control frame, which is never dropped or spilled to disk
+        :param ordered: If True, the control frame must not overtake the messages queued before it, and is spilled to
+            disk as well if they were
+        :return: False if the connection must be closed due to the overflow policy, True otherwise
+        """
+        size = sum(len(f) for f in frames)
+        if control and not (ordered and self._spillBytes > 0):
+            self._append(frames, lane, seq_num)
+            self._outBytes += size
+            return True
+        if seq_num is not None:
+            self._unsentSeqs.append(seq_num)
+        if self._spillBytes > 0:
+            # While frames are being spilled, new ones go to disk as well, in order to preserve their ordering
+            self._spill(frames, lane, seq_num)
+            return True
+        if not self._overflow and self._outBytes > 0 and self._outBytes + size > self.highWater:
+            self._overflow = True
+            MessageConnection.logger.warning('Outbound queue for host %s exceeded its high-water mark, applying '
+                                             'policy %s' % (formatipport(self.addr), self.policy))
+        if not self._overflow:
+            self._append(frames, lane, seq_num)
+            self._outBytes += size
+        elif self.policy == MessageConnection.POLICY_DISCONNECT:
+            return False
+        elif self.policy == MessageConnection.POLICY_SPILL:
+            self._spill(frames, lane, seq_num)
+        else:
+            # Dropped messages are lost for good, and are not forwarded again if the connection is lost
+            self.droppedFrames += len(frames)
+            MessageConnection.logger.warning('Message %s of %s bytes for host %s dropped, as its outbound queue is full'
+                                             % (seq_num if seq_num is not None else '', size, formatipport(self.addr)))
+            if seq_num is not None:
+                self._set_written(seq_num)
+        return True
+
+    def flush(self):
+        """
+        Writes as many outbound frames as possible to the socket, without blocking
+
+        Socket errors are propagated to the caller, and imply that the connection is lost.
+        """
+        while True:
+            if self._current is None:
+                self._current = self._next_frame()
+                if self._current is None:
+                    break
+            frame, seq_num = self._current
+            try:
+                sent = self.sock.send(memoryview(frame)[self._outOffset:])
+            except (BlockingIOError, InterruptedError):
+                break
+            self._outOffset += sent
+            self._outBytes -= sent
+            if self._outOffset < len(frame):
+                # A partial write means that the socket's buffer is full
+                break
+            self._current = None
+            self._outOffset = 0
+            if seq_num is not None:
+                self._set_written(seq_num)
+        if self._overflow and self._outBytes <= self.lowWater:
+            if self._spillBytes > 0:
+                self._unspill()
+            else:
+                self._overflow = False
+                MessageConnection.logger.info('Outbound queue for host %s drained below its low-water mark, %s '
+                                              'frames were dropped so far' % (formatipport(self.addr), self.droppedFrames))
+
+    def close(self):
+        """
+        Closes the socket of the connection and discards all outbound frames
+        """
+        self.sock.close()
+        for lane in self._lanes:
+            lane.clear()
+        self._current = None
+        self._outBytes = 0
+        if self._spillFile is not None:
+            self._spillFile.close()
+            self._spillFile = None
+            self._spillBytes = 0
+
+    def mark_sent(self, seq_num):
+        """
+        Marks a message that was delivered to the host out of band, as a multicast datagram, as written
+
+        The message counts as sent once all the messages queued before it have been written as well.
+
+        :param seq_num: The sequence number of the message in tuple format
+        """
+        self._unsentSeqs.append(seq_num)
+        self._set_written(seq_num)
+
+    def _append(self, frames, lane, seq_num):
+        """
+        Appends the frames of a message to one of the in-memory lanes
+
+        :param frames: A list of bytes-like objects containing encoded frames
+        :param lane: The lane of the frames
+        :param seq_num: The sequence number of the message, if tracked, which is attached to its last frame
+        """
+        queue = self._lanes[lane]
+        for i in range(len(frames) - 1):
+            queue.append((frames[i], None))
+        queue.append((frames[-1], seq_num))
+
+    def _set_written(self, seq_num):
+        """
+        Marks a tracked message as written, and updates the sequence number up to which all messages were written
+
+        :param seq_num: The sequence number of the message in tuple format
+        """
+        unsent = self._unsentSeqs
+        if len(unsent) == 0 or unsent[0] != seq_num:
+            self._writtenSeqs.add(seq_num)
+            return
+        unsent.popleft()
+        self.sentSeqNum = seq_num
+        while len(unsent) > 0 and unsent[0] in self._writtenSeqs:
+            self.sentSeqNum = unsent.popleft()
+            self._writtenSeqs.discard(self.sentSeqNum)
+
+    def _next_frame(self):
+        """
+        Pops the next frame to be written from the highest-priority lane that is not empty
+
+        :return: A (frame, sequence number) tuple, or None if there are no frames in memory
+        """
+        for lane in self._lanes:
+            if lane:
+                return lane.popleft()
+        if self._spillBytes > 0:
+            self._unspill()
+            return self._next_frame()
+        return None
+
+    def _spill(self, frames, lane, seq_num=None):
+        """
+        Appends the frames of a message to the spill file of the connection
+
+        :param frames: A list of bytes-like objects containing encoded frames
+        :param lane: The lane of the frames
+        :param seq_num: The sequence number of the message, if tracked
+        """
+        if self._spillFile is None:
+            self._spillFile = TemporaryFile()
+        self._spillFile.seek(self._spillWritePos)
+        for i, frame in enumerate(frames):
+            if seq_num is not None and i == len(frames) - 1:
+                header = MessageConnection._SPILL_HEADER.pack(len(frame), lane, 1, seq_num[0], seq_num[1])
+            else:
+                header = MessageConnection._SPILL_HEADER.pack(len(frame), lane, 0, 0, 0)
+            self._spillFile.write(header)
+            self._spillFile.write(frame)
+            self._spillBytes += len(frame)
+        self._spillWritePos = self._spillFile.tell()
+
+    def _unspill(self):
+        """
+        Moves frames from the spill file back to their in-memory lanes, up to the high-water mark
+        """
+        self._spillFile.seek(self._spillReadPos)
+        while self._spillBytes > 0 and self._outBytes < self.highWater:
+            length, lane, tracked, seq_ts, seq_num = MessageConnection._SPILL_HEADER.unpack(
+                self._spillFile.read(MessageConnection._SPILL_HEADER.size))
+            frame = self._spillFile.read(length)
+            self._lanes[lane].append((frame, (seq_ts, seq_num) if tracked else None))
+            self._outBytes += length
+            self._spillBytes -= length
+        self._spillReadPos = self._spillFile.tell()
+        if self._spillBytes == 0:
+            # Once the spill file is empty it is truncated, and reused for the next overflow episode
+            self._spillFile.seek(0)
+            self._spillFile.truncate()
+            self._spillReadPos = self._spillWritePos = 0
@@ -22,12 +22,16 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import select, socket, threading
-import struct, json, logging
-from fault_injector.util.misc import getipport, formatipport, DummySocketBuilder
+import selectors, socket, struct, threading
+import json, logging
+from fault_injector.network.msg_frame import FrameBuffer
+from fault_injector.network.msg_connection import MessageConnection
+from fault_injector.network.msg_history import MessageHistory
+from fault_injector.network.msg_compression import Compression
+from fault_injector.util.misc import formatipport, strtoaddr, DummySocketBuilder, UNIX_ID
 from threading import Semaphore
 from collections import deque
-from time import time
+from time import time, process_time
 from abc import ABC, abstractmethod
 
 
@@ -54,6 +58,30 @@ class MessageEntity(ABC):
     CONNECTION_RESTORED_MSG = 1
     CONNECTION_TOREMOVE_MSG = 2
 
+    # Types of control frames, and their payload: the type and the timestamp of the original heartbeat
+    _CONTROL_PING = 1
+    _CONTROL_PONG = 2
+    _CONTROL_PAYLOAD = struct.Struct('>Bd')
+
+    # Types of control frames used by multicast broadcasts, and their payloads. Clients announce their stream of
+    # datagrams with JOIN (stream ID, member ID of the server, first sequence number, port and group address), and
+    # servers that cannot receive it answer with NACK. SYNC (stream ID, next sequence number) is a barrier, telling
+    # servers which datagrams were sent before and after the surrounding messages. Servers request missing datagrams
+    # with REPAIR (stream ID, first and last sequence numbers), and clients answer with DATA frames containing the
+    # original datagrams
+    _CONTROL_MCAST_JOIN = 3
+    _CONTROL_MCAST_NACK = 4
+    _CONTROL_MCAST_SYNC = 5
+    _CONTROL_MCAST_REPAIR = 6
+    _CONTROL_MCAST_DATA = 7
+    _CONTROL_JOIN_PAYLOAD = struct.Struct('>BIIIH4s')
+    _CONTROL_SYNC_PAYLOAD = struct.Struct('>BII')
+    _CONTROL_REPAIR_PAYLOAD = struct.Struct('>BIII')
+
+    # Type of control frames announcing the compression codec that a host wants to use, and their payload
+    _CONTROL_COMPRESS = 8
+    _CONTROL_COMPRESS_PAYLOAD = struct.Struct('>BB')
+
     @staticmethod
     def is_status_message(msg):
         """
@@ -72,7 +100,31 @@ class MessageEntity(ABC):
         else:
             return False, None
 
-    def __init__(self, socket_timeout=10, max_connections=100, re_send_msgs=False):
+    @staticmethod
+    def options_from_config(cfg):
+        """
+        Extracts the options related to the messaging layer from a FINJ configuration dictionary
+
+        :param cfg: A configuration dictionary, as returned by ConfigLoader
+        :return: A dictionary of keyword arguments for the constructors of MessageEntity subclasses
+        """
+        return {'send_high_water': cfg['SEND_HIGH_WATER'], 'send_low_water': cfg['SEND_LOW_WATER'],
+                'overflow_policy': cfg['SEND_OVERFLOW_POLICY'], 'tcp_nodelay': cfg['TCP_NODELAY'],
+                'sock_sndbuf': cfg['SOCKET_SNDBUF'], 'sock_rcvbuf': cfg['SOCKET_RCVBUF'], 'chunk_size': cfg['CHUNK_SIZE'],
+                'history_length': cfg['HISTORY_LENGTH'], 'history_disk_size': cfg['HISTORY_DISK_SIZE'],
+                'history_dir': cfg['HISTORY_DIR'], 'heartbeat_interval': cfg['HEARTBEAT_INTERVAL'],
+                'heartbeat_timeout': cfg['HEARTBEAT_TIMEOUT'], 'tcp_keepalive': cfg['TCP_KEEPALIVE'],
+                'tcp_user_timeout': cfg['TCP_USER_TIMEOUT'], 'multicast_group': strtoaddr(cfg['MULTICAST_GROUP']) if cfg['MULTICAST_GROUP'] else None,
+                'multicast_interface': cfg['MULTICAST_INTERFACE'], 'multicast_ttl': cfg['MULTICAST_TTL'],
+                'compression': cfg['COMPRESSION'], 'compression_threshold': cfg['COMPRESSION_THRESHOLD'],
+                'compression_level': cfg['COMPRESSION_LEVEL']}
+
+    def __init__(self, socket_timeout=10, max_connections=100, re_send_msgs=False, send_high_water=16777216,
+                 send_low_water=4194304, overflow_policy=MessageConnection.POLICY_DISCONNECT, tcp_nodelay=True,
+                 sock_sndbuf=None, sock_rcvbuf=None, chunk_size=65536, history_length=4096,
+                 history_disk_size=268435456, history_dir=None, heartbeat_interval=0, heartbeat_timeout=120,
+                 tcp_keepalive=None, tcp_user_timeout=None, multicast_group=None, multicast_interface=None, multicast_ttl=1,
+                 compression=None, compression_threshold=4096, compression_level=None):
         """
         Constructor of the class
         
@@ -80,6 +132,34 @@ class MessageEntity(ABC):
         :param max_connections: maximum number of concurrent connections (used for servers only)
         :param re_send_msgs: if True, the entity will keep track of sent/received messages, and eventually attempt
             to resend them to hosts that have not received them due to a connection loss
+        :param send_high_water: size in bytes of the outbound queue of a host, above which the overflow policy is applied
+        :param send_low_water: size in bytes of the outbound queue of a host, below which normal operation is resumed
+        :param overflow_policy: the policy for hosts whose outbound queue exceeds the high-water mark. Can be 'drop'
+            (messages are discarded), 'disconnect' (the host is removed) or 'spill' (messages are stored on disk)
+        :param tcp_nodelay: if True, Nagle's algorithm is disabled on all sockets
+        :param sock_sndbuf: size of the kernel send buffer of sockets. If None, the system default is used
+        :param sock_rcvbuf: size of the kernel receive buffer of sockets. If None, the system default is used
+        :param chunk_size: maximum size in bytes of a single frame. Larger messages are sent in a low-priority lane,
+            split into chunks of this size, so that they never delay other messages by more than one chunk
+        :param history_length: number of sent messages kept in memory for forwarding purposes, if re_send_msgs is True
+        :param history_disk_size: maximum size in bytes of older sent messages kept on disk for forwarding purposes
+        :param history_dir: directory in which older sent messages are stored. If None, a temporary directory is used
+        :param heartbeat_interval: period in seconds of the heartbeats sent to each host. If 0 or None, heartbeats
+            are disabled
+        :param heartbeat_timeout: time in seconds after which a host from which no data was received is considered dead
+        :param tcp_keepalive: idle time in seconds after which TCP keepalive probes are sent. If None, the system
+            default is used
+        :param tcp_user_timeout: time in seconds after which a connection with unacknowledged data is closed by the
+            kernel. If None, the system default is used
+        :param multicast_group: the (ip, port) address of the multicast group through which broadcast messages are
+            sent (used for clients only). If None, broadcast messages are sent to each host separately
+        :param multicast_interface: the IP address of the interface used for multicast. If None, the system default
+            is used
+        :param multicast_ttl: the time-to-live of multicast datagrams
+        :param compression: the codec used to compress messages, either 'zlib' or 'lzma'. Compression is used with a
+            host only if it is enabled on both sides, with the cheaper of the two codecs. If None, it is disabled
+        :param compression_threshold: size in bytes of messages above which they are compressed
+        :param compression_level: the compression level, with the meaning of the codec. If None, the default is used
         """
         # The thread object for the listener and a termination flag
         self._thread = None
@@ -96,11 +176,38 @@ class MessageEntity(ABC):
         self.sock_timeout = socket_timeout
         # Maximum number of requests for server sockets
         self.max_connections = max_connections
-        # The dictionary of sockets registered for communication, whether server or client
-        # The keys are in the form of (ip, port) tuples
+        # Options for the outbound queues and the sockets of connections
+        self.send_high_water = send_high_water
+        self.send_low_water = send_low_water
+        self.overflow_policy = overflow_policy
+        self.tcp_nodelay = tcp_nodelay
+        self.sock_sndbuf = sock_sndbuf
+        self.sock_rcvbuf = sock_rcvbuf
+        self.chunk_size = chunk_size
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.tcp_keepalive = tcp_keepalive
+        self.tcp_user_timeout = tcp_user_timeout
+        self.multicast_group = multicast_group
+        self.multicast_interface = multicast_interface
+        self.multicast_ttl = multicast_ttl
+        self.compression = Compression.codec_from_name(compression)
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+        # The sender of multicast broadcasts, if used by subclasses, and the set of hosts that joined its stream and
+        # were sent messages after the last datagram
+        self._mcastSender = None
+        self._mcastFenced = set()
+        # Time at which heartbeats must be checked next
+        self._nextHeartbeat = time()
+        # Counter used to assign addresses to clients connected through Unix domain sockets, which are unnamed
+        self._unixConnId = 0
+        # The dictionary of connections registered for communication, whether server or client
+        # The keys are in the form of (ip, port) tuples, and the values are MessageConnection objects
         self._registeredHosts = {}
-        # The list of hosts registered for the 'select' calls (also includes the server socket, if present)
-        self._readSet = []
+        # The selector on which the messaging thread waits for events. Sockets are registered once, when connection
+        # with their hosts is established, and unregistered when it is lost
+        self._selector = selectors.DefaultSelector()
         # Input and output message queues
         self._inputQueue = deque()
         self._outputQueue = deque()
@@ -111,11 +218,17 @@ class MessageEntity(ABC):
         reads, writes = DummySocketBuilder.getDummySocket()
         self._dummy_sock_r = reads
         self._dummy_sock_w = writes
+        self._selector.register(self._dummy_sock_r, selectors.EVENT_READ)
+        # True if the messaging thread has been woken up and has not yet started flushing the output queue. Further
+        # messages do not need to wake it up again, and can just be appended to the queue
+        self._wakeupPending = False
         # Semaphore for producer-consumer style computation on the message queue
         self._messageSem = Semaphore(0)
-        # A list that stores the history of sent messages
-        self._historyLen = 4096
-        self._msgHistory = deque(maxlen=self._historyLen)
+        # Dictionary of the sequence numbers of the last messages put on the queue for each host, updated together
+        # with the queue itself
+        self._queuedSeqNums = {}
+        # The history of sent broadcast messages, stored as encoded frames
+        self._msgHistory = MessageHistory(max_length=history_length, max_disk_size=history_disk_size, path=history_dir)
 
     def start(self):
         """
@@ -136,7 +249,13 @@ class MessageEntity(ABC):
         """
         if self._initialized:
             self._hasToFinish = True
+            # The messaging thread is woken up, so that it does not have to wait for the selector timeout
+            self._dummy_sock_w.send(MessageEntity.DUMMY_STR)
             self._thread.join()
+            # The messaging thread may terminate as soon as it sees the flag, hence the sockets used to wake it up are
+            # closed only afterwards
+            self._dummy_sock_r.close()
+            self._dummy_sock_w.close()
             self._thread = None
             self._initialized = False
             MessageEntity.logger.debug('Messaging thread successfully stopped')
@@ -148,6 +267,26 @@ class MessageEntity(ABC):
         """
         return list(self._registeredHosts.keys())
 
+    def get_host_rtt(self, addr):
+        """
+        Returns the round-trip time of heartbeats for a connected host, as a measure of its health
+
+        :param addr: The (ip, port) address of the host
+        :return: The smoothed round-trip time in seconds, or None if the host is not connected or was not measured yet
+        """
+        conn = self._registeredHosts.get(addr)
+        return conn.rtt if conn is not None else None
+
+    def get_host_compression_stats(self, addr):
+        """
+        Returns the statistics of message compression for a connected host, in order to evaluate its trade-off
+
+        :param addr: The (ip, port) address of the host
+        :return: A dictionary as returned by Compression.get_stats, or None if the host is not connected
+        """
+        conn = self._registeredHosts.get(addr)
+        return conn.compression.get_stats() if conn is not None else None
+
     def get_n_registered_hosts(self):
         """
         Returns the number of currently connected hosts
@@ -166,11 +305,7 @@ class MessageEntity(ABC):
         if comm is None or not isinstance(comm, dict):
             MessageEntity.logger.error('Messages must be supplied as dictionaries to send_msg')
             return
-        self._outputLock.acquire()
-        self._outputQueue.append((addr, comm))
-        self._outputLock.release()
-        # Writing to the internal socket to wake up the server if it is waiting on a select call
-        self._dummy_sock_w.send(MessageEntity.DUMMY_STR)
+        self._enqueue_output(addr, comm)
 
     def broadcast_msg(self, comm):
         """
@@ -182,11 +317,7 @@ class MessageEntity(ABC):
             MessageEntity.logger.error('Messages must be supplied as dictionaries to send_msg')
             return
         addr = (MessageEntity.BROADCAST_ID, MessageEntity.BROADCAST_ID)
-        self._outputLock.acquire()
-        self._outputQueue.append((addr, comm))
-        self._outputLock.release()
-        # Writing to the internal pipe to wake up the server if it is waiting on a select call
-        self._dummy_sock_w.send(MessageEntity.DUMMY_STR)
+        self._enqueue_output(addr, comm)
 
     def peek_msg_queue(self):
         """
@@ -196,15 +327,38 @@ class MessageEntity(ABC):
         """
         return len(self._inputQueue)
 
-    def pop_msg_queue(self, blocking=True):
+    def get_consumed_seq_nums(self):
+        """
+        Returns the sequence numbers of the last messages received from each host, provided that all of them have
+        already been popped from the message queue
+
+        Together with the state built from the popped messages, the sequence numbers can be saved and later supplied
+        to a new entity, so that hosts forward only the messages that follow them. Only messages sent by hosts with
+        re_send_msgs enabled carry sequence numbers.
+
+        :return: A dictionary from (ip, port) addresses to sequence numbers in tuple format, or None if there are
+            messages in the queue that were not popped yet
+        """
+        with self._inputLock:
+            if len(self._inputQueue) > 0:
+                return None
+            return dict(self._queuedSeqNums)
+
+    def pop_msg_queue(self, blocking=True, timeout=None):
         """
         Pops the first element of the message queue
 
         :param blocking: boolean flag. If True, the method is blocking, and the process is halted until a new message 
             has been received (if the queue is empty)
-        :return: The first message in the queue
+        :param timeout: If the method is blocking, the maximum time in seconds to wait for a new message. If None, the
+            method waits indefinitely
+        :return: The first message in the queue, or (None, None) if the timeout expired
         """
-        self._messageSem.acquire(blocking)
+        if blocking and timeout is not None:
+            if not self._messageSem.acquire(timeout=max(timeout, 0)):
+                return None, None
+        else:
+            self._messageSem.acquire(blocking)
         self._inputLock.acquire()
         addr, comm = self._inputQueue.popleft() if len(self._inputQueue) > 0 else (None, None)
         self._inputLock.release()
@@ -218,16 +372,44 @@ class MessageEntity(ABC):
 
         :param addr: The (ip, port) address corresponding to the host to remove
         """
+        self._enqueue_output(addr, MessageEntity.CONNECTION_TOREMOVE_MSG)
+
+    def _enqueue_output(self, addr, comm):
+        """
+        Adds a message to the output queue, and wakes up the messaging thread if needed
+
+        The messaging thread is woken up by writing to the internal socket only if it is not already going to flush the
+        output queue, so that enqueueing a burst of messages costs a single system call.
+
+        :param addr: the address (ip, port) tuple of the target host
+        :param comm: The message to be sent
+        """
         self._outputLock.acquire()
-        self._outputQueue.append((addr, MessageEntity.CONNECTION_TOREMOVE_MSG))
+        self._outputQueue.append((addr, comm))
+        wakeup = not self._wakeupPending
+        self._wakeupPending = True
         self._outputLock.release()
+        if wakeup:
+            # Writing to the internal socket to wake up the messaging thread if it is waiting on a select call
+            try:
+                self._dummy_sock_w.send(MessageEntity.DUMMY_STR)
+            except OSError:
+                # The socket is closed once the entity has been stopped, and messages are not sent anymore
+                pass
 
     def _flush_output_queue(self):
         """
         Private method that tries to dispatch all pending messages in the output queue
         """
         # Flushing the dummy socket used for triggering select calls
-        self._dummy_sock_r.recv(2048)
+        try:
+            self._dummy_sock_r.recv(2048)
+        except (BlockingIOError, InterruptedError):
+            pass
+        # From now on, new messages must wake up the messaging thread again
+        self._outputLock.acquire()
+        self._wakeupPending = False
+        self._outputLock.release()
         # We compute the number of messages currently in the output queue
         n_msg = len(self._outputQueue)
         for i in range(n_msg):
@@ -237,17 +419,27 @@ class MessageEntity(ABC):
                 self._remove_host(addr)
             else:
                 seq_num = (self._curr_seq_ts, self._curr_seq_num)
-                if self.reSendMsgs:
-                    self._msgHistory.append((seq_num, addr, msg))
+                # Messages are encoded only once, even when they are broadcast to all hosts
+                frames, lane = self._build_frames(seq_num, msg)
                 if addr[0] == MessageEntity.BROADCAST_ID:
+                    # Only broadcast messages are forwarded to hosts after a connection loss
+                    if self.reSendMsgs:
+                        self._msgHistory.append(seq_num, frames, lane)
+                    # A message sent as a multicast datagram reaches all hosts that joined the stream at once. The
+                    # other ones, and all hosts if the message does not fit in a datagram, are sent it separately
+                    mcast = self._mcastSender is not None and self._send_multicast(seq_num, frames)
+                    # Compressed frames are built once for each codec, and shared by all hosts using it
+                    compressed = {}
                     to_remove = []
-                    for re_addr in self._registeredHosts.keys():
-                        if not self._send_msg(seq_num, re_addr, msg):
+                    for re_addr, conn in self._registeredHosts.items():
+                        if mcast and conn.multicast:
+                            continue
+                        if not self._send_frames(seq_num, re_addr, frames, lane, compressed=compressed):
                             to_remove.append(re_addr)
                     for re_addr in to_remove:
                         self._remove_host(re_addr)
                 else:
-                    if not self._send_msg(seq_num, addr, msg):
+                    if not self._send_frames(seq_num, addr, frames, lane):
                         self._remove_host(addr)
                 # The sequence numbers wrap around a certain limit, and return to 0
                 self._curr_seq_num = (self._curr_seq_num + 1) % self._seq_num_lim
@@ -260,44 +452,35 @@ class MessageEntity(ABC):
         Forwards all messages that were sent in a certain time frame to an host that has recently restored its
         connection
 
-        :param start_seq: starting sequence number of the forwarding window
+        Messages are resent as the original encoded frames, with their original sequence numbers.
+
+        :param start_seq: starting sequence number of the forwarding window. If None, the whole history is forwarded
         :param addr: address of the target host for forwarding
         """
-        self._outputLock.acquire()
-        for m_seq_num, m_addr, msg in self._msgHistory:
-            # The part after the or serves to manage sequence number after wraparound, when the upper limit is reached
-            if start_seq < m_seq_num and m_addr[0] == MessageEntity.BROADCAST_ID:
-                self._outputQueue.append((addr, msg))
-        self._outputLock.release()
+        n_msgs = 0
+        for m_seq_num, frames, lane in self._msgHistory.iter_after(start_seq):
+            if not self._send_frames(m_seq_num, addr, frames, lane):
+                self._remove_host(addr)
+                break
+            n_msgs += 1
+        MessageEntity.logger.debug('Forwarded %s messages to host %s' % (n_msgs, formatipport(addr)))
 
-    def _add_to_input_queue(self, addr, comm):
+    def _add_to_input_queue(self, addr, comm, seq_num=None):
         """
         Adds a message that has been received to the internal message queue
 
         :param addr: The address (ip, port) of the sender host
         :param comm: The message to be added to the queue
+        :param seq_num: The sequence number of the message, if tracked
         """
-        self._inputQueue.append((addr, comm))
+        if seq_num is not None:
+            with self._inputLock:
+                self._inputQueue.append((addr, comm))
+                self._queuedSeqNums[addr] = seq_num
+        else:
+            self._inputQueue.append((addr, comm))
         self._messageSem.release()
 
-    def _liveness_check(self, sock):
-        """
-        Checks for the liveness of a socket by trying to read 1 byte (with MSG_PEEK). This supposes that the socket has
-        been flagged as readable by a previous 'select' call
-
-        :param sock: the socket to be checked
-        :return: True if the socket is alive, False otherwise
-        """
-        try:
-            if len(sock.recv(1, socket.MSG_PEEK)) == 0:
-                MessageEntity.logger.info('Host %s has disconnected' % getipport(sock))
-                return False
-            else:
-                return True
-        except Exception:
-            MessageEntity.logger.info('Host %s has encountered an error' % getipport(sock))
-            return False
-
     def _send_msg(self, seq_num, addr, comm):
         """
         Private method that sends messages over specific active hosts of the registered hosts list
@@ -309,84 +492,362 @@ class MessageEntity(ABC):
             representing the sequence number of the last valid message received from the host
         :return: True if the message was successfully sent, False otherwise
         """
-        # Verifying if the input address has a corresponding open socket
-        try:
-            sock = self._registeredHosts[addr]
-        except KeyError:
-            sock = None
-        # If no valid socket was found for the input address, the message is not sent
-        if sock is None:
+        frames, lane = self._build_frames(seq_num, comm)
+        return self._send_frames(seq_num, addr, frames, lane, track=comm is not None)
+
+    def _build_frames(self, seq_num, comm):
+        """
+        Encodes a message into the frames that must be written to sockets
+
+        Messages larger than the chunk size are split into several frames. All messages go to the messages lane of
+        connections, so that they are delivered in the order they were sent, as required by message forwarding.
+
+        :param seq_num: sequence number of the message in tuple format
+        :param comm: content of the message as a dictionary. If None, a message forwarding request is built
+        :return: A tuple containing the list of encoded frames as bytes objects, and their lane
+        """
+        # An empty message containing only the header represents a message forwarding request
+        msg = json.dumps(comm).encode() if comm is not None else b''
+        return FrameBuffer.build_frames(seq_num, msg, chunk_size=self.chunk_size), MessageConnection.LANE_MESSAGES
+
+    def _send_frames(self, seq_num, addr, frames, lane, track=True, compressed=None, control=False, ordered=False):
+        """
+        Adds the encoded frames of a message to the outbound queue of a registered host, and tries to write them
+        without blocking
+
+        Frames that cannot be written immediately are sent by the messaging thread when the socket becomes writable.
+
+        :param seq_num: sequence number of the message in tuple format
+        :param addr: address of the target host
+        :param frames: the list of encoded frames
+        :param lane: the lane of the connection to which the frames must be added
+        :param track: if True, the message is tracked until written, for message forwarding purposes
+        :param compressed: a dictionary in which compressed frames are cached by codec, for messages sent to several
+            hosts. If None, frames are compressed for this host only
+        :param control: if True, the frames are a control frame, which is not subject to the overflow policy
+        :param ordered: if True, the control frame must not overtake the messages sent before it to the host
+        :return: True if the frames were successfully queued or sent, False if the host must be considered dead
+        """
+        # Verifying if the input address has a corresponding open connection
+        conn = self._registeredHosts.get(addr)
+        # If no valid connection was found for the input address, the message is not sent
+        if conn is None:
             MessageEntity.logger.error('Cannot send to %s, is not registered' % formatipport(addr))
             return False
-        if comm is None:
-            # An empty message containing only the header represents a message forwarding request
-            msg = struct.pack('>I', 0) + struct.pack('>I', seq_num[0]) + struct.pack('>I', seq_num[1])
+        # Messages must not overtake the multicast datagrams that were sent before them
+        if conn.multicast and track and not control and not self._sync_multicast(conn):
+            return False
+        if conn.compression.codec != Compression.CODEC_NONE:
+            frames, lane = self._compress_frames(conn, seq_num, frames, lane, compressed)
+        if not conn.enqueue(frames, lane, seq_num if track else None, control, ordered):
+            MessageEntity.logger.error('Outbound queue for host %s is full, disconnecting' % formatipport(addr))
+            return False
+        if conn.multicast and track and not control:
+            # ...and the next datagram must not overtake them either
+            self._mcastFenced.add(addr)
+        # If the socket is already being watched for writability, the kernel buffer is full and there is no point in
+        # trying to write now
+        if not conn.events & selectors.EVENT_WRITE and not self._flush_connection(conn):
+            return False
+        return True
+
+    def _compress_frames(self, conn, seq_num, frames, lane, compressed=None):
+        """
+        Compresses the frames of a message for a host, if it is larger than the compression threshold
+
+        Messages are compressed as a whole and then split into chunks again. Messages that do not shrink are sent as
+        they are.
+
+        :param conn: the MessageConnection object of the host
+        :param seq_num: sequence number of the message in tuple format
+        :param frames: the list of encoded frames
+        :param lane: the lane of the frames
+        :param compressed: a dictionary in which compressed frames are cached by codec. If None, it is not used
+        :return: A tuple containing the list of frames to be sent and their lane
+        """
+        codec = conn.compression.codec
+        size = sum(len(f) for f in frames) - len(frames) * FrameBuffer.HEADER_LEN
+        if size < self.compression_threshold:
+            return frames, lane
+        elapsed = 0
+        if compressed is not None and codec in compressed:
+            frames, lane, c_size = compressed[codec]
         else:
-            msg = json.dumps(comm).encode()
-            # Prefix each message with a 4-byte length (network byte order)
-            msg = struct.pack('>I', len(msg)) + struct.pack('>I', seq_num[0]) + struct.pack('>I', seq_num[1]) + msg
+            payload, flags = FrameBuffer.join_frames(frames)
+            if flags & (FrameBuffer.FLAG_CONTROL | FrameBuffer.FLAG_COMPRESSED):
+                return frames, lane
+            start = process_time()
+            data = Compression.compress(codec, payload, self.compression_level)
+            elapsed = process_time() - start
+            c_size = len(data)
+            if c_size < size:
+                frames = FrameBuffer.build_frames(seq_num, data, flags=flags | FrameBuffer.FLAG_COMPRESSED,
+                                                  chunk_size=self.chunk_size)
+            else:
+                c_size = size
+            if compressed is not None:
+                compressed[codec] = (frames, lane, c_size)
+        # The CPU time of messages compressed once for several hosts is accounted to the first of them
+        conn.compression.add_sent(size, c_size, elapsed)
+        return frames, lane
+
+    def _flush_connection(self, conn):
+        """
+        Writes as many pending outbound frames as possible to a connection, and updates the events for which its
+        socket is registered in the selector accordingly
+
+        :param conn: the MessageConnection object
+        :return: True if successful, False if an error was encountered and the host must be considered dead
+        """
+        error = False
         try:
-            sock.sendall(msg)
-            if self.reSendMsgs and comm is not None:
-                self._update_seq_num(addr, seq_num, received=False)
-            return True
-        except Exception:
-            MessageEntity.logger.error('Exception encountered while sending msg to %s' % getipport(sock))
+            conn.flush()
+        except OSError:
+            MessageEntity.logger.error('Exception encountered while sending msg to %s' % formatipport(conn.addr))
+            error = True
+        self._update_sent_seq_num(conn)
+        if error:
             # If an error is encountered during communication, we suppose the host is dead
             return False
+        events = selectors.EVENT_READ | selectors.EVENT_WRITE if conn.has_output() else selectors.EVENT_READ
+        if events != conn.events:
+            conn.events = events
+            self._selector.modify(conn.sock, events, conn)
+        return True
 
-    def _recv_msg(self, sock):
-        """
-        Performs the reception of a message from a given socket. This supposes that the socket has been already flagged
-        as readable by a previous 'select' call
-
-        :param sock: the socket from which the message must be read
-        :return: A tuple containing the message dictionary and the sequence number of the associated message. If the
-            message is a forwarding request, the message will be None, and the sequence number will represent the last
-            valid message that was received by the sender from this host.
-        """
-        # Read message length and unpack it into an integer
-        raw_msglen = self._recvall(sock, 4)
-        if not raw_msglen:
-            MessageEntity.logger.error('Corrupt message on received from %s' % getipport(sock))
-            return None, None
-        # Read message sequence number
-        raw_seqnum_ts = self._recvall(sock, 4)
-        raw_seqnum = self._recvall(sock, 4)
-        msglen = struct.unpack('>I', raw_msglen)[0]
-        seqnum = (struct.unpack('>I', raw_seqnum_ts)[0], struct.unpack('>I', raw_seqnum)[0])
-
-        if msglen == 0 and self.reSendMsgs:
-            # An empty message represents a message forwarding request. Such requests are NOT put on the queue
-            return None, seqnum
-
-        # Read the message data
-        raw_msg = self._recvall(sock, msglen)
+    def _recv_msgs(self, conn):
+        """
+        Performs the reception of messages from a given socket. This supposes that the socket has been already flagged
+        as readable by the selector
+
+        A single read is performed on the socket, and all messages that have been completely received up to that
+        point are decoded. Partially received messages are kept in the receive buffer of the host, until the next call.
+
+        :param conn: the MessageConnection object from which messages must be read
+        :return: A list of tuples, each containing a message dictionary and the sequence number of the associated
+            message. If a message is a forwarding request, the message will be None, and the sequence number will
+            represent the last valid message that was received by the sender from this host. If the connection was
+            closed or is in error state, None is returned
+        """
+        addr = conn.addr
+        buf = conn.recvBuffer
         try:
-            final_msg = json.loads(raw_msg.decode()) if raw_msg else None
-        except json.JSONDecodeError:
-            final_msg = None
-        if final_msg is not None and self.reSendMsgs:
-            self._update_seq_num(sock.getpeername(), seqnum, received=True)
-        return final_msg, seqnum
+            if buf.recv_from(conn.sock) == 0:
+                MessageEntity.logger.info('Host %s has disconnected' % formatipport(addr))
+                return None
+        except (BlockingIOError, InterruptedError):
+            return []
+        except OSError:
+            MessageEntity.logger.info('Host %s has encountered an error' % formatipport(addr))
+            return None
+        conn.lastRecv = time()
+        msgs = []
+        for msglen, seqnum, flags, payload in buf.frames():
+            if flags & FrameBuffer.FLAG_CONTROL:
+                # Control frames are consumed here, and are never put on the queue
+                if not self._process_control(conn, payload, msgs):
+                    return None
+                continue
+            if flags & FrameBuffer.FLAG_COMPRESSED:
+                try:
+                    payload = conn.compression.decompress_received(payload)
+                except ValueError:
+                    MessageEntity.logger.error('Corrupt compressed message received from %s' % formatipport(addr))
+                    continue
+            # Messages that must wait for multicast datagrams sent before them are held in the connection
+            out = msgs if conn.held is None else conn.held
+            if msglen == 0:
+                # An empty message represents a message forwarding request. Such requests are NOT put on the queue
+                out.append((None, seqnum))
+                continue
+            final_msg = self._decode_msg(addr, payload)
+            if final_msg is not None and self.reSendMsgs:
+                self._update_seq_num(addr, seqnum, received=True)
+            out.append((final_msg, seqnum))
+        return msgs
+
+    def _decode_msg(self, addr, payload):
+        """
+        Decodes the payload of a message received from a host
+
+        :param addr: The address of the sender host
+        :param payload: The payload of the message, as bytes
+        :return: The message dictionary, or None if the payload is corrupt
+        """
+        try:
+            return json.loads(str(payload, 'utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            MessageEntity.logger.error('Corrupt message received from %s' % formatipport(addr))
+            return None
 
-    def _recvall(self, sock, n):
+    def _process_control(self, conn, payload, msgs):
         """
-        Method that performs a series of reads on a socket in order to reach the (known) length of a received package
+        Processes a control frame received from a host
 
-        The length of the message is always known since it is a part of the header in our protocol.
+        Heartbeats are answered immediately, and the answers are used to update the round-trip time of the host. The
+        compression codec announced by the host is used to choose the one for the connection. Frames related to
+        multicast broadcasts are processed by subclasses.
 
-        :param sock: The socket from which the message must be received
-        :param n: The length of the message
+        :param conn: the MessageConnection object from which the frame was received
+        :param payload: the payload of the control frame
+        :param msgs: the list of messages received from the host before the frame, and not yet processed
+        :return: True if successful, False if the host must be considered dead
         """
-        # Helper function to recv n bytes or return None if EOF is hit
-        data = b''
-        while len(data) < n:
-            packet = sock.recv(n - len(data))
-            if not packet:
-                return None
-            data += packet
-        return data
+        try:
+            ctl_type = payload[0]
+            if ctl_type == MessageEntity._CONTROL_COMPRESS:
+                codec = MessageEntity._CONTROL_COMPRESS_PAYLOAD.unpack(payload)[1]
+                if self.compression != Compression.CODEC_NONE:
+                    conn.compression.codec = min(codec, self.compression)
+                return True
+            elif ctl_type not in (MessageEntity._CONTROL_PING, MessageEntity._CONTROL_PONG):
+                return self._process_multicast_control(conn, ctl_type, payload, msgs)
+            ctl_type, timestamp = MessageEntity._CONTROL_PAYLOAD.unpack(payload)
+        except (struct.error, IndexError):
+            MessageEntity.logger.error('Corrupt control frame received from %s' % formatipport(conn.addr))
+            return True
+        if ctl_type == MessageEntity._CONTROL_PING:
+            return self._send_control(conn.addr, MessageEntity._CONTROL_PONG, timestamp)
+        elif ctl_type == MessageEntity._CONTROL_PONG:
+            sample = time() - timestamp
+            # The RTT is smoothed in the same way as TCP does
+            conn.rtt = sample if conn.rtt is None else 0.875 * conn.rtt + 0.125 * sample
+        return True
+
+    def _process_multicast_control(self, conn, ctl_type, payload, msgs):
+        """
+        Processes a control frame related to multicast broadcasts. Frames of this kind that are not supported by
+        subclasses are ignored
+
+        :param conn: the MessageConnection object from which the frame was received
+        :param ctl_type: the type of control frame, one of the _CONTROL_MCAST_* constants
+        :param payload: the payload of the control frame
+        :param msgs: the list of messages received from the host before the frame, and not yet processed. Subclasses
+            may process them, emptying the list, if messages following the frame must be delivered right away
+        :return: True if successful, False if the host must be considered dead
+        """
+        MessageEntity.logger.warning('Unsupported control frame %s received from %s' % (ctl_type, formatipport(conn.addr)))
+        return True
+
+    def _send_control(self, addr, ctl_type, timestamp):
+        """
+        Sends a control frame to a registered host, with priority over all other messages
+
+        :param addr: address of the target host
+        :param ctl_type: the type of control frame, one of the _CONTROL_* constants
+        :param timestamp: the timestamp to be sent in the frame
+        :return: True if the frame was successfully queued or sent, False otherwise
+        """
+        return self._send_control_payload(addr, MessageEntity._CONTROL_PAYLOAD.pack(ctl_type, timestamp))
+
+    def _update_sent_seq_num(self, conn):
+        """
+        Refreshes the sent sequence number of a host, using the last message such that all messages before it were
+        written to its connection
+
+        :param conn: the MessageConnection object of the host
+        """
+        if self.reSendMsgs and conn.sentSeqNum is not None:
+            # Messages are forwarded again after a connection loss starting from the first one that was not written,
+            # as the queued ones are discarded together with the connection
+            self._update_seq_num(conn.addr, conn.sentSeqNum, received=False)
+
+    def _send_control_payload(self, addr, payload, lane=MessageConnection.LANE_CONTROL, ordered=False, seq_num=None):
+        """
+        Sends a control frame with an arbitrary payload to a registered host
+
+        :param addr: address of the target host
+        :param payload: the payload of the frame, whose first byte is the type of control frame
+        :param lane: the lane of the connection to which the frame must be added
+        :param ordered: if True, the frame must not overtake the messages sent before it to the host
+        :param seq_num: sequence number of a message that the host can deliver only once it has received the frame. If
+            not None, the message is tracked until the frame is written
+        :return: True if the frame was successfully queued or sent, False otherwise
+        """
+        frames = FrameBuffer.build_frames((0, 0), payload, flags=FrameBuffer.FLAG_CONTROL)
+        if seq_num is None:
+            return self._send_frames((0, 0), addr, frames, lane, track=False, control=True, ordered=ordered)
+        return self._send_frames(seq_num, addr, frames, lane, control=True, ordered=ordered)
+
+    def _send_multicast(self, seq_num, frames):
+        """
+        Sends the frames of a broadcast message as a multicast datagram
+
+        Hosts that were sent other messages after the previous datagram are listed in the datagram, and are then sent
+        a barrier right after those messages: they deliver the datagram only once they have received the barrier.
+        For message forwarding purposes, the datagram counts as sent to the other hosts in the stream right away, and
+        to the listed ones once their barrier is written.
+
+        :param seq_num: sequence number of the message in tuple format
+        :param frames: the list of encoded frames
+        :return: True if the message was sent through multicast, False if it must be sent to each host separately
+        """
+        fenced = [self._registeredHosts[addr] for addr in self._mcastFenced if addr in self._registeredHosts]
+        if not self._mcastSender.send(frames, [conn.mcastId for conn in fenced]):
+            return False
+        self._mcastFenced.clear()
+        for conn in self._registeredHosts.values():
+            if conn.multicast and conn not in fenced:
+                conn.mark_sent(seq_num)
+                self._update_sent_seq_num(conn)
+        to_remove = [conn.addr for conn in fenced if not self._sync_multicast(conn, seq_num)]
+        for addr in to_remove:
+            self._remove_host(addr)
+        return True
+
+    def _sync_multicast(self, conn, seq_num=None):
+        """
+        Sends a barrier to a host that joined the multicast stream, telling it how many datagrams were sent up to now,
+        if it has changed since the last time
+
+        The host then waits for all of those datagrams before processing the messages that follow, and detects the
+        ones that were lost.
+
+        :param conn: the MessageConnection object of the host
+        :param seq_num: sequence number of the datagram that the host can deliver only after the barrier, if any
+        :return: True if successful, False if the host must be considered dead
+        """
+        next_seq = self._mcastSender.nextSeq
+        if conn.mcastSynced == next_seq:
+            if seq_num is not None:
+                conn.mark_sent(seq_num)
+                self._update_sent_seq_num(conn)
+            return True
+        conn.mcastSynced = next_seq
+        payload = MessageEntity._CONTROL_SYNC_PAYLOAD.pack(MessageEntity._CONTROL_MCAST_SYNC, self._mcastSender.streamId,
+                                                           next_seq)
+        # Barriers are never dropped, but must stay behind the messages sent before them, even if they were spilled
+        return self._send_control_payload(conn.addr, payload, MessageConnection.LANE_MESSAGES, ordered=True,
+                                          seq_num=seq_num)
+
+    def _check_heartbeats(self):
+        """
+        Sends heartbeats to all registered hosts, and removes those from which no data was received within the
+        heartbeat timeout
+
+        Hosts are checked once per heartbeat interval, so that failures are detected at most heartbeat_interval seconds
+        after the timeout has expired. Removed hosts go through the same path as hosts whose connection was closed.
+
+        :return: The time in seconds until the next check, to be used as timeout for the selector
+        """
+        if not self.heartbeat_interval:
+            return self.sock_timeout
+        time_now = time()
+        if time_now < self._nextHeartbeat:
+            return min(self._nextHeartbeat - time_now, self.sock_timeout)
+        to_remove = []
+        for addr, conn in self._registeredHosts.items():
+            if time_now - conn.lastRecv > self.heartbeat_timeout:
+                MessageEntity.logger.warning('No heartbeat received from host %s, assuming it is dead' % formatipport(addr))
+                to_remove.append(addr)
+            elif time_now - conn.lastPing >= self.heartbeat_interval:
+                conn.lastPing = time_now
+                if not self._send_control(addr, MessageEntity._CONTROL_PING, time_now):
+                    to_remove.append(addr)
+        for addr in to_remove:
+            self._remove_host(addr)
+        self._nextHeartbeat = time_now + self.heartbeat_interval
+        return min(self.heartbeat_interval, self.sock_timeout)
 
     def _register_host(self, connection, overwrite=False):
         """
@@ -394,14 +855,51 @@ class MessageEntity(ABC):
 
         :param connection: the socket object corresponding to the host
         :param overwrite: if True, connections will be overwritten by new connections to the same host
+        :return: the address of the registered host, or None if it could not be registered
         """
-        addr = connection.getpeername()
+        addr = self._get_peer_address(connection)
         if addr not in self._registeredHosts or overwrite:
-            self._registeredHosts[addr] = connection
-            self._update_read_set()
+            if addr in self._registeredHosts:
+                old_conn = self._registeredHosts[addr]
+                self._selector.unregister(old_conn.sock)
+                old_conn.close()
+            self._configure_socket(connection)
+            connection.setblocking(False)
+            conn = MessageConnection(connection, addr, high_water=self.send_high_water, low_water=self.send_low_water,
+                                     policy=self.overflow_policy)
+            conn.events = selectors.EVENT_READ
+            self._registeredHosts[addr] = conn
+            # The connection object is attached to the socket in the selector, and returned with its events
+            self._selector.register(connection, conn.events, conn)
+            # Compression is used only if the host announces that it wants to use it as well. Errors are detected when
+            # reading from the socket
+            if self.compression != Compression.CODEC_NONE:
+                self._send_control_payload(addr, MessageEntity._CONTROL_COMPRESS_PAYLOAD.pack(
+                    MessageEntity._CONTROL_COMPRESS, self.compression))
+            return addr
         else:
             connection.close()
             MessageEntity.logger.error('Cannot register host %s, is already registered' % formatipport(addr))
+            return None
+
+    def _get_peer_address(self, connection):
+        """
+        Returns the address used to identify the host at the other end of a connection
+
+        Hosts connected through TCP are identified by their (ip, port) address. Servers reached through Unix domain
+        sockets are identified by a (unix, path) tuple, while the clients of such sockets have no name, and are
+        assigned a (unix, path#id) tuple with a unique id.
+
+        :param connection: the socket object of the connection
+        :return: an address tuple
+        """
+        if connection.family != socket.AF_UNIX:
+            return connection.getpeername()
+        path = connection.getpeername()
+        if not path:
+            self._unixConnId += 1
+            path = '%s#%d' % (connection.getsockname(), self._unixConnId)
+        return UNIX_ID, path
 
     def _remove_host(self, address):
         """
@@ -410,32 +908,46 @@ class MessageEntity(ABC):
         :param address: The (ip, port) address corresponding to the host to remove
         """
         if address in self._registeredHosts:
-            self._registeredHosts[address].close()
-            self._registeredHosts.pop(address, None)
-            self._update_read_set()
+            conn = self._registeredHosts.pop(address)
+            self._selector.unregister(conn.sock)
+            conn.close()
         else:
             MessageEntity.logger.error('Cannot remove host %s, does not exist' % formatipport(address))
 
-    def _trim_dead_sockets(self):
+    def _configure_socket(self, sock):
         """
-        This method removes all sockets that are in error state from the list of active hosts
+        Applies the configured options to a socket
 
-        Must be called every time a 'select' call fails.
+        :param sock: the socket object
         """
-        for sock in self._registeredHosts.values():
-            try:
-                # We perform one select call on each active socket, and if an error is encountered,
-                # the host is removed
-                select.select([sock], [], [], 0)
-            except select.error:
-                MessageEntity.logger.warning('Removing host %s due to errors' % getipport(sock))
-                self._remove_host(sock)
+        is_tcp = sock.family in (socket.AF_INET, socket.AF_INET6)
+        if self.tcp_nodelay and is_tcp:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.tcp_keepalive is not None and is_tcp:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            # Dead peers are detected after the idle time, plus three probes spaced by a third of it
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, max(int(self.tcp_keepalive), 1))
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(int(self.tcp_keepalive) // 3, 1))
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+        if self.tcp_user_timeout is not None and is_tcp and hasattr(socket, 'TCP_USER_TIMEOUT'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, int(self.tcp_user_timeout * 1000))
+        if self.sock_sndbuf is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sock_sndbuf)
+        if self.sock_rcvbuf is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.sock_rcvbuf)
 
-    def _update_read_set(self):
+    def _is_registered(self, conn):
         """
-        Updates the list of socket enabled for reading on the 'select' calls
+        Checks whether a connection returned by the selector still corresponds to a registered host
+
+        Hosts may be removed while processing the events of a single select call, and their connections must then be
+        skipped.
+
+        :param conn: The MessageConnection object to be checked
+        :return: True if the connection is registered, False otherwise
         """
-        self._readSet = [self._dummy_sock_r] + list(self._registeredHosts.values())
+        return self._registeredHosts.get(conn.addr) is conn
 
     @abstractmethod
     def _listen(self):
@@ -0,0 +1,207 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import struct
+
+
+class FrameBuffer:
+    """
+    Per-connection receive buffer, that accumulates the raw data read from a socket and splits it into frames.
+
+    Data is read with recv_into on a preallocated bytearray, and complete frames are handed out as memoryview slices
+    of the buffer itself, without copying. Such slices are valid only until the next read on the buffer, and must be
+    decoded (or copied) before that happens.
+
+    Large messages may be split by the sender into a series of chunk frames, which can be interleaved with other
+    frames: chunks are reassembled here, and handed out as a single frame once the last one has been received.
+    """
+
+    # Header of each frame: payload length, the sequence number of the message in (timestamp, number) format, and flags
+    HEADER = struct.Struct('>IIIB')
+    HEADER_LEN = HEADER.size
+
+    # Flags for frames that are chunks of a larger message, and for the last chunk of such a message
+    FLAG_CHUNK = 0x01
+    FLAG_LAST = 0x02
+    # Flag for control frames, that are consumed by the messaging layer and never delivered as messages
+    FLAG_CONTROL = 0x04
+    # Flag for messages whose payload is compressed. Messages are compressed as a whole, before being split into chunks
+    FLAG_COMPRESSED = 0x08
+
+    @staticmethod
+    def build_frames(seq_num, payload, flags=0, chunk_size=None):
+        """
+        Encodes a payload into one or more frames, splitting it into chunks if it is larger than chunk_size
+
+        :param seq_num: The sequence number of the message in (timestamp, number) format
+        :param payload: A bytes object containing the payload
+        :param flags: Additional flags to be set in the header of all frames
+        :param chunk_size: The maximum payload size of a single frame. If None, payloads are never split
+        :return: A list of bytes objects, one for each frame
+        """
+        if chunk_size is None or len(payload) <= chunk_size:
+            return [FrameBuffer.HEADER.pack(len(payload), seq_num[0], seq_num[1], flags) + payload]
+        view = memoryview(payload)
+        frames = []
+        for start in range(0, len(payload), chunk_size):
+            chunk = view[start:start + chunk_size]
+            chunk_flags = flags | FrameBuffer.FLAG_CHUNK
+            if start + chunk_size >= len(payload):
+                chunk_flags |= FrameBuffer.FLAG_LAST
+            frames.append(FrameBuffer.HEADER.pack(len(chunk), seq_num[0], seq_num[1], chunk_flags) + chunk)
+        return frames
+
+    @staticmethod
+    def split_frames(data):
+        """
+        Splits a bytes object containing a series of concatenated frames into the single frames
+
+        :param data: A bytes-like object
+        :return: A list of memoryviews, one for each frame
+        """
+        view = memoryview(data)
+        frames = []
+        start = 0
+        while start < len(view):
+            end = start + FrameBuffer.HEADER_LEN + FrameBuffer.HEADER.unpack_from(view, start)[0]
+            frames.append(view[start:end])
+            start = end
+        return frames
+
+    @staticmethod
+    def join_frames(frames):
+        """
+        Extracts the whole payload of a message from its frames, as produced by build_frames
+
+        :param frames: A list of bytes-like objects, one for each frame
+        :return: A tuple containing the payload as a bytes object, and the flags of the message without chunk flags
+        """
+        flags = FrameBuffer.HEADER.unpack_from(frames[0])[3] & ~(FrameBuffer.FLAG_CHUNK | FrameBuffer.FLAG_LAST)
+        return b''.join(memoryview(f)[FrameBuffer.HEADER_LEN:] for f in frames), flags
+
+    def __init__(self, size=65536):
+        """
+        Constructor for the class
+
+        :param size: The default size in bytes of the buffer. The buffer is enlarged to fit frames that are larger
+            than this, and shrunk back once such frames have been consumed
+        """
+        self._defaultSize = max(size, FrameBuffer.HEADER_LEN)
+        self._buf = bytearray(self._defaultSize)
+        self._view = memoryview(self._buf)
+        # Start and end positions of the data that has been read but not consumed yet
+        self._start = 0
+        self._end = 0
+        # Payload of the chunked message currently being reassembled, if any
+        self._chunks = None
+
+    def pending_bytes(self):
+        """
+        Returns the number of bytes that have been received, but do not belong to a complete frame yet
+
+        :return: A number of bytes
+        """
+        return self._end - self._start
+
+    def recv_from(self, sock):
+        """
+        Performs a single read from the input socket, storing the data into the buffer
+
+        Exceptions raised by the socket are propagated to the caller.
+
+        :param sock: The socket from which data must be read
+        :return: The number of bytes read. 0 means that the connection was closed by the peer
+        """
+        self._reserve()
+        n = sock.recv_into(self._view[self._end:])
+        self._end += n
+        return n
+
+    def frames(self):
+        """
+        Generator that extracts all of the complete frames currently in the buffer
+
+        :return: A series of (length, seq_num, flags, payload) tuples, where seq_num is in (timestamp, number) format
+            and the payload is a memoryview. Chunked messages are returned as a single frame, without chunk flags
+        """
+        while self._end - self._start >= FrameBuffer.HEADER_LEN:
+            msglen, seq_ts, seq, flags = FrameBuffer.HEADER.unpack_from(self._buf, self._start)
+            begin = self._start + FrameBuffer.HEADER_LEN
+            if self._end - begin < msglen:
+                break
+            self._start = begin + msglen
+            payload = self._view[begin:self._start]
+            if flags & FrameBuffer.FLAG_CHUNK:
+                # Chunks must be copied, as they will be overwritten by the following reads
+                if self._chunks is None:
+                    self._chunks = bytearray()
+                self._chunks += payload
+                payload.release()
+                if not flags & FrameBuffer.FLAG_LAST:
+                    continue
+                payload = memoryview(self._chunks)
+                self._chunks = None
+                msglen = len(payload)
+                flags &= ~(FrameBuffer.FLAG_CHUNK | FrameBuffer.FLAG_LAST)
+            yield msglen, (seq_ts, seq), flags, payload
+            payload.release()
+        if self._start == self._end:
+            self._start = self._end = 0
+            # If the buffer was enlarged for a large frame, we go back to the default size
+            if len(self._buf) > self._defaultSize:
+                self._replace(self._defaultSize)
+
+    def _reserve(self):
+        """
+        Makes sure that there is free space at the end of the buffer, and that the frame currently being received
+        can fit into it entirely
+        """
+        pending = self._end - self._start
+        needed = FrameBuffer.HEADER_LEN
+        if pending >= FrameBuffer.HEADER_LEN:
+            needed += FrameBuffer.HEADER.unpack_from(self._buf, self._start)[0]
+        if needed > len(self._buf):
+            self._replace(needed)
+        elif self._start > 0 and (self._end == len(self._buf) or self._start + needed > len(self._buf)):
+            # The partial frame is moved to the beginning of the buffer, to make room for the rest of it
+            self._buf[:pending] = self._buf[self._start:self._end]
+            self._start = 0
+            self._end = pending
+
+    def _replace(self, size):
+        """
+        Replaces the underlying bytearray with a new one of the given size, preserving unconsumed data
+
+        Memoryviews that were previously handed out keep referencing the old buffer, which is released once they are
+        garbage collected.
+
+        :param size: The size of the new buffer
+        """
+        pending = self._end - self._start
+        buf = bytearray(size)
+        buf[:pending] = self._view[self._start:self._end]
+        self._buf = buf
+        self._view = memoryview(buf)
+        self._start = 0
+        self._end = pending
@@ -0,0 +1,200 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging, os, struct
+from array import array
+from bisect import bisect_right
+from shutil import rmtree
+from tempfile import mkdtemp
+from fault_injector.network.msg_frame import FrameBuffer
+
+
+class MessageHistory:
+    """
+    Class that stores the history of sent messages as already-encoded frames, indexed by sequence number.
+
+    The most recent messages are kept in memory. Older ones are spilled to a bounded log of segment files on disk, each
+    of which has an in-memory index of sequence numbers and file offsets. Finding the messages that follow a given
+    sequence number is done by binary search, so that replaying k messages costs O(log n + k).
+    """
+
+    # Logger for the class
+    logger = logging.getLogger('MessageHistory')
+
+    # Header of records in segment files: length of the frames, and their lane
+    _RECORD_HEADER = struct.Struct('>IB')
+
+    @staticmethod
+    def seq_to_key(seq_num):
+        """
+        Converts a sequence number in (timestamp, number) format to a single integer, preserving its ordering
+
+        :param seq_num: A sequence number tuple
+        :return: An integer key
+        """
+        return (seq_num[0] << 32) | seq_num[1]
+
+    @staticmethod
+    def key_to_seq(key):
+        """
+        Performs reverse conversion, from integer key to sequence number tuple
+
+        :param key: An integer key
+        :return: A sequence number tuple
+        """
+        return key >> 32, key & 0xFFFFFFFF
+
+    def __init__(self, max_length=4096, max_disk_size=268435456, segment_size=16777216, path=None):
+        """
+        Constructor for the class
+
+        :param max_length: The maximum number of messages kept in memory
+        :param max_disk_size: The maximum size in bytes of the segment log on disk. Once exceeded, the oldest segments
+            are deleted. If 0, older messages are simply discarded
+        :param segment_size: The size in bytes after which a new segment file is started
+        :param path: The directory in which segment files are stored. If None, a temporary directory is used
+        """
+        self._maxLength = max(max_length, 1)
+        self._maxDiskSize = max_disk_size
+        self._segmentSize = segment_size
+        self._basePath = path
+        self._path = None
+        # In-memory entries: sorted keys, and the corresponding (frames, lane) tuples. Entries before _head have
+        # already been spilled, and are trimmed periodically
+        self._keys = []
+        self._entries = []
+        self._head = 0
+        # On-disk segments, from oldest to newest. Each is a list containing its path, file object, size, and the
+        # arrays of keys and offsets of its records
+        self._segments = []
+        self._segmentId = 0
+        self._diskSize = 0
+
+    def __len__(self):
+        return len(self._keys) - self._head + sum(len(seg[3]) for seg in self._segments)
+
+    def append(self, seq_num, frames, lane):
+        """
+        Adds a message to the history. Sequence numbers must be supplied in increasing order
+
+        :param seq_num: The sequence number of the message in tuple format
+        :param frames: The list of encoded frames of the message
+        :param lane: The lane in which the frames were sent
+        """
+        self._keys.append(MessageHistory.seq_to_key(seq_num))
+        self._entries.append((frames, lane))
+        if len(self._keys) - self._head > self._maxLength:
+            if self._maxDiskSize > 0:
+                self._spill(self._keys[self._head], self._entries[self._head])
+            self._entries[self._head] = None
+            self._head += 1
+            if self._head >= self._maxLength:
+                del self._keys[:self._head]
+                del self._entries[:self._head]
+                self._head = 0
+
+    def iter_after(self, seq_num):
+        """
+        Generator that returns all messages in the history following a given sequence number, in order
+
+        :param seq_num: A sequence number in tuple format. If None, the whole history is returned
+        :return: A series of (seq_num, frames, lane) tuples
+        """
+        key = MessageHistory.seq_to_key(seq_num) if seq_num is not None else -1
+        # The first segment that may contain messages after the key is the last one starting before or at it
+        first_seg = max(bisect_right([seg[3][0] for seg in self._segments], key) - 1, 0)
+        for seg in self._segments[first_seg:]:
+            idx = bisect_right(seg[3], key)
+            if idx == len(seg[3]):
+                continue
+            seg[1].flush()
+            with open(seg[0], 'rb') as rfile:
+                rfile.seek(seg[4][idx])
+                for k in seg[3][idx:]:
+                    length, lane = MessageHistory._RECORD_HEADER.unpack(rfile.read(MessageHistory._RECORD_HEADER.size))
+                    blob = rfile.read(length)
+                    yield MessageHistory.key_to_seq(k), FrameBuffer.split_frames(blob), lane
+        idx = bisect_right(self._keys, key, self._head)
+        for i in range(idx, len(self._keys)):
+            frames, lane = self._entries[i]
+            yield MessageHistory.key_to_seq(self._keys[i]), frames, lane
+
+    def close(self):
+        """
+        Discards the whole history, deleting all segment files
+        """
+        for seg in self._segments:
+            seg[1].close()
+        self._segments.clear()
+        self._diskSize = 0
+        if self._path is not None:
+            rmtree(self._path, ignore_errors=True)
+            self._path = None
+        self._keys.clear()
+        self._entries.clear()
+        self._head = 0
+
+    def _spill(self, key, entry):
+        """
+        Appends a message to the newest segment file on disk, deleting the oldest segments if the size limit is reached
+
+        :param key: The integer key of the message
+        :param entry: A (frames, lane) tuple
+        """
+        frames, lane = entry
+        blob = b''.join(frames)
+        if (not self._segments or self._segments[-1][2] >= self._segmentSize) and not self._new_segment():
+            return
+        seg = self._segments[-1]
+        seg[1].write(MessageHistory._RECORD_HEADER.pack(len(blob), lane))
+        seg[1].write(blob)
+        seg[3].append(key)
+        seg[4].append(seg[2])
+        size = MessageHistory._RECORD_HEADER.size + len(blob)
+        seg[2] += size
+        self._diskSize += size
+        while self._diskSize > self._maxDiskSize and len(self._segments) > 1:
+            old_seg = self._segments.pop(0)
+            old_seg[1].close()
+            os.remove(old_seg[0])
+            self._diskSize -= old_seg[2]
+
+    def _new_segment(self):
+        """
+        Starts a new segment file. If this is not possible, spilling to disk is disabled
+
+        :return: True if successful, False otherwise
+        """
+        try:
+            if self._path is None:
+                self._path = mkdtemp(prefix='finj-history-', dir=self._basePath)
+            seg_path = os.path.join(self._path, 'segment-%d.log' % self._segmentId)
+            wfile = open(seg_path, 'wb')
+        except (FileNotFoundError, IOError):
+            MessageHistory.logger.error('Cannot write message history to disk, older messages will be discarded')
+            self._maxDiskSize = 0
+            return False
+        self._segmentId += 1
+        self._segments.append([seg_path, wfile, 0, array('Q'), array('Q')])
+        return True
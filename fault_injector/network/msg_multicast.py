@@ -0,0 +1,360 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging, socket, struct
+from random import getrandbits
+from fault_injector.network.msg_history import MessageHistory
+
+
+class MulticastSender:
+    """
+    Class that sends broadcast messages as a stream of UDP multicast datagrams, each containing the encoded frame of a
+    single message.
+
+    Datagrams are numbered with a multicast sequence number, and belong to a stream with a random ID. Each datagram
+    also lists the receivers that were sent other messages, through their TCP connection, after the previous
+    datagram: those receivers must not deliver it before such messages. Recently sent datagrams are kept in a buffer,
+    from which receivers that have detected a gap can be repaired through their TCP connection.
+    """
+
+    # Logger for the class
+    logger = logging.getLogger('MulticastSender')
+
+    # Header of datagrams: ID of the stream, multicast sequence number, and number of listed receivers, each of which
+    # is identified by a 32-bit member ID
+    HEADER = struct.Struct('>IIH')
+    MEMBER = struct.Struct('>I')
+
+    @staticmethod
+    def parse(datagram):
+        """
+        Decodes a datagram
+
+        :param datagram: The datagram as a bytes-like object
+        :return: A (stream ID, sequence number, member IDs, frame) tuple, or None if the datagram is corrupt
+        """
+        if len(datagram) < MulticastSender.HEADER.size:
+            return None
+        stream_id, seq, n_members = MulticastSender.HEADER.unpack_from(datagram)
+        start = MulticastSender.HEADER.size + n_members * MulticastSender.MEMBER.size
+        if len(datagram) < start:
+            return None
+        members = struct.unpack_from('>%dI' % n_members, datagram, MulticastSender.HEADER.size)
+        return stream_id, seq, members, memoryview(datagram)[start:]
+
+    def __init__(self, group, interface=None, ttl=1, max_size=1472, buffer_length=4096):
+        """
+        Constructor for the class. Raises OSError if the multicast socket cannot be set up
+
+        :param group: The (ip, port) address of the multicast group
+        :param interface: The IP address of the interface on which datagrams are sent. If None, the system default
+            is used
+        :param ttl: The time-to-live of datagrams, limiting the number of routers they can go through
+        :param max_size: The maximum size of a single datagram. Larger messages are not sent through multicast
+        :param buffer_length: The number of recent datagrams kept for repairing receivers
+        """
+        self.group = (group[0], int(group[1]))
+        self.streamId = getrandbits(32)
+        self.maxSize = max_size
+        # The sequence number of the next datagram
+        self.nextSeq = 0
+        self._buffer = MessageHistory(max_length=buffer_length, max_disk_size=0)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+            # Receivers on the same machine must get datagrams as well
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            if interface is not None:
+                self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+            self._sock.setblocking(False)
+        except OSError:
+            self._sock.close()
+            raise
+
+    def send(self, frames, members=()):
+        """
+        Sends the frames of a message as a datagram
+
+        :param frames: The list of encoded frames of the message
+        :param members: The member IDs of receivers that must deliver the datagram only after the messages they were
+            sent through TCP
+        :return: True if the message was sent, False if it does not fit into a single datagram
+        """
+        size = MulticastSender.HEADER.size + len(members) * MulticastSender.MEMBER.size
+        if len(frames) != 1 or size + len(frames[0]) > self.maxSize:
+            return False
+        data = MulticastSender.HEADER.pack(self.streamId, self.nextSeq, len(members)) + \
+            struct.pack('>%dI' % len(members), *members) + frames[0]
+        try:
+            self._sock.sendto(data, self.group)
+        except OSError:
+            # Datagrams that could not be sent are treated as lost, and are repaired later
+            pass
+        self._buffer.append((0, self.nextSeq), [data], 0)
+        self.nextSeq += 1
+        return True
+
+    def get_datagrams(self, first, last):
+        """
+        Returns the buffered datagrams in a range of sequence numbers, for repair purposes
+
+        :param first: The first sequence number of the range
+        :param last: The sequence number after the last one of the range
+        :return: A list of datagrams, or None if some of them are not in the buffer anymore
+        """
+        datagrams = []
+        for seq_num, frames, lane in self._buffer.iter_after((0, first - 1) if first > 0 else None):
+            if seq_num[1] >= last:
+                break
+            datagrams.append(frames[0])
+        if len(datagrams) != last - first:
+            return None
+        return datagrams
+
+    def close(self):
+        """
+        Closes the multicast socket
+        """
+        self._sock.close()
+        self._buffer.close()
+
+
+class _MulticastStream:
+    """
+    Reception state of a multicast stream
+    """
+
+    def __init__(self, addr, member_id, start):
+        """
+        Constructor for the class
+
+        :param addr: The address of the sender, to which messages are attributed
+        :param member_id: The member ID assigned to this receiver by the sender
+        :param start: The sequence number of the first datagram to be delivered
+        """
+        self.addr = addr
+        self.memberId = member_id
+        # The next datagram to be delivered, the highest barrier received from the sender, and the end of the last
+        # requested repair
+        self.next = start
+        self.barrier = start
+        self.repaired = start
+        # Dictionary of datagrams that cannot be delivered yet, with (frame, fenced) values
+        self.pending = {}
+
+
+class MulticastReceiver:
+    """
+    Class that receives the datagrams of multicast streams, and puts them back in order.
+
+    Each stream is associated to the TCP connection of its sender, which supplies barriers: a barrier states that all
+    datagrams before a certain sequence number have been sent. Messages received through TCP after a barrier must
+    wait until all datagrams before it have been delivered, and datagrams that list this receiver must wait until a
+    barrier beyond them has been received. This way, the relative ordering of messages sent through the two channels
+    is preserved. Missing datagrams must be requested to the sender through the TCP connection.
+    """
+
+    # Logger for the class
+    logger = logging.getLogger('MulticastReceiver')
+
+    # Maximum number of out-of-order datagrams buffered for each stream
+    MAX_PENDING = 65536
+
+    def __init__(self, interface=None):
+        """
+        Constructor for the class
+
+        :param interface: The IP address of the interface on which multicast groups are joined. If None, the system
+            default is used
+        """
+        self.interface = interface
+        # Dictionary of UDP sockets, by port, and set of the joined groups
+        self._socks = {}
+        self._groups = set()
+        # Dictionary of _MulticastStream objects by stream ID
+        self._streams = {}
+
+    def join(self, group, stream_id, member_id, start, addr):
+        """
+        Joins a multicast group, and starts accepting a stream of datagrams from it
+
+        :param group: The (ip, port) address of the multicast group
+        :param stream_id: The ID of the stream
+        :param member_id: The member ID assigned to this receiver by the sender
+        :param start: The sequence number of the first datagram of the stream to be delivered
+        :param addr: The address of the sender, to which messages will be attributed
+        :return: The new UDP socket that must be watched for reading, or None if no new socket was created. Raises
+            OSError if the group cannot be joined
+        """
+        new_sock = None
+        if group[1] not in self._socks:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                # Several receivers on the same machine may listen on the same port
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                if hasattr(socket, 'SO_REUSEPORT'):
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+                sock.bind(('', group[1]))
+                sock.setblocking(False)
+            except OSError:
+                sock.close()
+                raise
+            self._socks[group[1]] = sock
+            new_sock = sock
+        if group not in self._groups:
+            if self.interface is not None:
+                interface = socket.inet_aton(self.interface)
+            else:
+                interface = struct.pack('=I', socket.INADDR_ANY)
+            self._socks[group[1]].setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                                             socket.inet_aton(group[0]) + interface)
+            self._groups.add(group)
+        self.add_stream(stream_id, member_id, start, addr)
+        return new_sock
+
+    def add_stream(self, stream_id, member_id, start, addr):
+        """
+        Starts accepting a stream of datagrams, without joining its multicast group
+
+        This is used when the group cannot be joined: the datagrams of the stream are then received as repairs through
+        the TCP connection of the sender, and are still delivered in order with respect to its other messages.
+
+        :param stream_id: The ID of the stream
+        :param member_id: The member ID assigned to this receiver by the sender
+        :param start: The sequence number of the first datagram of the stream to be delivered
+        :param addr: The address of the sender, to which messages will be attributed
+        """
+        self._streams[stream_id] = _MulticastStream(addr, member_id, start)
+
+    def leave(self, addr):
+        """
+        Stops accepting the streams of a sender, for example because its connection was lost
+
+        :param addr: The address of the sender
+        """
+        for stream_id in [s_id for s_id, stream in self._streams.items() if stream.addr == addr]:
+            self._streams.pop(stream_id)
+
+    def recv(self, sock):
+        """
+        Reads all available datagrams from a socket
+
+        :param sock: The UDP socket
+        :return: A list of decoded datagrams, as returned by MulticastSender.parse
+        """
+        datagrams = []
+        while True:
+            try:
+                data = sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                MulticastReceiver.logger.error('Error while receiving multicast datagrams')
+                break
+            datagram = MulticastSender.parse(data)
+            if datagram is not None:
+                datagrams.append(datagram)
+        return datagrams
+
+    def add(self, stream_id, seq, members, frame):
+        """
+        Adds a datagram to its stream
+
+        :param stream_id: The ID of the stream
+        :param seq: The sequence number of the datagram
+        :param members: The member IDs of receivers listed in the datagram
+        :param frame: The frame contained in the datagram
+        :return: The same as pop_ready
+        """
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            return None
+        if seq >= stream.next and seq not in stream.pending and len(stream.pending) < MulticastReceiver.MAX_PENDING:
+            stream.pending[seq] = (frame, stream.memberId in members)
+        return self.pop_ready(stream_id)
+
+    def pop_ready(self, stream_id):
+        """
+        Returns the datagrams of a stream that can be delivered in order
+
+        :param stream_id: The ID of the stream
+        :return: A tuple containing the address of the sender and the list of (sequence number, frame) tuples that can
+            now be delivered, or None if the stream is not known
+        """
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            return None
+        frames = []
+        while stream.next in stream.pending:
+            frame, fenced = stream.pending[stream.next]
+            # The datagram follows messages sent through TCP, which are certainly received before the next barrier
+            if fenced and stream.barrier <= stream.next:
+                break
+            del stream.pending[stream.next]
+            frames.append((stream.next, frame))
+            stream.next += 1
+        return stream.addr, frames
+
+    def set_barrier(self, stream_id, seq):
+        """
+        Records that all datagrams up to a certain sequence number have been sent
+
+        :param stream_id: The ID of the stream
+        :param seq: The sequence number following the last datagram sent
+        :return: True if some of the datagrams before the barrier have not been delivered yet, False otherwise
+        """
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            return False
+        if seq > stream.barrier:
+            stream.barrier = seq
+        return stream.next < seq
+
+    def get_repairs(self):
+        """
+        Returns the ranges of missing datagrams for all streams, that have not been requested yet
+
+        A gap is detected when datagrams following the next expected one have been received, or when the barrier is
+        beyond the next expected datagram.
+
+        :return: A list of (addr, stream ID, first, last) tuples, where last is the sequence number after the range
+        """
+        repairs = []
+        for stream_id, stream in self._streams.items():
+            last = min(stream.pending.keys()) if len(stream.pending) > 0 else stream.barrier
+            first = max(stream.next, stream.repaired)
+            if last > first:
+                repairs.append((stream.addr, stream_id, first, last))
+                stream.repaired = last
+        return repairs
+
+    def close(self):
+        """
+        Closes all sockets
+        """
+        for sock in self._socks.values():
+            sock.close()
+        self._socks.clear()
+        self._groups.clear()
+        self._streams.clear()
@@ -22,9 +22,11 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import select, socket, logging
+import os, selectors, socket, struct, logging
 from fault_injector.network.msg_entity import MessageEntity
-from fault_injector.util.misc import getipport
+from fault_injector.network.msg_frame import FrameBuffer
+from fault_injector.network.msg_multicast import MulticastSender, MulticastReceiver
+from fault_injector.util.misc import formatipport
 
 
 class MessageServer(MessageEntity):
@@ -35,24 +37,40 @@ class MessageServer(MessageEntity):
 
     logger = logging.getLogger('MessageServer')
 
-    def __init__(self, port, socket_timeout=10, max_connections=100, re_send_msgs=False):
+    def __init__(self, port, socket_timeout=10, max_connections=100, re_send_msgs=False, unix_path=None, **kwargs):
         """
         Constructor for the class
         
-        :param port: Listening port for the server socket
+        :param port: Listening port for the server socket. If None, the server listens on the Unix socket only
         :param socket_timeout: Timeout for the sockets
         :param max_connections: Maximum number of concurrent connections to the server
         :param re_send_msgs: if True, the entity will keep track of sent/received messages, and eventually attempt
             to resend them to hosts that have not received them due to a connection loss
+        :param unix_path: Path of a Unix domain socket on which the server listens, in addition to the TCP port. This
+            allows clients running on the same machine to bypass the TCP/IP stack. If None, it is not used
+        :param kwargs: All of the other arguments supported by MessageEntity
         """
-        assert port is not None, 'A listening port for the server must be specified'
-        super().__init__(socket_timeout=socket_timeout, max_connections=max_connections, re_send_msgs=re_send_msgs)
+        assert port is not None or unix_path is not None, 'A listening port for the server must be specified'
+        super().__init__(socket_timeout=socket_timeout, max_connections=max_connections, re_send_msgs=re_send_msgs,
+                         **kwargs)
         # The server socket must be initialized
         self._serverAddress = ('', port)
-        af = socket.AF_INET
-        self._serverSock = socket.socket(af, socket.SOCK_STREAM)
-        self._serverSock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self._readSet = [self._dummy_sock_r, self._serverSock]
+        self._serverSock = None
+        if port is not None:
+            af = socket.AF_INET
+            self._serverSock = socket.socket(af, socket.SOCK_STREAM)
+            self._serverSock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            # Socket options set on the listening socket are inherited by accepted connections
+            self._configure_socket(self._serverSock)
+            self._selector.register(self._serverSock, selectors.EVENT_READ)
+        self._unixPath = unix_path
+        self._unixSock = None
+        if unix_path is not None:
+            self._unixSock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._configure_socket(self._unixSock)
+            self._selector.register(self._unixSock, selectors.EVENT_READ)
+        # Receiver for the multicast streams of broadcast messages announced by clients
+        self._mcastReceiver = MulticastReceiver(interface=self.multicast_interface)
 
     def _listen(self):
         """
@@ -62,45 +80,197 @@ class MessageServer(MessageEntity):
         at the message queue and taking action
         """
         # Listen for incoming connections
-        self._serverSock.bind(self._serverAddress)
-        self._serverSock.listen(self.max_connections)
+        if self._serverSock is not None:
+            self._serverSock.bind(self._serverAddress)
+            self._serverSock.listen(self.max_connections)
+        if self._unixSock is not None:
+            # A socket file left by a previous instance would prevent binding
+            if os.path.exists(self._unixPath):
+                os.remove(self._unixPath)
+            self._unixSock.bind(self._unixPath)
+            self._unixSock.listen(self.max_connections)
         MessageServer.logger.info('Server has been started')
+        timeout = self.sock_timeout
         while not self._hasToFinish:
-            try:
-                read, wr, err = select.select(self._readSet, [], self._readSet, self.sock_timeout)
-                for sock in err:
-                    self._remove_host(sock.getpeername())
-                    if sock in read:
-                        read.remove(sock)
-                for sock in read:
-                    if sock == self._serverSock:
-                        connection, client_address = self._serverSock.accept()
-                        self._register_host(connection)
-                        MessageServer.logger.info('Client %s has subscribed' % getipport(connection))
-                    elif sock == self._dummy_sock_r:
-                        self._flush_output_queue()
-                    else:
-                        if not self._liveness_check(sock):
-                            self._remove_host(sock.getpeername())
-                        else:
-                            peername = sock.getpeername()
-                            data, seq_num = self._recv_msg(sock)
-                            if data is not None:
-                                self._add_to_input_queue(peername, data)
-                            elif self.reSendMsgs and seq_num is not None:
-                                self._forward_old_msgs(seq_num, peername)
-
-            except socket.timeout:
-                pass
-            except select.error:
-                self._trim_dead_sockets()
-        self._serverSock.close()
-        self._dummy_sock_r.close()
-        self._dummy_sock_w.close()
-        for sock in self._registeredHosts.values():
-            sock.close()
+            for key, mask in self._selector.select(timeout):
+                sock = key.fileobj
+                if sock is self._serverSock or sock is self._unixSock:
+                    try:
+                        connection, client_address = sock.accept()
+                        addr = self._register_host(connection)
+                    except OSError:
+                        # The connection may have been aborted by the client before it could be accepted
+                        continue
+                    if addr is not None:
+                        MessageServer.logger.info('Client %s has subscribed' % formatipport(addr))
+                elif sock is self._dummy_sock_r:
+                    self._flush_output_queue()
+                elif key.data is self._mcastReceiver:
+                    for stream_id, seq, members, frame in self._mcastReceiver.recv(sock):
+                        self._deliver_frames(self._mcastReceiver.add(stream_id, seq, members, frame))
+                elif self._is_registered(key.data):
+                    conn = key.data
+                    peername = conn.addr
+                    # Pending outbound frames are written when the socket becomes writable
+                    if mask & selectors.EVENT_WRITE and not self._flush_connection(conn):
+                        self._remove_host(peername)
+                        continue
+                    if not mask & selectors.EVENT_READ:
+                        continue
+                    msgs = self._recv_msgs(conn)
+                    if msgs is None:
+                        self._remove_host(peername)
+                        continue
+                    # All messages that were completely received with this read are processed at once
+                    self._process_msgs(peername, msgs)
+            # Missing multicast datagrams are requested to their senders
+            self._request_repairs()
+            # Heartbeats are sent, and hosts that have stopped responding are removed
+            timeout = self._check_heartbeats()
+        self._selector.close()
+        self._msgHistory.close()
+        self._mcastReceiver.close()
+        if self._serverSock is not None:
+            self._serverSock.close()
+        if self._unixSock is not None:
+            self._unixSock.close()
+            if os.path.exists(self._unixPath):
+                os.remove(self._unixPath)
+        for conn in self._registeredHosts.values():
+            conn.close()
         MessageServer.logger.info('Server has been shut down')
 
+    def _process_msgs(self, addr, msgs):
+        """
+        Processes messages received from a client, putting them on the queue or answering forwarding requests
+
+        :param addr: The address of the client
+        :param msgs: A list of (message, sequence number) tuples, as returned by _recv_msgs
+        """
+        for data, seq_num in msgs:
+            if data is not None:
+                self._add_to_input_queue(addr, data)
+            elif self.reSendMsgs and seq_num is not None:
+                self._forward_old_msgs(seq_num, addr)
+
+    def _process_multicast_control(self, conn, ctl_type, payload, msgs):
+        """
+        Processes a control frame related to multicast broadcasts
+
+        Clients announce their multicast streams, which are joined if possible, and the number of datagrams sent
+        before their following messages: such messages are then held until all of those datagrams have been received.
+        Missing datagrams are received as control frames as well, and so are all the datagrams of streams that could
+        not be joined.
+
+        :param conn: the MessageConnection object from which the frame was received
+        :param ctl_type: the type of control frame, one of the _CONTROL_MCAST_* constants
+        :param payload: the payload of the control frame
+        :param msgs: the list of messages received from the host before the frame, and not yet processed. These are
+            processed before any datagram that the frame allows to deliver
+        :return: True if successful, False if the host must be considered dead
+        """
+        try:
+            if ctl_type == MessageEntity._CONTROL_MCAST_JOIN:
+                ctl_type, stream_id, member_id, start, port, group = MessageEntity._CONTROL_JOIN_PAYLOAD.unpack(payload)
+                group = (socket.inet_ntoa(group), port)
+                try:
+                    sock = self._mcastReceiver.join(group, stream_id, member_id, start, conn.addr)
+                except OSError:
+                    MessageServer.logger.warning('Cannot join multicast group %s of client %s'
+                                                 % (formatipport(group), formatipport(conn.addr)))
+                    # The datagrams sent before the client gets the answer are still delivered in order, once repaired
+                    self._mcastReceiver.add_stream(stream_id, member_id, start, conn.addr)
+                    return self._send_control_payload(conn.addr, bytes([MessageEntity._CONTROL_MCAST_NACK]))
+                if sock is not None:
+                    self._selector.register(sock, selectors.EVENT_READ, self._mcastReceiver)
+                MessageServer.logger.info('Client %s is sending broadcast messages through multicast group %s'
+                                          % (formatipport(conn.addr), formatipport(group)))
+            elif ctl_type == MessageEntity._CONTROL_MCAST_SYNC:
+                ctl_type, stream_id, next_seq = MessageEntity._CONTROL_SYNC_PAYLOAD.unpack(payload)
+                self._process_msgs(conn.addr, msgs)
+                msgs.clear()
+                # The following messages are held until the datagram before the barrier has been delivered. Barriers
+                # are kept in the list of held messages, which may contain several of them
+                if self._mcastReceiver.set_barrier(stream_id, next_seq):
+                    if conn.held is None:
+                        conn.held = []
+                    conn.held.append(next_seq)
+                # Datagrams that were waiting for the barrier can now be delivered
+                self._deliver_frames(self._mcastReceiver.pop_ready(stream_id))
+            elif ctl_type == MessageEntity._CONTROL_MCAST_DATA:
+                datagram = MulticastSender.parse(payload[1:])
+                if datagram is None:
+                    raise struct.error('Corrupt datagram')
+                self._process_msgs(conn.addr, msgs)
+                msgs.clear()
+                self._deliver_frames(self._mcastReceiver.add(*datagram))
+        except struct.error:
+            MessageServer.logger.error('Corrupt control frame received from %s' % formatipport(conn.addr))
+        return True
+
+    def _deliver_frames(self, ready):
+        """
+        Puts the messages contained in multicast datagrams that can be delivered in order on the queue
+
+        Messages of the sender that were held, waiting for the datagrams, are released as soon as their barrier has been
+        reached.
+
+        :param ready: The address of the sender and the list of (sequence number, frame) tuples, as returned by
+            MulticastReceiver. If None, nothing is done
+        """
+        if ready is None:
+            return
+        addr, frames = ready
+        conn = self._registeredHosts.get(addr)
+        for seq, frame in frames:
+            msglen = FrameBuffer.HEADER.unpack_from(frame)[0]
+            data = self._decode_msg(addr, frame[FrameBuffer.HEADER_LEN:FrameBuffer.HEADER_LEN + msglen])
+            if data is not None:
+                self._add_to_input_queue(addr, data)
+            if conn is not None and conn.held is not None:
+                self._release_held_msgs(conn, seq + 1)
+
+    def _release_held_msgs(self, conn, next_seq):
+        """
+        Processes the messages of a client that were held until a certain multicast datagram was delivered
+
+        :param conn: The MessageConnection object of the client
+        :param next_seq: The sequence number of the next datagram to be delivered
+        """
+        held = conn.held
+        n_released = 0
+        while n_released < len(held):
+            item = held[n_released]
+            if isinstance(item, int):
+                if item > next_seq:
+                    break
+            else:
+                self._process_msgs(conn.addr, [item])
+            n_released += 1
+        del held[:n_released]
+        if len(held) == 0:
+            conn.held = None
+
+    def _request_repairs(self):
+        """
+        Requests the multicast datagrams that are known to be missing to their senders
+        """
+        for addr, stream_id, first, last in self._mcastReceiver.get_repairs():
+            MessageServer.logger.debug('Requesting multicast datagrams %s-%s from %s' % (first, last, formatipport(addr)))
+            payload = MessageEntity._CONTROL_REPAIR_PAYLOAD.pack(MessageEntity._CONTROL_MCAST_REPAIR, stream_id, first,
+                                                                 last)
+            if not self._send_control_payload(addr, payload):
+                self._remove_host(addr)
+
+    def _remove_host(self, address):
+        """
+        Removes an host from the list of active hosts, together with its multicast streams
+
+        :param address: The (ip, port) address corresponding to the host to remove
+        """
+        self._mcastReceiver.leave(address)
+        super()._remove_host(address)
+
     def _update_seq_num(self, addr, seq_num, received=True):
         """
         Refreshes the sequence number associated to a certain connected host
@@ -114,9 +284,3 @@ class MessageServer(MessageEntity):
         :param received: If True, then the sequence number refers to a received message, and sent otherwise
         """
         pass
-
-    def _update_read_set(self):
-        """
-        Updates the list of socket enabled for reading on the 'select' calls
-        """
-        self._readSet = [self._serverSock, self._dummy_sock_r] + list(self._registeredHosts.values())
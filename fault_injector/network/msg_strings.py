@@ -0,0 +1,167 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+from threading import Lock
+from fault_injector.network.msg_builder import MessageBuilder
+
+
+class StringTable:
+    """
+    Class that implements the interning of the strings of a session, such as task commands and core lists, which are
+    repeated in many messages.
+
+    The first time a string is sent to a host, the message carries both the string and its ID, defining it. Following
+    messages to the same host carry only the ID, and are expanded back by the receiver. IDs are assigned by the sender
+    of tasks (the controller), and are reused by the receiver (the engine) for the messages it sends back.
+    """
+
+    # Logger for the class
+    logger = logging.getLogger('StringTable')
+
+    # Fields of messages whose values are interned, each with the field that carries the ID
+    FIELDS = ((MessageBuilder.FIELD_DATA, MessageBuilder.FIELD_DATA_ID),
+              (MessageBuilder.FIELD_CORES, MessageBuilder.FIELD_CORES_ID))
+
+    # Key used for strings defined to all hosts through broadcast messages
+    ALL_HOSTS = '*'
+
+    def __init__(self):
+        """
+        Constructor for the class
+        """
+        # Dictionaries from strings to IDs and vice versa, and the sets of IDs defined to each host
+        self._ids = {}
+        self._strings = {}
+        self._defined = {}
+        # The table may be used concurrently by the threads that send and receive messages
+        self._lock = Lock()
+
+    def reset(self):
+        """
+        Discards all strings and IDs, for example when a new session is started
+        """
+        with self._lock:
+            self._ids.clear()
+            self._strings.clear()
+            self._defined.clear()
+
+    def forget(self, host):
+        """
+        Discards the IDs defined to a host, for example because it may have lost them after a connection loss. The IDs
+        will be defined again the next time they are sent to the host
+
+        :param host: The address of the host
+        """
+        with self._lock:
+            self._defined.pop(host, None)
+            # Strings defined through broadcast messages must be defined again as well
+            self._defined.pop(StringTable.ALL_HOSTS, None)
+
+    def intern(self, msg, host=ALL_HOSTS, assign=True):
+        """
+        Replaces the strings of a message that were already defined to a host with their IDs, and defines the others
+
+        :param msg: The message dictionary, which is modified in place
+        :param host: The address of the host to which the message is sent. If ALL_HOSTS, the message is broadcast
+        :param assign: If True, new IDs are assigned to strings that are not in the table. Otherwise, such strings are
+            sent as they are
+        :return: The message dictionary
+        """
+        with self._lock:
+            for field, id_field in StringTable.FIELDS:
+                string = msg.get(field)
+                if not isinstance(string, str):
+                    continue
+                s_id = self._ids.get(string)
+                if s_id is None:
+                    if not assign:
+                        continue
+                    s_id = len(self._strings)
+                    self._ids[string] = s_id
+                    self._strings[s_id] = string
+                msg[id_field] = s_id
+                if s_id in self._defined.get(host, ()) or s_id in self._defined.get(StringTable.ALL_HOSTS, ()):
+                    del msg[field]
+                else:
+                    self._defined.setdefault(host, set()).add(s_id)
+        return msg
+
+    def expand(self, msg):
+        """
+        Replaces the IDs in a message with their strings, learning the strings that the message defines
+
+        :param msg: The message dictionary, which is modified in place
+        :return: The message dictionary
+        """
+        with self._lock:
+            if MessageBuilder.FIELD_STRINGS in msg:
+                # JSON objects only support string keys
+                for s_id, string in msg.pop(MessageBuilder.FIELD_STRINGS).items():
+                    self._define(int(s_id), string)
+            for field, id_field in StringTable.FIELDS:
+                if id_field not in msg:
+                    continue
+                s_id = msg.pop(id_field)
+                if field in msg:
+                    self._define(s_id, msg[field])
+                elif s_id in self._strings:
+                    msg[field] = self._strings[s_id]
+                else:
+                    StringTable.logger.error('Unknown string ID %s received' % s_id)
+                    msg[field] = None
+        return msg
+
+    def get_strings(self):
+        """
+        Returns all strings in the table, so that they can be sent to a host that may not know them
+
+        :return: A dictionary from IDs to strings
+        """
+        with self._lock:
+            return dict(self._strings)
+
+    def load(self, strings):
+        """
+        Adds strings to the table together with their IDs, for example to restore a table saved through get_strings.
+        The strings are not considered to be defined to any host
+
+        :param strings: A dictionary from IDs to strings. IDs may be supplied as strings as well
+        """
+        with self._lock:
+            for s_id, string in strings.items():
+                self._define(int(s_id), string)
+
+    def _define(self, s_id, string):
+        """
+        Adds a string and its ID to the table
+
+        :param s_id: The ID of the string
+        :param string: The string
+        """
+        old = self._strings.get(s_id)
+        if old is not None and old != string:
+            self._ids.pop(old, None)
+        self._strings[s_id] = string
+        self._ids[string] = s_id
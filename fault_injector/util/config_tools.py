@@ -35,6 +35,15 @@ class ConfigLoader:
 
     _dfl_config = {
         "RESULTS_DIR": 'results',
+        "LOG_FLUSH_INTERVAL": 1,
+        "LOG_BUFFER_SIZE": 65536,
+        "LOG_FSYNC": False,
+        "RESULTS_BACKEND": 'csv',
+        "OUTPUT_ARCHIVE": False,
+        "OUTPUT_ARCHIVE_COMPRESSION": None,
+        "CHECKPOINT_INTERVAL": 60,
+        "SYNC_START_MARGIN": 0.1,
+        "SYNC_BARRIER_TIMEOUT": 5,
         "SKIP_EXPIRED": True,
         "RETRY_TASKS": True,
         "RETRY_TASKS_ON_ERROR": False,
@@ -43,14 +52,45 @@ class ConfigLoader:
         "LOG_OUTPUTS": True,
         "ENABLE_ROOT": False,
         "SERVER_PORT": 30000,
+        "SERVER_UNIX_PATH": None,
+        "ENGINE_TAGS": [],
         "MAX_REQUESTS": 20,
+        "CLOCK_SYNC_PERIOD": 30,
+        "CLOCK_SYNC_SAMPLES": 8,
         "RETRY_INTERVAL": 600,
         "RETRY_PERIOD": 30,
+        "RETRY_BACKOFF": 1,
+        "DNS_CACHE_TTL": 300,
+        "CONNECT_TIMEOUT": 10,
+        "MAX_PENDING_CONNECTIONS": 256,
         "PRE_SEND_INTERVAL": 600,
+        "PRE_SEND_ADAPTIVE": True,
+        "PRE_SEND_MIN": 5,
+        "PRE_SEND_RTT_FACTOR": 20,
         "WORKLOAD_PADDING": 20,
         "SESSION_WAIT": 60,
         "NUMA_CORES_FAULTS": None,
         "NUMA_CORES_BENCHMARKS": None,
+        "SEND_HIGH_WATER": 16777216,
+        "SEND_LOW_WATER": 4194304,
+        "SEND_OVERFLOW_POLICY": 'disconnect',
+        "TCP_NODELAY": True,
+        "SOCKET_SNDBUF": None,
+        "SOCKET_RCVBUF": None,
+        "CHUNK_SIZE": 65536,
+        "HISTORY_LENGTH": 4096,
+        "HISTORY_DISK_SIZE": 268435456,
+        "HISTORY_DIR": None,
+        "HEARTBEAT_INTERVAL": 0,
+        "HEARTBEAT_TIMEOUT": 120,
+        "TCP_KEEPALIVE": None,
+        "TCP_USER_TIMEOUT": None,
+        "MULTICAST_GROUP": None,
+        "MULTICAST_INTERFACE": None,
+        "MULTICAST_TTL": 1,
+        "COMPRESSION": None,
+        "COMPRESSION_THRESHOLD": 4096,
+        "COMPRESSION_LEVEL": None,
         "HOSTS": [],
         "AUX_COMMANDS": []
     }
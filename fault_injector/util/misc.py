@@ -22,12 +22,14 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import socket, threading
+import socket
 from fault_injector.network.msg_builder import MessageBuilder
 from os.path import basename
 
 
 ADDR_SEPARATOR = ':'
+# Identifier used in place of the ip for addresses of Unix domain sockets, as in unix:/path/to/socket
+UNIX_ID = 'unix'
 
 INJ_PREFIX = '/injection-'
 OUT_PREFIX = '/output-'
@@ -81,9 +83,34 @@ def format_injection_filename(results_dir, addr, workload_name=None):
     :return: A string, representing the name of the execution record file
     """
     if workload_name is not None:
-        return results_dir + INJ_PREFIX + workload_name + '-' + addr[0] + '_' + str(addr[1]) + '.csv'
+        return results_dir + INJ_PREFIX + workload_name + '-' + format_addr_filename(addr) + '.csv'
     else:
-        return results_dir + LIST_PREFIX + addr[0] + '_' + str(addr[1]) + '.csv'
+        return results_dir + LIST_PREFIX + format_addr_filename(addr) + '.csv'
+
+
+def format_results_db_filename(results_dir, workload_name=None):
+    """
+    Returns a string used to name the database containing the execution records of all hosts of a session.
+
+    :param results_dir: Target directory of the file
+    :param workload_name: Name of the injected workload. If None, the file is flagged as a listening session
+    :return: A string, representing the path of the database file
+    """
+    if workload_name is not None:
+        return results_dir + INJ_PREFIX + workload_name + '.db'
+    else:
+        return results_dir + LIST_PREFIX.rstrip('-') + '.db'
+
+
+def format_checkpoint_filename(results_dir, workload_name):
+    """
+    Returns a string used to name the checkpoint of an injection session, from which it can be resumed.
+
+    :param results_dir: Target directory of the file
+    :param workload_name: Name of the injected workload
+    :return: A string, representing the path of the checkpoint file
+    """
+    return results_dir + INJ_PREFIX + workload_name + '.checkpoint'
 
 
 def format_output_filename(results_dir, msg):
@@ -108,9 +135,35 @@ def format_output_directory(results_dir, addr, workload_name=None):
     :return: A string used to name the output log directory
     """
     if workload_name is not None:
-        return results_dir + OUT_PREFIX + workload_name + '-' + addr[0] + '_' + str(addr[1])
+        return results_dir + OUT_PREFIX + workload_name + '-' + format_addr_filename(addr)
     else:
-        return results_dir + OUT_PREFIX + addr[0] + '_' + str(addr[1])
+        return results_dir + OUT_PREFIX + format_addr_filename(addr)
+
+
+def format_output_archive(results_dir, workload_name=None):
+    """
+    Returns a string used to name the archive containing the outputs of all tasks executed in an injection session.
+
+    :param results_dir: The target directory of the archive
+    :param workload_name: The name of the workload. If None, the archive is flagged as a listening session
+    :return: A string representing the path of the archive, without extension
+    """
+    if workload_name is not None:
+        return results_dir + OUT_PREFIX + workload_name
+    else:
+        return results_dir + OUT_PREFIX.rstrip('-')
+
+
+def format_addr_filename(addr):
+    """
+    Formats the address of a host so that it can be used in file names
+
+    Path separators in the addresses of Unix domain sockets are replaced.
+
+    :param addr: The (ip, port) address of the host
+    :return: A string in ip_port format
+    """
+    return addr[0] + '_' + str(addr[1]).strip('/').replace('/', '-')
 
 
 def format_task_filename(msg):
@@ -145,9 +198,21 @@ def getipport(sock):
     Returns a ip:port string corresponding to the address of the input socket
     """
     name = sock.getpeername()
+    if sock.family == socket.AF_UNIX:
+        return ADDR_SEPARATOR.join([UNIX_ID, name])
     return ADDR_SEPARATOR.join([name[0], str(name[1])])
 
 
+def is_unix_addr(addr):
+    """
+    Determines whether an address refers to a Unix domain socket, in (unix, path) format
+
+    :param addr: An address tuple
+    :return: True if the address is that of a Unix domain socket, False otherwise
+    """
+    return addr[0] == UNIX_ID
+
+
 def formatipport(addr):
     """
     Formats the (ip, port) input tuple to a ip:port string
@@ -160,7 +225,12 @@ def formatipport(addr):
 def strtoaddr(s):
     """
     Converts a ip:port string to its tuple (ip, port) equivalent
+
+    Strings in unix:path format, referring to Unix domain sockets, are converted to (unix, path) tuples.
     """
+    if s.strip().startswith(UNIX_ID + ADDR_SEPARATOR):
+        path = s.strip()[len(UNIX_ID) + 1:]
+        return [UNIX_ID, path] if len(path) > 0 else None
     addr = [a.strip() for a in s.split(ADDR_SEPARATOR)]
     if len(addr) == 2:
         try:
@@ -178,30 +248,17 @@ class DummySocketBuilder:
     This is useful to awake servers waiting on select calls.
     """
 
-    _localhost_id = ''
-    _read_socket = None
-    _write_socket = None
-
     @staticmethod
     def getDummySocket():
-        serverAddress = (DummySocketBuilder._localhost_id, 0)
-        serverSock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        serverSock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        serverSock.bind(serverAddress)
-        serverSock.listen(1)
-        port = serverSock.getsockname()[1]
-        t = threading.Thread(target=DummySocketBuilder._selfconnect, args=[port])
-        t.start()
-        connection, client_address = serverSock.accept()
-        DummySocketBuilder._read_socket = connection
-        t.join()
-        serverSock.close()
-        DummySocketBuilder._read_socket.setblocking(False)
-        DummySocketBuilder._write_socket.setblocking(False)
-        return DummySocketBuilder._read_socket, DummySocketBuilder._write_socket
-
-    @staticmethod
-    def _selfconnect(port):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect((DummySocketBuilder._localhost_id, port))
-        DummySocketBuilder._write_socket = sock
+        """
+        Builds a new pair of connected, non-blocking sockets
+
+        A socketpair is used, instead of a loopback TCP connection: creating it takes a single system call, and each
+        call returns an independent pair, so that several entities can be created concurrently.
+
+        :return: A (read socket, write socket) tuple
+        """
+        read_socket, write_socket = socket.socketpair()
+        read_socket.setblocking(False)
+        write_socket.setblocking(False)
+        return read_socket, write_socket
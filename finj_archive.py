@@ -0,0 +1,60 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from fault_injector.io.output_archive import OutputArchiveReader
+from fault_injector.util.misc import OUT_PREFIX
+from os.path import basename
+import logging, sys, argparse
+
+
+parser = argparse.ArgumentParser(description="Fin-J Output Archive Reader")
+parser.add_argument("-a", action="store", dest="archive", type=str, required=True, help="Path of the output archive.")
+parser.add_argument("-l", action="store_true", dest="list", help="List the task outputs in the archive.")
+parser.add_argument("-H", action="store", dest="host", type=str, default=None, help="Address of a host in <ip>:<port> format.")
+parser.add_argument("-s", action="store", dest="seqnum", type=int, default=None, help="Sequence number of the task whose output is printed.")
+parser.add_argument("-x", action="store", dest="out_dir", type=str, default=None, help="Extract all outputs to one file per task in this directory.")
+
+args = parser.parse_args()
+
+logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+
+reader = OutputArchiveReader(args.archive)
+if args.list:
+    for host, seq_num, name in reader.get_entries(args.host):
+        print('%s %s %s' % (host, seq_num, name))
+elif args.out_dir is not None:
+    # The name of the workload is encoded in the name of the archive, as output-<workload>
+    name = basename(reader.get_path())
+    prefix = OUT_PREFIX.lstrip('/')
+    workload_name = name[len(prefix):] if name.startswith(prefix) else None
+    print('Extracted %s outputs' % reader.extract_all(args.out_dir, workload_name))
+elif args.host is not None and args.seqnum is not None:
+    output = reader.read_output(args.host, args.seqnum)
+    if output is None:
+        print('No output for task %s on host %s' % (args.seqnum, args.host), file=sys.stderr)
+        sys.exit(1)
+    sys.stdout.write(output)
+else:
+    parser.print_usage()
+reader.close()
@@ -0,0 +1,42 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from fault_injector.io.binary_workload import BinaryWorkload, BinaryWorkloadWriter
+from os.path import splitext
+from time import time
+import logging, sys, argparse
+
+
+parser = argparse.ArgumentParser(description="Fin-J Workload Compiler")
+parser.add_argument("-w", action="store", dest="workload", type=str, required=True, help="Path of the CSV workload file.")
+parser.add_argument("-o", action="store", dest="out", type=str, default=None, help="Path of the compiled workload. Default is that of the CSV workload, with the %s extension." % BinaryWorkload.EXT)
+
+args = parser.parse_args()
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+out = args.out if args.out is not None else splitext(args.workload)[0] + BinaryWorkload.EXT
+start = time()
+n_tasks = BinaryWorkloadWriter.compile(args.workload, out)
+print('Compiled %s tasks to %s in %.2f seconds' % (n_tasks, out, time() - start))
@@ -24,16 +24,18 @@ SOFTWARE.
 
 from fault_injector.injection.fault_injector_controller import InjectorController
 from fault_injector.io.reader import CSVReader
+from fault_injector.io.binary_workload import BinaryWorkload, BinaryWorkloadReader
 import logging, sys, argparse
 
 
 # Configuring the input arguments to the script, and parsing them
 parser = argparse.ArgumentParser(description="Fin-J Fault Injection Controller")
 parser.add_argument("-c", action="store", dest="config", type=str, default=None, help="Path to a configuration file.")
-parser.add_argument("-w", action="store", dest="workload", type=str, default=None, help="Path of the CSV workload file.")
+parser.add_argument("-w", action="store", dest="workload", type=str, default=None, help="Path of the CSV or compiled workload file.")
 parser.add_argument("-m", action="store", dest="max_tasks", type=int, default=None, help="Maximum number of tasks to be injected.")
 parser.add_argument("-a", action="store", dest="hosts", type=str, default=None, help="Addresses of hosts in <ip>:<port> format, separated by commas.")
 parser.add_argument("-p", action="store_true", dest="probe", help="Enable Probe mode, suppressing all output except errors.")
+parser.add_argument("--resume", action="store_true", dest="resume", help="Resume the injection session of the workload from its last checkpoint.")
 
 args = parser.parse_args()
 
@@ -44,7 +46,13 @@ else:
 
 hosts = [addr.strip() for addr in args.hosts.split(',')] if args.hosts is not None else None
 
-reader = CSVReader(path=args.workload) if args.workload is not None else None
-inj = InjectorController.build(config=args.config, hosts=hosts)
+if args.workload is None:
+    reader = None
+elif args.workload.endswith(BinaryWorkload.EXT):
+    # Workloads compiled with finj_compile are memory-mapped
+    reader = BinaryWorkloadReader(path=args.workload)
+else:
+    reader = CSVReader(path=args.workload)
+inj = InjectorController.build(config=args.config, hosts=hosts, resume_workload=args.workload if args.resume else None)
 inj.inject(reader=reader, max_tasks=args.max_tasks, suppress_output=args.probe)
 inj.stop()
@@ -30,10 +30,11 @@ import logging, sys, argparse
 parser = argparse.ArgumentParser(description="Fin-J Fault Injection Engine")
 parser.add_argument("-c", action="store", dest="config", type=str, default=None, help="Path to a configuration file.")
 parser.add_argument("-p", action="store", dest="port", type=int, default=None, help="Listening port for the server.")
+parser.add_argument("-u", action="store", dest="unix_path", type=str, default=None, help="Path of a Unix socket on which the server also listens.")
 
 args = parser.parse_args()
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
-inj = InjectorEngine.build(config=args.config, port=args.port)
+inj = InjectorEngine.build(config=args.config, port=args.port, unix_path=args.unix_path)
 inj.listen()
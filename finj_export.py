@@ -0,0 +1,45 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from fault_injector.io.results_store import ResultsStore
+from fault_injector.util.misc import INJ_PREFIX
+from os.path import basename, dirname, splitext
+import logging, sys, argparse
+
+
+parser = argparse.ArgumentParser(description="Fin-J Results Database Exporter")
+parser.add_argument("-d", action="store", dest="db", type=str, required=True, help="Path of the results database.")
+parser.add_argument("-o", action="store", dest="out_dir", type=str, default=None, help="Directory in which the CSV execution logs are written. Default is the directory of the database.")
+
+args = parser.parse_args()
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+out_dir = args.out_dir if args.out_dir is not None else dirname(args.db) or '.'
+# The name of the workload is encoded in the name of the database, as injection-<workload>.db
+name = splitext(basename(args.db))[0]
+prefix = INJ_PREFIX.lstrip('/')
+workload_name = name[len(prefix):] if name.startswith(prefix) else None
+for path in ResultsStore.export_csv(args.db, out_dir, workload_name):
+    print(path)
@@ -0,0 +1,103 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Loopback load test of a MessageClient connected to a large number of engine stand-ins. Each stand-in is a plain
+# listening socket, served by a single thread, which answers every frame it receives with one reply frame. The client
+# broadcasts a number of task commands, and the time needed to receive all of the replies is measured. The process
+# needs about three file descriptors per stand-in. Run from the root of the repository with:
+#   python -m tests.bench_msg_client -n 5000 -m 20
+
+import argparse, logging, resource, selectors, socket, sys, threading, time, json
+from fault_injector.network.msg_client import MessageClient
+from fault_injector.network.msg_frame import FrameBuffer
+
+
+def serve_standins(selector, reply, done):
+    """
+    Accepts the connections of the client on the listening sockets, and answers each received frame with a reply
+
+    :param selector: The selector in which the listening sockets are registered
+    :param reply: The encoded reply frame
+    :param done: Event that is set when the stand-ins must stop
+    """
+    while not done.is_set():
+        for key, mask in selector.select(0.5):
+            if key.data is None:
+                conn, addr = key.fileobj.accept()
+                conn.setblocking(False)
+                selector.register(conn, selectors.EVENT_READ, FrameBuffer())
+                continue
+            try:
+                if key.data.recv_from(key.fileobj) == 0:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    continue
+            except (BlockingIOError, InterruptedError):
+                continue
+            for frame in key.data.frames():
+                key.fileobj.sendall(reply)
+
+
+parser = argparse.ArgumentParser(description="Fin-J MessageClient Load Test")
+parser.add_argument("-n", action="store", dest="hosts", type=int, default=5000, help="Number of engine stand-ins.")
+parser.add_argument("-m", action="store", dest="msgs", type=int, default=20, help="Number of broadcast messages.")
+
+args = parser.parse_args()
+
+logging.basicConfig(stream=sys.stdout, level=logging.WARNING)
+
+soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+if soft < 3 * args.hosts + 100 and (hard == resource.RLIM_INFINITY or hard > soft):
+    resource.setrlimit(resource.RLIMIT_NOFILE, (3 * args.hosts + 100 if hard == resource.RLIM_INFINITY
+                                                else min(3 * args.hosts + 100, hard), hard))
+
+selector = selectors.DefaultSelector()
+listeners = []
+for i in range(args.hosts):
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(4)
+    listener.setblocking(False)
+    selector.register(listener, selectors.EVENT_READ, None)
+    listeners.append(listener)
+reply = FrameBuffer.build_frames((1, 1), json.dumps({'type': 'status_start'}).encode())[0]
+done = threading.Event()
+standins = threading.Thread(target=serve_standins, args=(selector, reply, done), daemon=True)
+standins.start()
+
+client = MessageClient()
+start = time.time()
+client.add_servers([listener.getsockname() for listener in listeners])
+print('Connected to %s stand-ins in %.2f s' % (client.get_n_registered_hosts(), time.time() - start))
+client.start()
+start = time.time()
+for i in range(args.msgs):
+    client.broadcast_msg({'type': 'command_start', 'args': 'faultlib/leak 10', 'seqNum': i})
+n_replies = args.hosts * args.msgs
+for i in range(n_replies):
+    client.pop_msg_queue()
+elapsed = time.time() - start
+print('%s messages out and %s replies in %.2f s (%.0f msg/s)' % (n_replies, n_replies, elapsed, 2 * n_replies / elapsed))
+done.set()
+client.stop()
@@ -0,0 +1,138 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os, shutil, tempfile, unittest
+from fault_injector.io.binary_workload import BinaryWorkloadReader, BinaryWorkloadWriter
+from fault_injector.io.reader import CSVReader
+from fault_injector.io.task import Task
+from fault_injector.io.writer import CSVWriter
+
+
+class BinaryWorkloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'workload.bwl')
+        self.tasks = [Task(args='faultlib/leak %s' % (i % 3), timestamp=10 * (i // 2), duration=i, seqNum=i,
+                           isFault=i % 2 == 0, cores='0-3' if i % 4 else None,
+                           hosts='127.0.0.1:%s' % (30000 + i % 2) if i % 5 == 0 else None, sync=i == 7)
+                      for i in range(20)]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _write(self, tasks):
+        writer = BinaryWorkloadWriter(self.path)
+        for task in tasks:
+            self.assertTrue(writer.write_entry(task))
+        self.assertEqual(writer.close(), len(tasks))
+
+    @staticmethod
+    def _read(reader):
+        tasks = []
+        task = reader.read_entry()
+        while task is not None:
+            tasks.append(Task.task_to_dict(task))
+            task = reader.read_entry()
+        return tasks
+
+    def test_round_trip(self):
+        self.tasks.insert(0, Task(args='echo été', timestamp=None, duration=None, seqNum=None, cores=None))
+        self._write(self.tasks)
+        reader = BinaryWorkloadReader(self.path)
+        self.assertEqual(reader.get_n_tasks(), len(self.tasks))
+        self.assertEqual(self._read(reader), [Task.task_to_dict(t) for t in self.tasks])
+        self.assertEqual(reader.tell(), len(self.tasks))
+        reader.close()
+
+    def test_unsorted(self):
+        self._write(list(reversed(self.tasks)))
+        reader = BinaryWorkloadReader(self.path)
+        timestamps = [t['timestamp'] for t in self._read(reader)]
+        self.assertEqual(timestamps, sorted(timestamps))
+        reader.close()
+
+    def test_seek(self):
+        self._write(self.tasks)
+        reader = BinaryWorkloadReader(self.path)
+        # Tasks come in pairs with the same timestamp, and seeking moves to the first of each pair
+        self.assertEqual(reader.seek_time(-5), 0)
+        self.assertEqual(reader.seek_time(0), 0)
+        self.assertEqual(reader.seek_time(30), 6)
+        self.assertEqual(reader.read_entry().seqNum, 6)
+        self.assertEqual(reader.seek_time(31), 8)
+        self.assertEqual(reader.tell(), 8)
+        self.assertEqual(reader.seek_time(1000), 20)
+        self.assertIsNone(reader.read_entry())
+        reader.seek(13)
+        self.assertEqual(reader.read_entry().seqNum, 13)
+        reader.seek(-1)
+        self.assertEqual(reader.tell(), 0)
+        reader.seek(100)
+        self.assertEqual(reader.tell(), 20)
+        reader.close()
+
+    def test_compile(self):
+        csv_path = os.path.join(self.dir, 'workload.csv')
+        writer = CSVWriter(csv_path)
+        for task in self.tasks:
+            writer.write_entry(task)
+        writer.close()
+        self.assertEqual(BinaryWorkloadWriter.compile(csv_path, self.path), len(self.tasks))
+        csv_reader = CSVReader(csv_path)
+        reader = BinaryWorkloadReader(self.path)
+        self.assertEqual(self._read(reader), self._read(csv_reader))
+        csv_reader.close()
+        reader.close()
+
+    def test_csv_seek(self):
+        csv_path = os.path.join(self.dir, 'workload.csv')
+        writer = CSVWriter(csv_path)
+        for task in self.tasks:
+            writer.write_entry(task)
+        writer.close()
+        self._write(self.tasks)
+        # Both workload readers support the positions used by checkpoints of the controller
+        for reader in (CSVReader(csv_path), BinaryWorkloadReader(self.path)):
+            reader.seek(13)
+            self.assertEqual(reader.read_entry().seqNum, 13)
+            self.assertEqual(reader.tell(), 14)
+            reader.seek(2)
+            self.assertEqual(reader.read_entry().seqNum, 2)
+            reader.seek(100)
+            self.assertEqual(reader.tell(), 20)
+            self.assertIsNone(reader.read_entry())
+            reader.close()
+
+    def test_invalid(self):
+        with open(self.path, 'wb') as out_file:
+            out_file.write(b'timestamp;args\n' * 10)
+        reader = BinaryWorkloadReader(self.path)
+        self.assertEqual(reader.get_n_tasks(), 0)
+        self.assertIsNone(reader.read_entry())
+        reader.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,270 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json, shutil, tempfile, unittest
+from collections import deque
+from fault_injector.injection.fault_injector_controller import InjectorController
+from fault_injector.injection.sync_barrier import SyncBarrier
+from fault_injector.injection.task_tracker import PendingTaskTracker
+from fault_injector.network.msg_builder import MessageBuilder
+from fault_injector.network.msg_client import MessageClient
+from fault_injector.network.msg_strings import StringTable
+from fault_injector.io.task import Task
+from fault_injector.util.misc import format_checkpoint_filename
+
+
+class FakeClient:
+    """
+    Stand-in for the MessageClient of the controller, which records the messages it is asked to send, and returns
+    a given series of received messages
+    """
+
+    def __init__(self, hosts=(), received=()):
+        self.sent = []
+        self.hosts = list(hosts)
+        self.received = deque(received)
+
+    def send_msg(self, addr, msg):
+        self.sent.append((addr, msg))
+
+    def broadcast_msg(self, msg):
+        self.sent.append((None, msg))
+
+    def peek_msg_queue(self):
+        return len(self.received)
+
+    def pop_msg_queue(self, timeout=None):
+        return self.received.popleft() if self.received else (None, None)
+
+    def get_registered_hosts(self):
+        return self.hosts
+
+    def get_consumed_seq_nums(self):
+        return {}
+
+    def stop(self):
+        pass
+
+
+class FakeReader:
+    """
+    Stand-in for a workload Reader, positioned after a given number of tasks
+    """
+
+    def __init__(self, position):
+        self.position = position
+
+    def tell(self):
+        return self.position
+
+    def get_path(self):
+        return 'workload.csv'
+
+
+class FakeWriter:
+    """
+    Stand-in for an execution log writer, which records the entries it is asked to write
+    """
+
+    def __init__(self):
+        self.entries = []
+
+    def write_entry(self, entry):
+        self.entries.append(entry)
+
+
+class DispatchTest(unittest.TestCase):
+
+    HOST_A = ('127.0.0.1', 30001)
+    HOST_B = ('127.0.0.1', 30002)
+    RELAY = ('127.0.0.1', 30100)
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.controller = InjectorController(MessageClient(), results_dir=self.dir, pre_send_interval=600,
+                                             pre_send_min=600, log_flush_interval=0)
+        self.client = self.controller._client = FakeClient()
+        self.controller._suppressOutput = True
+        self.controller._writers = {}
+        self.controller._reader = FakeReader(0)
+        self.controller._pendingTasks = PendingTaskTracker()
+        self.controller._reset_send_windows()
+        for addr in (self.HOST_A, self.HOST_B):
+            self.controller._pendingTasks.add_host(addr)
+            self.controller._hostCapacities[addr] = 1
+            self.controller._update_send_window(addr)
+        self.controller._start_timestamp_abs = self.controller._start_timestamp = 0
+
+    def tearDown(self):
+        self.controller.stop()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _queue(self, seq_num, targets, position):
+        task = Task(args='echo %s' % seq_num, timestamp=10, seqNum=seq_num)
+        self.controller._dispatchQueue.append([task, MessageBuilder.command_start(task),
+                                               None if targets is None else set(targets), set(), position])
+
+    def test_broadcast(self):
+        self._queue(1, None, 0)
+        self.controller._dispatch_tasks()
+        self.assertEqual([addr for addr, msg in self.client.sent], [None])
+        self.assertEqual(len(self.controller._dispatchQueue), 0)
+        self.assertEqual(self.controller._pendingTasks.get_host_pending(self.HOST_A), 1)
+
+    def test_capacity(self):
+        self._queue(1, None, 0)
+        self._queue(2, None, 1)
+        self.controller._dispatch_tasks()
+        # Engines are full after the first task, and the second one is kept queued until the first terminates
+        self.assertEqual(len(self.client.sent), 1)
+        self.assertEqual(len(self.controller._dispatchQueue), 1)
+        self.controller._pendingTasks.complete_task(self.HOST_A, 1)
+        self.controller._dispatch_tasks()
+        self.assertEqual([addr for addr, msg in self.client.sent], [None, self.HOST_A])
+        self.assertEqual(self.controller._dispatchQueue[0][2], {self.HOST_B})
+
+    def test_resume_position(self):
+        # The first task waits for the capacity of its engine, while the second one is sent to the other engine
+        self.controller._pendingTasks.add_task(0, [self.HOST_A])
+        self._queue(1, [self.HOST_A], 0)
+        self._queue(2, [self.HOST_B], 1)
+        reader = FakeReader(3)
+        self.controller._dispatch_tasks()
+        self.assertEqual([addr for addr, msg in self.client.sent], [self.HOST_B])
+        self.assertEqual(self.controller._get_resume_position(reader), (0, 2))
+
+        position, rewind = self.controller._get_resume_position(reader)
+        self.assertTrue(self.controller._checkpoint('workload', position, 3 - rewind))
+        with open(format_checkpoint_filename(self.dir, 'workload')) as checkpoint_file:
+            state = json.load(checkpoint_file)
+        self.assertEqual(state['position'], 0)
+        self.assertEqual(state['read_tasks'], 1)
+        # The second task must not be sent again to its engine, once it is read again by the resumed session
+        self.assertEqual(state['dispatched'], [[2, ['127.0.0.1:30002']]])
+
+        # Once the first task is sent as well, tasks are not read again
+        self.controller._pendingTasks.complete_task(self.HOST_A, 0)
+        self.controller._dispatch_tasks()
+        self.assertEqual(self.controller._get_resume_position(reader), (2, 0))
+        self.assertEqual(self.controller._dispatchedTasks, [])
+
+    def test_checkpoint(self):
+        controller = self.controller
+        controller._session_id = 1234.5
+        controller._start_timestamp, controller._start_timestamp_abs = 100, 1000.5
+        controller._hostTags = {self.HOST_A: {'gpu'}, self.HOST_B: set()}
+        controller._strings.intern(MessageBuilder.command_start(Task(args='echo 1', seqNum=1, cores='0-1')))
+        controller._hostStrings[self.HOST_A] = StringTable()
+        controller._hostStrings[self.HOST_A].load({0: 'echo 1'})
+        controller._pendingTasks.add_task(0, [self.HOST_A])
+        controller._pendingTasks.add_task(1)
+        controller._pendingTasks.complete_task(self.HOST_B, 1)
+        barrier = SyncBarrier(1, 10, [self.HOST_A, self.HOST_B], 0, broadcast=True)
+        barrier.start = 110.5
+        barrier.add_start(self.HOST_A, 110.6)
+        controller._barriers[1] = barrier
+        # The third task is sent, while the second one waits for the capacity of its engine
+        self._queue(2, [self.HOST_A], 0)
+        self._queue(3, [self.HOST_B], 1)
+        controller._dispatch_tasks()
+        position, rewind = controller._get_resume_position(FakeReader(2))
+        self.assertTrue(controller._checkpoint('workload', position, 2 - rewind))
+
+        # The session is resumed by a new controller, with the engines accepting it
+        client = FakeClient([self.HOST_A, self.HOST_B],
+                            [(addr, MessageBuilder.ack(0, tags=tags)) for addr, tags in ((self.HOST_A, ['gpu']),
+                                                                                          (self.HOST_B, None))])
+        resumed = InjectorController(MessageClient(), results_dir=self.dir, log_flush_interval=0)
+        resumed._client = client
+        resumed._suppressOutput = True
+        state = resumed._load_checkpoint('workload')
+        self.assertEqual(state['position'], 0)
+        self.assertEqual(state['read_tasks'], 1)
+        self.assertEqual(resumed._resume_session(state, 'workload'), (2, 1234.5))
+        self.assertEqual(client.sent, [(None, MessageBuilder.command_session(1234.5))])
+        self.assertEqual((resumed._start_timestamp, resumed._start_timestamp_abs), (100, 1000.5))
+        self.assertEqual(resumed._strings.get_strings(), controller._strings.get_strings())
+        self.assertEqual(resumed._hostStrings[self.HOST_A].get_strings(), {0: 'echo 1'})
+        self.assertEqual(resumed._hostTags, controller._hostTags)
+        self.assertEqual(sorted(resumed._pendingTasks.get_tasks()), sorted(controller._pendingTasks.get_tasks()))
+        self.assertEqual(resumed._pendingTasks.get_host_pending(self.HOST_B), 1)
+        # The third task is not sent again once it is read again
+        self.assertEqual(resumed._terminatedTasks, {3: {self.HOST_B}})
+        restored = resumed._barriers[1]
+        self.assertEqual((restored.start, restored.broadcast, set(restored.targets)),
+                         (110.5, True, {self.HOST_A, self.HOST_B}))
+        self.assertEqual(restored.get_starts(), {self.HOST_A: 110.6})
+        resumed.stop()
+
+    def test_relayed_hosts(self):
+        # The relay also serves an engine that did not join the session, whose messages must be ignored
+        other = ('127.0.0.1', 30003)
+        self.controller._suppressOutput = False
+        self.controller._writers = {addr: FakeWriter() for addr in (self.HOST_A, self.HOST_B)}
+        self.controller._relays[self.RELAY] = {self.HOST_A, other}
+        self.controller._pendingTasks.add_task(1)
+        self.controller._translate_msg(self.RELAY, MessageClient.CONNECTION_LOST_MSG)
+        for host in (self.HOST_A, other):
+            msg = MessageBuilder.status_end(Task(args="echo 1", timestamp=10, seqNum=1))
+            msg[MessageBuilder.FIELD_HOST] = '%s:%s' % host
+            self.controller._translate_msg(self.RELAY, msg)
+        while self.controller._inbox:
+            self.controller._process_msg_inject(*self.controller._inbox.popleft())
+        self.assertEqual(len(self.controller._writers[self.HOST_A].entries), 2)
+        self.assertEqual(self.controller._pendingTasks.get_host_pending(self.HOST_A), 0)
+        self.assertEqual(self.controller._pendingTasks.get_host_pending(self.HOST_B), 1)
+        self.assertFalse(self.controller._pendingTasks.has_host(other))
+
+    def _arm_commands(self):
+        return sorted(addr for addr, msg in self.client.sent
+                      if msg[MessageBuilder.FIELD_TYPE] == MessageBuilder.COMMAND_ARM)
+
+    def test_barrier_quorum(self):
+        self.controller._syncBarrierTimeout = 60
+        task = Task(args='echo 1', timestamp=10, seqNum=1, sync=True)
+        self.controller._open_barrier(task, [self.HOST_A, self.HOST_B])
+        self.controller._translate_msg(self.HOST_A, MessageBuilder.status_ready(0, 1))
+        self.assertEqual(self._arm_commands(), [])
+        # The task is armed as soon as all of its engines are ready, without waiting for the deadline
+        self.controller._translate_msg(self.HOST_B, MessageBuilder.status_ready(0, 1))
+        self.assertEqual(self._arm_commands(), [self.HOST_A, self.HOST_B])
+        self.assertIsNotNone(self.controller._barriers[1].start)
+        self.assertIsNone(self.controller._check_barriers())
+
+    def test_barrier_deadline(self):
+        self.controller._syncBarrierTimeout = 60
+        self.controller._open_barrier(Task(args='echo 1', timestamp=10, seqNum=1, sync=True), None)
+        self.controller._translate_msg(self.HOST_A, MessageBuilder.status_ready(0, 1))
+        barrier = self.controller._barriers[1]
+        self.assertEqual(self.controller._check_barriers(), barrier.deadline)
+        self.assertEqual(self._arm_commands(), [])
+        # Once the deadline expires, the task is armed on all engines, also those that are not ready
+        barrier.deadline = 0
+        self.assertIsNone(self.controller._check_barriers())
+        self.assertEqual([addr for addr, msg in self.client.sent], [None])
+        self.assertEqual(self.client.sent[0][1][MessageBuilder.FIELD_TYPE], MessageBuilder.COMMAND_ARM)
+
+
+if __name__ == '__main__':
+    unittest.main()
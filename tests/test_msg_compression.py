@@ -0,0 +1,122 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import time
+import unittest
+from fault_injector.network.msg_client import MessageClient
+from fault_injector.network.msg_compression import Compression
+from fault_injector.network.msg_server import MessageServer
+from tests.test_msg_multicast import free_ports
+
+
+class CompressionTest(unittest.TestCase):
+
+    payload = ''.join('task output line %d\n' % i for i in range(1000)).encode()
+
+    def test_round_trip(self):
+        for codec in (Compression.CODEC_ZLIB, Compression.CODEC_LZMA):
+            for level in (None, 1, 9):
+                data = Compression.compress(codec, self.payload, level)
+                self.assertEqual(data[0], codec)
+                self.assertLess(len(data), len(self.payload))
+                self.assertEqual(Compression.decompress(data), self.payload)
+
+    def test_corrupt(self):
+        data = Compression.compress(Compression.CODEC_ZLIB, self.payload)
+        for corrupt in (b'', data[:1] + b'garbage', bytes((9,)) + data[1:]):
+            with self.assertRaises(ValueError):
+                Compression.decompress(corrupt)
+
+    def test_codec_from_name(self):
+        self.assertEqual(Compression.codec_from_name(None), Compression.CODEC_NONE)
+        self.assertEqual(Compression.codec_from_name('zlib'), Compression.CODEC_ZLIB)
+        self.assertEqual(Compression.codec_from_name('lzma'), Compression.CODEC_LZMA)
+
+    def test_stats(self):
+        compression = Compression()
+        self.assertIsNone(compression.get_stats()['recv_ratio'])
+        data = Compression.compress(Compression.CODEC_LZMA, self.payload)
+        self.assertEqual(compression.decompress_received(data), self.payload)
+        stats = compression.get_stats()
+        self.assertEqual((stats['recv_bytes'], stats['recv_compressed']), (len(self.payload), len(data)))
+        self.assertEqual(stats['recv_ratio'], len(self.payload) / len(data))
+        self.assertGreaterEqual(stats['recv_cpu_time'], 0)
+
+
+class CompressionNegotiationTest(unittest.TestCase):
+    """
+    Sends a large message in both directions between a client and a server on the loopback interface
+    """
+
+    def _run(self, client_codec, server_codec):
+        """
+        :return: The codecs used by the client and the server, and the statistics of the client
+        """
+        port = free_ports(1)[0]
+        server = MessageServer(port, compression=server_codec, compression_threshold=1024)
+        client = MessageClient(compression=client_codec, compression_threshold=1024)
+        addr = ('127.0.0.1', port)
+        server.start()
+        try:
+            self.assertEqual(client.add_servers([addr])[1], [])
+            client.start()
+            msg = {'type': 'output', 'data': CompressionTest.payload.decode()}
+            client.send_msg(addr, msg)
+            self.assertEqual(self._receive(server), msg)
+            server.broadcast_msg(msg)
+            self.assertEqual(self._receive(client), msg)
+            server_codec = server._registeredHosts[next(iter(server._registeredHosts))].compression.codec
+            return client._registeredHosts[addr].compression.codec, server_codec, client.get_host_compression_stats(addr)
+        finally:
+            client.stop()
+            server.stop()
+
+    def _receive(self, entity):
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            if not entity.peek_msg_queue():
+                time.sleep(0.01)
+                continue
+            msg = entity.pop_msg_queue()[1]
+            if isinstance(msg, dict):
+                return msg
+        self.fail('No message received')
+
+    def test_cheaper_codec(self):
+        # Both hosts use the cheaper of the two codecs
+        client_codec, server_codec, stats = self._run('lzma', 'zlib')
+        self.assertEqual((client_codec, server_codec), (Compression.CODEC_ZLIB, Compression.CODEC_ZLIB))
+        self.assertGreater(stats['sent_ratio'], 1)
+        self.assertGreater(stats['recv_ratio'], 1)
+
+    def test_disabled(self):
+        # Compression is used only if it is enabled on both hosts
+        client_codec, server_codec, stats = self._run(None, 'lzma')
+        self.assertEqual((client_codec, server_codec), (Compression.CODEC_NONE, Compression.CODEC_NONE))
+        self.assertIsNone(stats['sent_ratio'])
+        self.assertIsNone(stats['recv_ratio'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+from fault_injector.network.msg_connection import MessageConnection
+
+
+class FakeSocket:
+    """
+    Stand-in for a non-blocking socket, which accepts a limited number of bytes until more room is made
+    """
+
+    def __init__(self, room=0):
+        self.room = room
+        self.data = bytearray()
+
+    def send(self, data):
+        if self.room == 0:
+            raise BlockingIOError()
+        n = min(self.room, len(data))
+        self.data += bytes(data[:n])
+        self.room -= n
+        return n
+
+    def close(self):
+        pass
+
+
+class MessageConnectionTest(unittest.TestCase):
+
+    def _connection(self, policy=MessageConnection.POLICY_DISCONNECT, high_water=1000, low_water=100):
+        self.sock = FakeSocket()
+        return MessageConnection(self.sock, ('127.0.0.1', 30000), high_water=high_water, low_water=low_water,
+                                 policy=policy)
+
+    def test_sent_seq_num(self):
+        conn = self._connection()
+        conn.enqueue([b'a' * 10], seq_num=(1, 1))
+        conn.enqueue([b'b' * 10, b'c' * 10], seq_num=(1, 2))
+        conn.flush()
+        self.assertIsNone(conn.sentSeqNum)
+        # Messages count as sent only once all of their frames have been written
+        self.sock.room = 15
+        conn.flush()
+        self.assertEqual(conn.sentSeqNum, (1, 1))
+        self.sock.room = 10
+        conn.flush()
+        self.assertEqual(conn.sentSeqNum, (1, 1))
+        self.sock.room = 100
+        conn.flush()
+        self.assertEqual(conn.sentSeqNum, (1, 2))
+        self.assertEqual(bytes(self.sock.data), b'a' * 10 + b'b' * 10 + b'c' * 10)
+
+    def test_sent_seq_num_lanes(self):
+        conn = self._connection()
+        conn.enqueue([b'a' * 10, b'b' * 10], lane=MessageConnection.LANE_MESSAGES, seq_num=(1, 1))
+        self.sock.room = 5
+        conn.flush()
+        # A message in the control lane overtakes the bulk message, but the latter is still to be forwarded again
+        conn.enqueue([b'c' * 10], seq_num=(1, 2))
+        self.sock.room = 15
+        conn.flush()
+        self.assertEqual(bytes(self.sock.data), b'a' * 10 + b'c' * 10)
+        self.assertIsNone(conn.sentSeqNum)
+        self.sock.room = 10
+        conn.flush()
+        self.assertEqual(conn.sentSeqNum, (1, 2))
+
+    def test_drop(self):
+        conn = self._connection(policy=MessageConnection.POLICY_DROP, high_water=20, low_water=10)
+        conn.enqueue([b'a' * 15], seq_num=(1, 1))
+        self.assertTrue(conn.enqueue([b'b' * 15], seq_num=(1, 2)))
+        self.assertEqual(conn.droppedFrames, 1)
+        # Control frames are never dropped
+        self.assertTrue(conn.enqueue([b'p' * 5], control=True))
+        self.sock.room = 100
+        conn.flush()
+        self.assertEqual(bytes(self.sock.data), b'a' * 15 + b'p' * 5)
+        self.assertEqual(conn.sentSeqNum, (1, 2))
+
+    def test_disconnect(self):
+        conn = self._connection(high_water=20, low_water=10)
+        conn.enqueue([b'a' * 15], seq_num=(1, 1))
+        self.assertTrue(conn.enqueue([b'p' * 15], control=True))
+        self.assertFalse(conn.enqueue([b'b' * 15], seq_num=(1, 2)))
+
+    def test_spill(self):
+        conn = self._connection(policy=MessageConnection.POLICY_SPILL, high_water=20, low_water=10)
+        conn.enqueue([b'a' * 15], seq_num=(1, 1))
+        conn.enqueue([b'b' * 8, b'c' * 8], lane=MessageConnection.LANE_MESSAGES, seq_num=(1, 2))
+        conn.enqueue([b'd' * 15], seq_num=(1, 3))
+        # Heartbeats are not spilled, while multicast barriers stay behind the spilled messages
+        conn.enqueue([b'p' * 5], control=True)
+        conn.enqueue([b's' * 5], control=True, ordered=True)
+        self.assertEqual(conn.get_output_size(), 56)
+        self.sock.room = 20
+        conn.flush()
+        self.assertEqual(bytes(self.sock.data), b'a' * 15 + b'p' * 5)
+        self.assertEqual(conn.sentSeqNum, (1, 1))
+        self.sock.room = 100
+        while conn.has_output():
+            conn.flush()
+        self.assertEqual(bytes(self.sock.data[20:]), b'd' * 15 + b'b' * 8 + b'c' * 8 + b's' * 5)
+        self.assertEqual(conn.sentSeqNum, (1, 3))
+
+    def test_close(self):
+        conn = self._connection()
+        conn.enqueue([b'a' * 10], seq_num=(1, 1))
+        conn.enqueue([b'b' * 10], seq_num=(1, 2))
+        self.sock.room = 10
+        conn.flush()
+        conn.close()
+        # The discarded message must be forwarded again, starting after the last one that was written
+        self.assertEqual(conn.sentSeqNum, (1, 1))
+        self.assertFalse(conn.has_output())
+
+
+if __name__ == '__main__':
+    unittest.main()
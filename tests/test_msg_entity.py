@@ -0,0 +1,101 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import socket
+import time
+import unittest
+from fault_injector.network.msg_client import MessageClient
+from fault_injector.network.msg_server import MessageServer
+from tests.test_msg_multicast import free_ports
+
+
+class MessageOrderTest(unittest.TestCase):
+    """
+    Sends messages of mixed sizes from a server to a client on the loopback interface, with small chunks and socket
+    buffers so that large messages are interleaved with control frames
+    """
+
+    big_size = 2 * 1024 * 1024
+
+    def setUp(self):
+        self.port = free_ports(1)[0]
+        self.server = MessageServer(self.port, re_send_msgs=True, chunk_size=1024, sock_sndbuf=4096)
+        self.server.start()
+        self.client = MessageClient(re_send_msgs=True, retry_period=1, chunk_size=1024, sock_rcvbuf=4096)
+        self.addr = ('127.0.0.1', self.port)
+        self.assertEqual(self.client.add_servers([self.addr])[1], [])
+        self.client.start()
+        # The server knows the client only once it has received a message from it
+        self.client.send_msg(self.addr, {'type': 'hello'})
+        self._receive(self.server, 1)
+
+    def tearDown(self):
+        self.client.stop()
+        self.server.stop()
+
+    def _receive(self, entity, n):
+        """
+        Receives n messages from an entity, ignoring connection status notifications
+
+        :return: The list of received messages
+        """
+        received = []
+        deadline = time.time() + 20
+        while len(received) < n and time.time() < deadline:
+            if not entity.peek_msg_queue():
+                time.sleep(0.01)
+                continue
+            msg = entity.pop_msg_queue()[1]
+            if isinstance(msg, dict):
+                received.append(msg)
+        self.assertEqual(len(received), n)
+        return received
+
+    def _send(self, names):
+        for name in names:
+            self.server.broadcast_msg({'type': name, 'data': 'x' * (self.big_size if name == 'big' else 0)})
+
+    def test_order(self):
+        # Small messages must not overtake large ones sent before them
+        self._send(['big', 'small', 'big', 'small'])
+        self.assertEqual([m['type'] for m in self._receive(self.client, 4)], ['big', 'small', 'big', 'small'])
+        last_seq = (self.server._curr_seq_ts, self.server._curr_seq_num - 1)
+        self.assertEqual(self.client._seq_nums[self.addr][0], last_seq)
+
+    def test_resend_after_reconnect(self):
+        self._send(['big', 'small'])
+        self.assertEqual([m['type'] for m in self._receive(self.client, 2)], ['big', 'small'])
+        conn = self.client._registeredHosts[self.addr]
+        conn.sock.shutdown(socket.SHUT_RDWR)
+        time.sleep(0.3)
+        # Messages sent while the client is disconnected are forwarded once it reconnects, exactly once and in order
+        self._send(['small', 'big', 'small'])
+        self.assertEqual([m['type'] for m in self._receive(self.client, 3)], ['small', 'big', 'small'])
+        time.sleep(0.3)
+        while self.client.peek_msg_queue():
+            self.assertNotIsInstance(self.client.pop_msg_queue()[1], dict)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+from fault_injector.network.msg_frame import FrameBuffer
+
+
+class FakeSocket:
+    """
+    Stand-in for a socket, from which a stream of data is received in pieces of a fixed size
+    """
+
+    def __init__(self, data, piece_size):
+        self.data = data
+        self.pos = 0
+        self.pieceSize = piece_size
+
+    def recv_into(self, view):
+        n = min(self.pieceSize, len(view), len(self.data) - self.pos)
+        view[:n] = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+
+class FrameBufferTest(unittest.TestCase):
+
+    def _parse(self, data, piece_size, size=64):
+        """
+        Feeds a stream of data to a FrameBuffer, and collects the frames extracted from it
+
+        :return: A list of (seq_num, flags, payload) tuples
+        """
+        buf = FrameBuffer(size=size)
+        sock = FakeSocket(data, piece_size)
+        frames = []
+        while buf.recv_from(sock) > 0:
+            for msglen, seq_num, flags, payload in buf.frames():
+                self.assertEqual(msglen, len(payload))
+                frames.append((seq_num, flags, bytes(payload)))
+        self.assertEqual(buf.pending_bytes(), 0)
+        return frames
+
+    def test_frames(self):
+        payloads = [b'', b'a', b'b' * 63, b'c' * 64, b'd' * 1000, b'e' * 3]
+        data = b''.join(FrameBuffer.build_frames((5, i), p)[0] for i, p in enumerate(payloads))
+        expected = [((5, i), 0, p) for i, p in enumerate(payloads)]
+        # Frames are extracted in the same way whether they are split across reads or not, and larger than the buffer
+        for piece_size in (1, 7, 64, len(data)):
+            self.assertEqual(self._parse(data, piece_size), expected)
+
+    def test_chunks(self):
+        big = bytes(range(256)) * 10
+        chunks = FrameBuffer.build_frames((1, 1), big, flags=FrameBuffer.FLAG_COMPRESSED, chunk_size=1000)
+        self.assertEqual(len(chunks), 3)
+        control = FrameBuffer.build_frames((0, 0), b'\x01ping', flags=FrameBuffer.FLAG_CONTROL)[0]
+        # Chunks of a large message are interleaved with other frames, and reassembled into a single frame
+        data = chunks[0] + control + chunks[1] + FrameBuffer.build_frames((1, 2), b'small')[0] + chunks[2]
+        expected = [((0, 0), FrameBuffer.FLAG_CONTROL, b'\x01ping'), ((1, 2), 0, b'small'),
+                    ((1, 1), FrameBuffer.FLAG_COMPRESSED, big)]
+        for piece_size in (1, 100, len(data)):
+            self.assertEqual(self._parse(data, piece_size, size=512), expected)
+
+    def test_partial(self):
+        frame = FrameBuffer.build_frames((1, 1), b'payload')[0]
+        buf = FrameBuffer()
+        buf.recv_from(FakeSocket(frame[:-1], len(frame)))
+        self.assertEqual(list(buf.frames()), [])
+        self.assertEqual(buf.pending_bytes(), len(frame) - 1)
+
+    def test_split_join(self):
+        payload = b'x' * 2500
+        frames = FrameBuffer.build_frames((3, 4), payload, flags=FrameBuffer.FLAG_COMPRESSED, chunk_size=1000)
+        split = FrameBuffer.split_frames(b''.join(frames))
+        self.assertEqual([bytes(f) for f in split], frames)
+        self.assertEqual(FrameBuffer.join_frames(split), (payload, FrameBuffer.FLAG_COMPRESSED))
+        self.assertEqual(FrameBuffer.join_frames(FrameBuffer.build_frames((3, 4), b'y')), (b'y', 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os, shutil, tempfile, unittest
+from fault_injector.network.msg_frame import FrameBuffer
+from fault_injector.network.msg_history import MessageHistory
+
+
+class MessageHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        # Sequence numbers are sparse, and their timestamp changes halfway
+        self.seq_nums = [(100, 2 * i) for i in range(30)] + [(200, 2 * i) for i in range(30)]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _fill(self, history):
+        for i, seq_num in enumerate(self.seq_nums):
+            payload = ('message %s' % i).encode() * (i % 5 + 1)
+            history.append(seq_num, FrameBuffer.build_frames(seq_num, payload, chunk_size=20), i % 2)
+
+    def _check(self, history, start, expected):
+        """
+        Checks that the messages following a sequence number are the expected ones, with their frames and lanes
+        """
+        items = list(history.iter_after(start))
+        self.assertEqual([seq_num for seq_num, frames, lane in items], expected)
+        for seq_num, frames, lane in items:
+            i = self.seq_nums.index(seq_num)
+            self.assertEqual(lane, i % 2)
+            self.assertEqual(FrameBuffer.join_frames(frames)[0], ('message %s' % i).encode() * (i % 5 + 1))
+
+    def test_memory(self):
+        history = MessageHistory(max_length=100, path=self.dir)
+        self._fill(history)
+        self.assertEqual(len(history), len(self.seq_nums))
+        self.assertEqual(os.listdir(self.dir), [])
+        self._check(history, None, self.seq_nums)
+        self._check(history, (100, 9), self.seq_nums[5:])
+        self._check(history, self.seq_nums[-1], [])
+        history.close()
+
+    def test_segments(self):
+        history = MessageHistory(max_length=8, segment_size=200, path=self.dir)
+        self._fill(history)
+        self.assertEqual(len(history), len(self.seq_nums))
+        self.assertGreater(len(history._segments), 3)
+        self._check(history, None, self.seq_nums)
+        # Every starting point is found, within a segment, at the boundaries between segments and in memory, and for
+        # sequence numbers that were never sent
+        for i, seq_num in enumerate(self.seq_nums):
+            self._check(history, seq_num, self.seq_nums[i + 1:])
+            self._check(history, (seq_num[0], seq_num[1] + 1), self.seq_nums[i + 1:])
+        self._check(history, (50, 0), self.seq_nums)
+        self._check(history, (300, 0), [])
+        history.close()
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_disk_limit(self):
+        history = MessageHistory(max_length=8, max_disk_size=400, segment_size=200, path=self.dir)
+        self._fill(history)
+        # The oldest segments are deleted, and the history starts from the first message that was kept
+        first = self.seq_nums.index(next(history.iter_after(None))[0])
+        self.assertGreater(first, 0)
+        self.assertEqual(len(history), len(self.seq_nums) - first)
+        self._check(history, None, self.seq_nums[first:])
+        self._check(history, self.seq_nums[first + 1], self.seq_nums[first + 2:])
+        history.close()
+
+    def test_no_disk(self):
+        history = MessageHistory(max_length=8, max_disk_size=0, path=self.dir)
+        self._fill(history)
+        self.assertEqual(len(history), 8)
+        self.assertEqual(os.listdir(self.dir), [])
+        self._check(history, None, self.seq_nums[-8:])
+        history.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,233 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import select
+import socket
+import time
+import unittest
+from unittest import mock
+from fault_injector.network.msg_client import MessageClient
+from fault_injector.network.msg_server import MessageServer
+from fault_injector.network.msg_multicast import MulticastSender, MulticastReceiver
+
+
+def free_ports(n, sock_type=socket.SOCK_STREAM):
+    """
+    Returns a number of ports that are currently free on the loopback interface
+
+    :param n: The number of ports
+    :param sock_type: The type of socket for which the ports must be free
+    :return: A list of port numbers
+    """
+    socks = [socket.socket(socket.AF_INET, sock_type) for i in range(n)]
+    for sock in socks:
+        sock.bind(('127.0.0.1', 0))
+    ports = [sock.getsockname()[1] for sock in socks]
+    for sock in socks:
+        sock.close()
+    return ports
+
+
+class DiscardSocket:
+    """
+    Stand-in for the socket of a multicast sender, which loses all datagrams
+    """
+
+    def sendto(self, data, addr):
+        pass
+
+    def close(self):
+        pass
+
+
+class MulticastStreamTest(unittest.TestCase):
+    """
+    Sends multicast datagrams on the loopback interface, relying on IP_MULTICAST_LOOP
+    """
+
+    addr = ('127.0.0.1', 30000)
+    member_id = 7
+
+    def setUp(self):
+        self.group = ('239.255.77.3', free_ports(1, socket.SOCK_DGRAM)[0])
+        self.receiver = MulticastReceiver(interface='127.0.0.1')
+        try:
+            self.sender = MulticastSender(self.group, interface='127.0.0.1')
+        except OSError:
+            self.skipTest('Multicast is not available')
+        try:
+            self.sock = self.receiver.join(self.group, self.sender.streamId, self.member_id, 0, self.addr)
+        except OSError:
+            self.sender.close()
+            self.skipTest('Multicast is not available')
+
+    def tearDown(self):
+        self.sender.close()
+        self.receiver.close()
+
+    def _send(self, n, lost=False, members=()):
+        real = self.sender._sock
+        if lost:
+            self.sender._sock = DiscardSocket()
+        for i in range(n):
+            self.sender.send([('m%s' % self.sender.nextSeq).encode()], members)
+        self.sender._sock = real
+
+    def _receive(self, n):
+        """
+        Receives n datagrams and adds them to their stream
+
+        :return: The list of (sequence number, frame) tuples that were delivered
+        """
+        datagrams = []
+        deadline = time.time() + 5
+        while len(datagrams) < n and time.time() < deadline:
+            if select.select([self.sock], [], [], 0.1)[0]:
+                datagrams += self.receiver.recv(self.sock)
+        self.assertEqual(len(datagrams), n)
+        return self._add(datagrams)
+
+    def _add(self, datagrams):
+        delivered = []
+        for stream_id, seq, members, frame in datagrams:
+            addr, frames = self.receiver.add(stream_id, seq, members, frame)
+            self.assertEqual(addr, self.addr)
+            delivered += [(s, bytes(f)) for s, f in frames]
+        return delivered
+
+    def test_in_order(self):
+        self._send(5)
+        self.assertEqual(self._receive(5), [(i, ('m%s' % i).encode()) for i in range(5)])
+        self.assertEqual(self.receiver.get_repairs(), [])
+
+    def test_gap_repair(self):
+        self._send(2)
+        self._send(2, lost=True)
+        self._send(2)
+        self.assertEqual([s for s, f in self._receive(4)], [0, 1])
+        # The gap is detected from the datagrams that follow it, and requested only once
+        stream_id = self.sender.streamId
+        self.assertEqual(self.receiver.get_repairs(), [(self.addr, stream_id, 2, 4)])
+        self.assertEqual(self.receiver.get_repairs(), [])
+        repaired = [MulticastSender.parse(d) for d in self.sender.get_datagrams(2, 4)]
+        self.assertEqual([s for s, f in self._add(repaired)], [2, 3, 4, 5])
+
+    def test_tail_gap(self):
+        self._send(2)
+        self._send(1, lost=True)
+        self.assertEqual([s for s, f in self._receive(2)], [0, 1])
+        # Losing the last datagram is detected only through the barrier sent on the TCP connection
+        self.assertEqual(self.receiver.get_repairs(), [])
+        self.assertTrue(self.receiver.set_barrier(self.sender.streamId, self.sender.nextSeq))
+        self.assertEqual(self.receiver.get_repairs(), [(self.addr, self.sender.streamId, 2, 3)])
+
+    def test_fenced(self):
+        self._send(1, members=(self.member_id,))
+        self._send(1)
+        # The datagrams wait for the messages sent before them through TCP, which precede the barrier
+        self.assertEqual(self._receive(2), [])
+        self.assertTrue(self.receiver.set_barrier(self.sender.streamId, 1))
+        self.assertEqual([s for s, f in self.receiver.pop_ready(self.sender.streamId)[1]], [0, 1])
+
+
+class MulticastEntityTest(unittest.TestCase):
+    """
+    Broadcasts messages from a client to servers on the loopback interface, interleaved with unicast messages
+    """
+
+    n_servers = 3
+    n_msgs = 200
+
+    def _run(self, lossy=False):
+        ports = free_ports(self.n_servers)
+        servers = [MessageServer(port, multicast_interface='127.0.0.1') for port in ports]
+        for s in servers:
+            s.start()
+        client = MessageClient(re_send_msgs=True, multicast_group=('239.255.77.3', free_ports(1, socket.SOCK_DGRAM)[0]),
+                               multicast_interface='127.0.0.1')
+        if client._mcastSender is None:
+            for s in servers:
+                s.stop()
+            self.skipTest('Multicast is not available')
+        if lossy:
+            real = client._mcastSender._sock
+
+            class LossySocket(DiscardSocket):
+                n = 0
+
+                def sendto(self, data, addr):
+                    LossySocket.n += 1
+                    if LossySocket.n % 4 != 0:
+                        real.sendto(data, addr)
+
+            client._mcastSender._sock = LossySocket()
+        addrs = [('127.0.0.1', port) for port in ports]
+        try:
+            self.assertEqual(client.add_servers(addrs)[1], [])
+            client.start()
+            expected = []
+            for i in range(self.n_msgs):
+                if i % 7 == 0:
+                    for addr in addrs:
+                        client.send_msg(addr, {'u': i})
+                    expected.append(('u', i))
+                client.broadcast_msg({'b': i})
+                expected.append(('b', i))
+            for s in servers:
+                received = []
+                deadline = time.time() + 10
+                while len(received) < len(expected) and time.time() < deadline:
+                    if not s.peek_msg_queue():
+                        time.sleep(0.05)
+                        continue
+                    msg = s.pop_msg_queue()[1]
+                    received.append(('b', msg['b']) if 'b' in msg else ('u', msg['u']))
+                self.assertEqual(received, expected)
+            # All messages count as sent, also those sent through multicast, and are not forwarded again
+            last_seq = (client._curr_seq_ts, client._curr_seq_num - 1)
+            for addr in addrs:
+                self.assertEqual(client._seq_nums[addr][1], last_seq)
+            return client
+        finally:
+            client.stop()
+            for s in servers:
+                s.stop()
+
+    def test_multicast(self):
+        client = self._run()
+        self.assertTrue(all(conn.multicast for conn in client._registeredHosts.values()))
+
+    def test_repair(self):
+        client = self._run(lossy=True)
+        self.assertTrue(all(conn.multicast for conn in client._registeredHosts.values()))
+
+    def test_unicast_fallback(self):
+        # Servers that cannot join the group receive all broadcast messages through TCP
+        with mock.patch.object(MulticastReceiver, 'join', side_effect=OSError('Multicast is not available')):
+            client = self._run()
+        self.assertFalse(any(conn.multicast for conn in client._registeredHosts.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
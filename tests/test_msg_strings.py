@@ -0,0 +1,119 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+from fault_injector.network.msg_builder import MessageBuilder
+from fault_injector.network.msg_strings import StringTable
+
+
+class StringTableTest(unittest.TestCase):
+
+    HOST_A = ('127.0.0.1', 30001)
+    HOST_B = ('127.0.0.1', 30002)
+
+    def setUp(self):
+        self.controller = StringTable()
+        self.engine = StringTable()
+
+    @staticmethod
+    def _msg(seq_num, data='faultlib/leak 10', cores='0-3'):
+        return {MessageBuilder.FIELD_TYPE: MessageBuilder.COMMAND_START, MessageBuilder.FIELD_SEQNUM: seq_num,
+                MessageBuilder.FIELD_DATA: data, MessageBuilder.FIELD_CORES: cores}
+
+    def _send(self, msg, host):
+        """
+        Interns a message for a host, expands it on the receiving side, and checks that the original is restored
+
+        :return: The interned message, as it is sent
+        """
+        sent = self.controller.intern(dict(msg), host)
+        self.assertEqual(self.engine.expand(dict(sent)), msg)
+        return sent
+
+    def test_round_trip(self):
+        first = self._send(self._msg(1), self.HOST_A)
+        self.assertIn(MessageBuilder.FIELD_DATA, first)
+        self.assertIn(MessageBuilder.FIELD_DATA_ID, first)
+        # Strings that were already defined to the host are sent as IDs only
+        second = self._send(self._msg(2), self.HOST_A)
+        self.assertNotIn(MessageBuilder.FIELD_DATA, second)
+        self.assertNotIn(MessageBuilder.FIELD_CORES, second)
+        self.assertEqual(second[MessageBuilder.FIELD_DATA_ID], first[MessageBuilder.FIELD_DATA_ID])
+        self.assertIn(MessageBuilder.FIELD_DATA, self._send(self._msg(3, data='faultlib/dial 5'), self.HOST_A))
+        # Other hosts do not know the strings yet
+        self.assertIn(MessageBuilder.FIELD_DATA, self.controller.intern(self._msg(4), self.HOST_B))
+        self.assertNotIn(MessageBuilder.FIELD_DATA, self.controller.intern(self._msg(5), self.HOST_B))
+
+    def test_broadcast(self):
+        self.assertIn(MessageBuilder.FIELD_DATA, self._send(self._msg(1), StringTable.ALL_HOSTS))
+        self.assertNotIn(MessageBuilder.FIELD_DATA, self._send(self._msg(2), self.HOST_A))
+
+    def test_forget(self):
+        self._send(self._msg(1), StringTable.ALL_HOSTS)
+        self._send(self._msg(2, data='faultlib/dial 5'), self.HOST_A)
+        # After a connection loss the engine may have reset its table, and all strings are defined again
+        self.controller.forget(self.HOST_A)
+        self.engine.reset()
+        self.assertIn(MessageBuilder.FIELD_DATA, self._send(self._msg(3), self.HOST_A))
+        self.assertIn(MessageBuilder.FIELD_DATA, self._send(self._msg(4, data='faultlib/dial 5'), self.HOST_A))
+        self.assertNotIn(MessageBuilder.FIELD_DATA, self._send(self._msg(5), self.HOST_A))
+
+    def test_replies(self):
+        self._send(self._msg(1), self.HOST_A)
+        # Engines reuse the IDs assigned by the controller, and do not assign new ones
+        reply = {MessageBuilder.FIELD_TYPE: MessageBuilder.STATUS_END, MessageBuilder.FIELD_DATA: 'faultlib/leak 10'}
+        sent = self.engine.intern(dict(reply), assign=False)
+        self.assertEqual(self.controller.expand(dict(sent)), reply)
+        sent = self.engine.intern(dict(reply), assign=False)
+        self.assertNotIn(MessageBuilder.FIELD_DATA, sent)
+        self.assertEqual(self.controller.expand(dict(sent)), reply)
+        unknown = {MessageBuilder.FIELD_TYPE: MessageBuilder.STATUS_END, MessageBuilder.FIELD_DATA: 'other'}
+        self.assertEqual(self.engine.intern(dict(unknown), assign=False), unknown)
+
+    def test_load(self):
+        self._send(self._msg(1), self.HOST_A)
+        self._send(self._msg(2, data='faultlib/dial 5'), self.HOST_A)
+        # Tables are restored from checkpoints, where IDs are JSON keys, and strings must be defined to hosts again
+        restored = StringTable()
+        restored.load({str(s_id): string for s_id, string in self.controller.get_strings().items()})
+        self.assertEqual(restored.get_strings(), self.controller.get_strings())
+        sent = restored.intern(self._msg(3), self.HOST_A)
+        self.assertIn(MessageBuilder.FIELD_DATA, sent)
+        self.assertEqual(sent[MessageBuilder.FIELD_DATA_ID], self.controller.intern(self._msg(3), self.HOST_A)[
+            MessageBuilder.FIELD_DATA_ID])
+        # Engines learn the whole table at once from the strings field
+        engine = StringTable()
+        engine.expand({MessageBuilder.FIELD_STRINGS: {str(s_id): string for s_id, string in
+                                                      self.controller.get_strings().items()}})
+        self.assertEqual(engine.get_strings(), self.controller.get_strings())
+
+    def test_unknown_id(self):
+        msg = self.engine.expand({MessageBuilder.FIELD_TYPE: MessageBuilder.COMMAND_START,
+                                  MessageBuilder.FIELD_DATA_ID: 42})
+        self.assertIsNone(msg[MessageBuilder.FIELD_DATA])
+        self.assertNotIn(MessageBuilder.FIELD_DATA_ID, msg)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os, shutil, tempfile, unittest
+from fault_injector.io.output_archive import OutputArchiveReader, OutputArchiveWriter
+from fault_injector.io.task import Task
+from fault_injector.io.writer import LogFlusher
+from fault_injector.network.msg_builder import MessageBuilder
+from fault_injector.network.msg_compression import Compression
+from fault_injector.util.misc import formatipport, format_output_archive, format_output_directory
+from fault_injector.util.misc import format_output_filename
+
+
+class OutputArchiveTest(unittest.TestCase):
+
+    HOSTS = [('127.0.0.1', 30001), ('127.0.0.1', 30002)]
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = format_output_archive(self.dir, 'workload')
+        self.outputs = []
+        for seq_num in range(6):
+            task = Task(args='sudo ./faultlib/leak;1 %s' % seq_num, timestamp=seq_num, duration=1, seqNum=seq_num)
+            output = ''.join('line %s of task %s\n' % (i, seq_num) for i in range(100 * seq_num))
+            self.outputs.append((self.HOSTS[seq_num % 2], MessageBuilder.status_end(task, output=output)))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _write(self, codec=Compression.CODEC_NONE, flusher=None):
+        writer = OutputArchiveWriter(self.path, flusher=flusher, codec=codec)
+        for addr, msg in self.outputs:
+            self.assertTrue(writer.write_output(addr, msg))
+        return writer
+
+    def _check_extract(self):
+        """
+        Checks that the outputs extracted from the archive match those written directly by the controller
+        """
+        reader = OutputArchiveReader(self.path + OutputArchiveWriter.INDEX_EXT)
+        self.assertEqual(reader.get_entries(formatipport(self.HOSTS[1])),
+                         [(formatipport(self.HOSTS[1]), seq_num, 'leak;1_%s' % seq_num) for seq_num in (1, 3, 5)])
+        out_dir = os.path.join(self.dir, 'extracted')
+        self.assertEqual(reader.extract_all(out_dir, 'workload'), len(self.outputs))
+        reader.close()
+        for addr, msg in self.outputs:
+            out_path = format_output_filename(format_output_directory(out_dir, addr, 'workload'), msg)
+            with open(out_path) as out_file:
+                self.assertEqual(out_file.read(), msg[MessageBuilder.FIELD_OUTPUT])
+
+    def test_extract(self):
+        for codec in (Compression.CODEC_NONE, Compression.CODEC_ZLIB, Compression.CODEC_LZMA):
+            self._write(codec).close()
+            self._check_extract()
+            shutil.rmtree(os.path.join(self.dir, 'extracted'))
+
+    def test_flusher(self):
+        flusher = LogFlusher(interval=3600)
+        writer = self._write(flusher=flusher)
+        # Outputs are kept in memory until the flusher is stopped
+        reader = OutputArchiveReader(self.path)
+        self.assertEqual(reader.get_entries(), [])
+        reader.close()
+        flusher.stop()
+        writer.close()
+        self._check_extract()
+
+    def test_rotation(self):
+        self._write().close()
+        self._write(Compression.CODEC_ZLIB).close()
+        writer = OutputArchiveWriter(self.path)
+        writer.write_output(*self.outputs[0])
+        writer.close()
+        # Each new archive replaces the previous one, which is renamed with the first free suffix
+        for k, n in ((None, 1), (1, 6), (2, 6)):
+            path = self.path if k is None else '%s.%s' % (self.path, k)
+            reader = OutputArchiveReader(path)
+            self.assertEqual(len(reader.get_entries()), n)
+            addr, msg = self.outputs[0]
+            self.assertEqual(reader.read_output(formatipport(addr), 0), msg[MessageBuilder.FIELD_OUTPUT])
+            reader.close()
+        self.assertFalse(os.path.exists('%s.3%s' % (self.path, OutputArchiveWriter.DATA_EXT)))
+
+    def test_resume(self):
+        writer = self._write()
+        position = writer.get_position()
+        writer.write_output(*self.outputs[0])
+        writer.close()
+        # Outputs written after the position are discarded, and the archive is not rotated
+        writer = OutputArchiveWriter(self.path, position=position)
+        writer.close()
+        reader = OutputArchiveReader(self.path)
+        self.assertEqual(len(reader.get_entries()), len(self.outputs))
+        reader.close()
+        self.assertFalse(os.path.exists('%s.1%s' % (self.path, OutputArchiveWriter.DATA_EXT)))
+
+    def test_truncated(self):
+        self._write().close()
+        # The last index line may be truncated if the controller was killed
+        with open(self.path + OutputArchiveWriter.INDEX_EXT, 'a') as index_file:
+            index_file.write('127.0.0.1:30001;6;leak_6;0')
+        reader = OutputArchiveReader(self.path)
+        self.assertEqual(len(reader.get_entries()), len(self.outputs))
+        self.assertIsNone(reader.read_output('127.0.0.1:30001', 6))
+        reader.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
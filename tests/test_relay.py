@@ -0,0 +1,132 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import threading
+import time
+import unittest
+from unittest import mock
+from fault_injector.injection.fault_injector_relay import InjectorRelay
+from fault_injector.io.task import Task
+from fault_injector.network.msg_builder import MessageBuilder
+from fault_injector.network.msg_client import MessageClient
+from fault_injector.network.msg_server import MessageServer
+from fault_injector.util.misc import formatipport
+from tests.test_msg_multicast import free_ports
+
+
+class InjectorRelayTest(unittest.TestCase):
+    """
+    Forwards commands from a controller to two engines through a relay on the loopback interface, and their status
+    back to the controller. The controller and the engines are stand-ins, built directly on the messaging layer
+    """
+
+    def setUp(self):
+        relay_port, e1_port, e2_port = free_ports(3)
+        self.engine_addrs = [('127.0.0.1', e1_port), ('127.0.0.1', e2_port)]
+        self.engines = [MessageServer(port) for port in (e1_port, e2_port)]
+        for engine in self.engines:
+            engine.start()
+            self.addCleanup(engine.stop)
+        relay_client = MessageClient()
+        self._connect(relay_client, self.engine_addrs)
+        self.relay = InjectorRelay(MessageServer(relay_port), relay_client)
+        # Signal handlers can only be installed by the main thread
+        patcher = mock.patch('fault_injector.injection.fault_injector_relay.signal')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        threading.Thread(target=self.relay.listen, daemon=True).start()
+        self.addCleanup(self.relay.stop)
+        self.relay_addr = ('127.0.0.1', relay_port)
+        self.controller = MessageClient()
+        self._connect(self.controller, [self.relay_addr])
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+
+    def _connect(self, client, addrs):
+        """
+        Connects a client to servers whose messaging threads may not be listening yet
+        """
+        deadline = time.time() + 5
+        while len(addrs) > 0 and time.time() < deadline:
+            addrs = client.add_servers(addrs)[1]
+            if len(addrs) > 0:
+                time.sleep(0.05)
+        self.assertEqual(addrs, [])
+
+    def _receive(self, entity, n):
+        """
+        Receives n messages from an entity, ignoring connection status notifications
+
+        :return: The list of received (address, message) tuples
+        """
+        received = []
+        deadline = time.time() + 10
+        while len(received) < n and time.time() < deadline:
+            addr, msg = entity.pop_msg_queue(timeout=0.1)
+            if isinstance(msg, dict):
+                received.append((addr, msg))
+        self.assertEqual(len(received), n)
+        return received
+
+    def test_forward(self):
+        hosts = sorted(formatipport(addr) for addr in self.engine_addrs)
+        # The relay announces its engines before forwarding the session command to them
+        self.controller.broadcast_msg(MessageBuilder.command_session(0))
+        addr, msg = self._receive(self.controller, 1)[0]
+        self.assertEqual(addr, self.relay_addr)
+        self.assertEqual(msg[MessageBuilder.FIELD_TYPE], MessageBuilder.STATUS_RELAY)
+        self.assertEqual(sorted(msg[MessageBuilder.FIELD_DATA]), hosts)
+        relay_addrs = []
+        for engine in self.engines:
+            addr, msg = self._receive(engine, 1)[0]
+            self.assertEqual(msg[MessageBuilder.FIELD_TYPE], MessageBuilder.COMMAND_START_SESSION)
+            relay_addrs.append(addr)
+
+        # A task command is broadcast to both engines, and their status comes back tagged with their address
+        task = Task(args='echo hello', timestamp=1, duration=0, seqNum=1, isFault=False)
+        self.controller.broadcast_msg(MessageBuilder.command_start(task))
+        for engine, addr in zip(self.engines, relay_addrs):
+            msg = self._receive(engine, 1)[0][1]
+            self.assertEqual(Task.msg_to_task(msg).seqNum, 1)
+            engine.send_msg(addr, MessageBuilder.status_start(task))
+            engine.send_msg(addr, MessageBuilder.status_end(task, output='hello'))
+        received = self._receive(self.controller, 4)
+        self.assertTrue(all(addr == self.relay_addr for addr, msg in received))
+        for host in hosts:
+            statuses = [msg for addr, msg in received if msg[MessageBuilder.FIELD_HOST] == host]
+            self.assertEqual([msg[MessageBuilder.FIELD_TYPE] for msg in statuses],
+                             [MessageBuilder.STATUS_START, MessageBuilder.STATUS_END])
+            self.assertEqual(statuses[1][MessageBuilder.FIELD_OUTPUT], 'hello')
+
+        # A command addressed to a single engine reaches only that engine, without the address
+        msg = MessageBuilder.command_terminate()
+        msg[MessageBuilder.FIELD_HOST] = formatipport(self.engine_addrs[1])
+        self.controller.broadcast_msg(msg)
+        msg = self._receive(self.engines[1], 1)[0][1]
+        self.assertEqual(msg, MessageBuilder.command_terminate())
+        self.assertEqual(self.engines[0].pop_msg_queue(timeout=0.2), (None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
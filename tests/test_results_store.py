@@ -0,0 +1,113 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os, shutil, tempfile, unittest
+from fault_injector.io.results_store import ResultsStore
+from fault_injector.io.task import Task
+from fault_injector.io.writer import ExecutionLogWriter, LogFlusher
+from fault_injector.network.msg_builder import MessageBuilder
+from fault_injector.util.misc import format_injection_filename
+
+
+class ResultsStoreTest(unittest.TestCase):
+
+    HOSTS = [('127.0.0.1', 30001), ('127.0.0.1', 30002)]
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'results.db')
+        self.entries = {addr: [] for addr in self.HOSTS}
+        for i, addr in enumerate(self.HOSTS):
+            self.entries[addr].append(MessageBuilder.command_session(100 + i))
+            for seq_num in range(5):
+                task = Task(args='echo %s' % seq_num, timestamp=110 + seq_num, duration=seq_num, seqNum=seq_num,
+                            isFault=seq_num % 2 == 0, cores='0-1' if seq_num == 3 else None)
+                self.entries[addr].append(MessageBuilder.status_start(task))
+                self.entries[addr].append(MessageBuilder.status_error(task, 1, output='failed')
+                                          if seq_num == 4 else MessageBuilder.status_end(task))
+            self.entries[addr].append(MessageBuilder.status_connection(200 + i))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _write(self, store, n=None):
+        writers = {addr: store.get_writer(addr) for addr in self.HOSTS}
+        # Records of different hosts are interleaved
+        for i in range(len(self.entries[self.HOSTS[0]]) if n is None else n):
+            for addr in self.HOSTS:
+                self.assertTrue(writers[addr].write_entry(self.entries[addr][i]))
+
+    def _check_export(self):
+        """
+        Checks that the logs exported from the database match those written directly by the controller
+        """
+        out_dir = os.path.join(self.dir, 'export')
+        ref_dir = os.path.join(self.dir, 'reference')
+        os.mkdir(out_dir)
+        os.mkdir(ref_dir)
+        paths = ResultsStore.export_csv(self.path, out_dir, 'workload')
+        self.assertEqual(sorted(paths), sorted(format_injection_filename(out_dir, addr, 'workload')
+                                               for addr in self.HOSTS))
+        for addr in self.HOSTS:
+            ref_path = format_injection_filename(ref_dir, addr, 'workload')
+            writer = ExecutionLogWriter(ref_path)
+            for entry in self.entries[addr]:
+                writer.write_entry(entry)
+            writer.close()
+            with open(ref_path) as ref_file, open(format_injection_filename(out_dir, addr, 'workload')) as out_file:
+                self.assertEqual(out_file.read(), ref_file.read())
+
+    def test_export(self):
+        store = ResultsStore(self.path, batch_size=7)
+        self._write(store)
+        store.close()
+        self._check_export()
+
+    def test_flusher(self):
+        flusher = LogFlusher(interval=3600)
+        store = ResultsStore(self.path, flusher=flusher)
+        self._write(store)
+        # Records are inserted by the flusher, also those buffered when it is stopped
+        flusher.stop()
+        store.close()
+        self._check_export()
+
+    def test_resume(self):
+        store = ResultsStore(self.path, batch_size=1)
+        self._write(store, 4)
+        position = store.get_position()
+        self.assertEqual(position, 8)
+        # Records inserted after the position, such as those received after a checkpoint, are discarded on resume
+        self._write(store, 6)
+        store.close()
+        store = ResultsStore(self.path, position=position)
+        for addr in self.HOSTS:
+            for entry in self.entries[addr][4:]:
+                store.write_entry(addr, entry)
+        store.close()
+        self._check_export()
+
+
+if __name__ == '__main__':
+    unittest.main()
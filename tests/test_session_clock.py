@@ -0,0 +1,138 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+from unittest import mock
+from fault_injector.injection.fault_injector_engine import InjectorEngine
+from fault_injector.injection.session_clock import SessionClock
+from fault_injector.injection.thread_pool import InjectionThreadPool
+from fault_injector.network.msg_builder import MessageBuilder
+from fault_injector.network.msg_server import MessageServer
+
+
+class FakeServer(MessageServer):
+    """
+    Stand-in for the MessageServer of an engine, which records the messages it is asked to send
+    """
+
+    def __init__(self):
+        super().__init__(0)
+        self.sent = []
+
+    def send_msg(self, addr, msg):
+        self.sent.append((addr, msg))
+
+
+class SessionClockTest(unittest.TestCase):
+
+    def setUp(self):
+        self.mono = 100.0
+        patcher = mock.patch('fault_injector.injection.session_clock.monotonic', side_effect=lambda: self.mono)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock = SessionClock(samples=3)
+        self.clock.reset(1000)
+
+    def _exchange(self, offset, delay, asymmetry=0.0):
+        """
+        Simulates a probe exchange with a master whose clock is ahead by offset, with a given round-trip delay split
+        between the two directions according to the asymmetry
+        """
+        t0 = self.clock.local_time()
+        t1 = t0 + offset + delay / 2 + asymmetry
+        t2 = t1
+        self.mono += delay
+        self.clock.add_sample(t0, t1, t2, self.clock.local_time())
+
+    def test_offset(self):
+        self.assertIsNone(self.clock.get_offset())
+        self.assertEqual(self.clock.now(), 1000)
+        self._exchange(0.5, 0.02)
+        self.assertAlmostEqual(self.clock.get_offset(), 0.5)
+        self.assertAlmostEqual(self.clock.get_rtt(), 0.02)
+        self.assertAlmostEqual(self.clock.get_error(), 0.01)
+        self.assertAlmostEqual(self.clock.now(), self.clock.local_time() + 0.5)
+
+    def test_filtering(self):
+        # Samples with a larger delay have a larger error bound, caused by the asymmetry of the delay
+        self._exchange(0.5, 0.002)
+        self._exchange(0.5, 0.2, asymmetry=0.08)
+        self.assertAlmostEqual(self.clock.get_offset(), 0.5)
+        self.assertAlmostEqual(self.clock.get_rtt(), 0.002)
+        # The best sample is dropped once it is no longer among the most recent ones
+        self._exchange(0.5, 0.1, asymmetry=0.04)
+        self._exchange(0.5, 0.05, asymmetry=0.02)
+        self.assertAlmostEqual(self.clock.get_offset(), 0.52)
+        self.assertAlmostEqual(self.clock.get_rtt(), 0.05)
+
+    def test_aging(self):
+        self._exchange(0.5, 0.002)
+        # The error bound of a sample grows with its age, until a newer sample with a larger delay is preferred
+        self.mono += 1000
+        self.assertAlmostEqual(self.clock.get_error(), 0.001 + SessionClock.MAX_DRIFT * 1000.002)
+        self._exchange(0.6, 0.01)
+        self.assertAlmostEqual(self.clock.get_offset(), 0.6)
+
+    def test_reset(self):
+        self._exchange(0.5, 0.02)
+        self.clock.reset(2000)
+        self.assertIsNone(self.clock.get_offset())
+        self.assertEqual(self.clock.local_time(), 2000)
+
+
+class EngineProbeTest(unittest.TestCase):
+
+    MASTER = ('127.0.0.1', 30000)
+
+    def setUp(self):
+        self.server = FakeServer()
+        self.engine = InjectorEngine(self.server, InjectionThreadPool(self.server), sync_samples=2)
+        self.engine._master = self.MASTER
+        self.engine._clock.reset(0)
+        self.engine._nextProbe = 0
+
+    def _probe(self):
+        self.engine._check_probe()
+        addr, msg = self.server.sent.pop()
+        self.assertEqual((addr, msg[MessageBuilder.FIELD_TYPE]), (self.MASTER, MessageBuilder.STATUS_TIME_PROBE))
+        self.engine._nextProbe = 0
+        return msg[MessageBuilder.FIELD_PROBE]
+
+    def test_reply_matching(self):
+        t0, nonce = self._probe()
+        # Replies to the probes of other engines are discarded, even if they were sent at the same local time
+        self.engine._process_time_reply(MessageBuilder.command_time_reply(t0, t0 + 1, t0 + 1, nonce + 1))
+        self.assertIsNone(self.engine._clock.get_offset())
+        self.engine._process_time_reply(MessageBuilder.command_time_reply(t0, t0 + 1, t0 + 1, nonce))
+        self.assertIsNotNone(self.engine._clock.get_offset())
+        # Replies to superseded probes are discarded as well
+        old_t0, old_nonce = self._probe()
+        self._probe()
+        self.engine._process_time_reply(MessageBuilder.command_time_reply(old_t0, old_t0 + 1, old_t0 + 1, old_nonce))
+        self.assertEqual(len(self.engine._clock._samples), 1)
+        self.assertEqual(self.server.sent, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
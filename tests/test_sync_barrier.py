@@ -0,0 +1,82 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+from fault_injector.injection.sync_barrier import SyncBarrier
+
+
+class SyncBarrierTest(unittest.TestCase):
+
+    HOSTS = [('127.0.0.1', 30000 + i) for i in range(3)]
+
+    def setUp(self):
+        self.barrier = SyncBarrier(1, 10, self.HOSTS, 100)
+
+    def test_quorum(self):
+        a, b, c = self.HOSTS
+        self.barrier.set_ready(a)
+        self.barrier.set_ready(b)
+        # Engines that are not targeted do not count towards the quorum
+        self.barrier.set_ready(('127.0.0.1', 31000))
+        self.assertFalse(self.barrier.is_ready())
+        self.assertEqual(self.barrier.get_not_ready(), [c])
+        self.barrier.set_ready(c)
+        self.assertTrue(self.barrier.is_ready())
+
+    def test_discard(self):
+        a, b, c = self.HOSTS
+        self.barrier.set_ready(a)
+        self.barrier.set_ready(b)
+        # A lost engine is not waited for
+        self.barrier.discard(c)
+        self.assertTrue(self.barrier.is_ready())
+        self.assertEqual(self.barrier.targets, {a, b})
+
+    def test_complete(self):
+        a, b, c = self.HOSTS
+        for addr in self.HOSTS:
+            self.barrier.set_ready(addr)
+        self.assertFalse(self.barrier.is_complete())
+        self.barrier.start = 10.5
+        self.barrier.add_start(a, 10.5)
+        self.barrier.add_start(b, 10.501)
+        self.assertFalse(self.barrier.is_complete())
+        # Engines that reported their start time are not discarded, while the others are
+        self.barrier.discard(a)
+        self.barrier.discard(c)
+        self.assertTrue(self.barrier.is_complete())
+        self.assertEqual(self.barrier.get_starts(), {a: 10.5, b: 10.501})
+        self.assertEqual(self.barrier.targets, {a, b})
+
+    def test_restored_starts(self):
+        # Start times restored from a checkpoint also mark engines as ready
+        for addr in self.HOSTS:
+            self.barrier.add_start(addr, 10.5)
+        self.assertTrue(self.barrier.is_ready())
+        self.barrier.start = 10.5
+        self.assertTrue(self.barrier.is_complete())
+
+
+if __name__ == '__main__':
+    unittest.main()
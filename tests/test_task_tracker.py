@@ -0,0 +1,112 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+from fault_injector.injection.task_tracker import PendingTaskTracker
+
+
+class PendingTaskTrackerTest(unittest.TestCase):
+
+    HOSTS = [('127.0.0.1', 30000 + i) for i in range(3)]
+
+    def setUp(self):
+        self.tracker = PendingTaskTracker()
+        for addr in self.HOSTS:
+            self.tracker.add_host(addr)
+
+    def _pending(self):
+        return [self.tracker.get_host_pending(addr) for addr in self.HOSTS]
+
+    def test_broadcast(self):
+        a, b, c = self.HOSTS
+        self.tracker.add_task(1)
+        self.tracker.add_task(2, [b, c])
+        self.assertEqual(self.tracker.get_n_pending(), 5)
+        self.assertEqual(self._pending(), [1, 2, 2])
+        self.assertTrue(self.tracker.complete_task(a, 1))
+        # Tasks are completed once per engine, and only by the engines they were sent to
+        self.assertFalse(self.tracker.complete_task(a, 1))
+        self.assertFalse(self.tracker.complete_task(a, 2))
+        self.assertFalse(self.tracker.complete_task(('127.0.0.1', 1), 1))
+        for addr in (b, c):
+            self.assertTrue(self.tracker.complete_task(addr, 1))
+            self.assertTrue(self.tracker.complete_task(addr, 2))
+        self.assertFalse(self.tracker.has_pending())
+        self.assertEqual(self._pending(), [0, 0, 0])
+        self.assertEqual(self.tracker.get_tasks(), [])
+
+    def test_late_host(self):
+        self.tracker.add_task(1)
+        addr = ('127.0.0.1', 31000)
+        self.tracker.add_host(addr)
+        # Tasks sent before an engine was added are not pending on it
+        self.assertEqual(self.tracker.get_host_pending(addr), 0)
+        self.tracker.add_task(2)
+        self.assertEqual(self.tracker.get_host_pending(addr), 1)
+        self.assertEqual(sorted(self.tracker.get_tasks())[1], (2, self.HOSTS + [addr]))
+
+    def test_reset_host(self):
+        a, b, c = self.HOSTS
+        self.tracker.add_task(1)
+        self.tracker.add_task(2, [a])
+        self.tracker.add_task(3, [a, b])
+        # The tasks of an engine whose connection was lost expire all at once, also those pending only on it
+        self.tracker.reset_host(a)
+        self.assertEqual(self._pending(), [0, 2, 1])
+        self.assertEqual(sorted(self.tracker.get_tasks()), [(1, [b, c]), (3, [b])])
+        self.assertFalse(self.tracker.complete_task(a, 1))
+        self.assertEqual(self.tracker.get_n_pending(), 3)
+        # The engine keeps receiving new tasks
+        self.tracker.add_task(4)
+        self.assertEqual(self._pending(), [1, 3, 2])
+
+    def test_remove_host(self):
+        a, b, c = self.HOSTS
+        self.tracker.add_task(1)
+        self.tracker.remove_host(b)
+        self.assertFalse(self.tracker.has_host(b))
+        self.assertIsNone(self.tracker.get_host_pending(b))
+        self.assertEqual(self.tracker.get_n_pending(), 2)
+        # The index of the removed engine is reused, without inheriting its tasks
+        addr = ('127.0.0.1', 31000)
+        self.tracker.add_host(addr)
+        self.assertEqual(self.tracker.get_n_hosts(), 3)
+        self.assertEqual(self.tracker.get_host_pending(addr), 0)
+        self.assertFalse(self.tracker.complete_task(addr, 1))
+        self.assertEqual(sorted(self.tracker.get_tasks()), [(1, [a, c])])
+
+    def test_resend(self):
+        a, b, c = self.HOSTS
+        self.tracker.add_task(1, [a])
+        # A task sent again is tracked once for the engines that already had it
+        self.tracker.add_task(1, [a, b])
+        self.assertEqual(self._pending(), [1, 1, 0])
+        self.assertEqual(self.tracker.get_n_pending(), 2)
+        self.tracker.add_task(1)
+        self.assertEqual(self._pending(), [1, 1, 1])
+        self.assertEqual(self.tracker.get_n_pending(), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+MIT License
+
+Copyright (c) 2018 AlessioNetti
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os, shutil, tempfile, unittest
+from threading import Thread
+from fault_injector.io.reader import ExecutionLogReader
+from fault_injector.io.writer import ExecutionLogWriter, LogFlusher
+from fault_injector.network.msg_builder import MessageBuilder
+
+
+class ExecutionLogWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'execution.csv')
+        self.entries = [MessageBuilder.status_connection(i, restored=i % 2 == 1) for i in range(50)]
+        # The flushing thread never wakes up on its own during the tests
+        self.flusher = LogFlusher(interval=3600)
+
+    def tearDown(self):
+        self.flusher.stop()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _read(self):
+        reader = ExecutionLogReader(self.path)
+        types = []
+        entry = reader.read_entry()
+        while entry is not None:
+            types.append(entry[MessageBuilder.FIELD_TYPE])
+            entry = reader.read_entry()
+        reader.close()
+        return types
+
+    def test_flush_on_stop(self):
+        writer = ExecutionLogWriter(self.path, flusher=self.flusher)
+        for entry in self.entries:
+            self.assertTrue(writer.write_entry(entry))
+        # Entries are kept in memory until the flusher is stopped
+        self.assertEqual(self._read(), [])
+        self.flusher.stop()
+        self.assertEqual(self._read(), [e[MessageBuilder.FIELD_TYPE] for e in self.entries])
+        writer.close()
+
+    def test_get_position(self):
+        writer = ExecutionLogWriter(self.path, flusher=self.flusher)
+        self.assertTrue(writer.write_entry(self.entries[0]))
+        # The position covers the entries that are still buffered
+        position = writer.get_position()
+        self.assertEqual(self._read(), [self.entries[0][MessageBuilder.FIELD_TYPE]])
+        self.assertEqual(position, os.path.getsize(self.path))
+        writer.close()
+
+    def test_reader_seek(self):
+        writer = ExecutionLogWriter(self.path)
+        for entry in self.entries:
+            writer.write_entry(entry)
+        writer.close()
+        reader = ExecutionLogReader(self.path)
+        reader.seek(5)
+        self.assertEqual(reader.read_entry()[MessageBuilder.FIELD_TIME], '5')
+        self.assertEqual(reader.tell(), 6)
+        reader.seek(1)
+        self.assertEqual(reader.read_entry()[MessageBuilder.FIELD_TIME], '1')
+        reader.seek(len(self.entries))
+        self.assertIsNone(reader.read_entry())
+        reader.close()
+
+    def test_close_while_locked(self):
+        writer = ExecutionLogWriter(self.path, flusher=self.flusher)
+        for entry in self.entries:
+            writer.write_entry(entry)
+
+        def interrupted():
+            # A signal handler closing the writer runs in the thread that may be holding its locks
+            with writer._fileLock, writer._bufferLock:
+                writer.close()
+
+        thread = Thread(target=interrupted, daemon=True)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(self._read()), len(self.entries))
+
+
+if __name__ == '__main__':
+    unittest.main()